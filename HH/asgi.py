@@ -1,18 +1,25 @@
 import os
 
 from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
-import messenger.routing
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HH.settings')
 
+django_asgi_app = get_asgi_application()
+
+import messenger.routing  # noqa: E402
+from core_models.consumers import NotificationFanoutConsumer  # noqa: E402
+from core_models.notifications import FANOUT_CHANNEL  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             messenger.routing.websocket_urlpatterns
         )
     ),
+    "channel": ChannelNameRouter({
+        FANOUT_CHANNEL: NotificationFanoutConsumer.as_asgi(),
+    }),
 })
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -61,17 +65,57 @@ REST_FRAMEWORK = {
     ],
 }
 
+REDIS_HOST = ("127.0.0.1", 6379)
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],
+            "hosts": [REDIS_HOST],
         },
     },
 }
 
+# Кэш 'counters' хранит счётчики (непрочитанные уведомления, присутствие и т.п.),
+# кэш 'pages' — страницы и фрагменты (core_models.page_cache). Бэкенд выбирается
+# явно переменной окружения DJANGO_CACHE_BACKEND: 'redis' — общий Redis для всех
+# процессов, 'locmem' — память процесса. По умолчанию locmem в DEBUG, иначе redis
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'locmem' if DEBUG else 'redis')
+if CACHE_BACKEND not in ('redis', 'locmem'):
+    raise ImproperlyConfigured(f'DJANGO_CACHE_BACKEND: неизвестный бэкенд {CACHE_BACKEND!r}')
+
+
+def cache_config(name, redis_db):
+    if CACHE_BACKEND == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST[0]}:{REDIS_HOST[1]}/{redis_db}',
+        }
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}
+
+
+# Крупные рассылки уведомлений (core_models.notifications.notify) уходят фоновому
+# воркеру только при DJANGO_FANOUT_WORKER=1, и тогда рядом с daphne должен работать
+#   python manage.py runworker notifications-fanout
+# Без воркера задание истекло бы в Redis без единого уведомления, поэтому по
+# умолчанию крупная рассылка выполняется в запросе
+NOTIFICATIONS_FANOUT_WORKER = os.environ.get('DJANGO_FANOUT_WORKER') == '1'
+
+COUNTERS_CACHE = cache_config('counters', 1)
+PAGES_CACHE = cache_config('pages', 2)
+PAGE_CACHE_TIMEOUT = 5 * 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'counters': COUNTERS_CACHE,
+    'pages': PAGES_CACHE,
+}
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core_models.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,6 +124,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Статистика SQL по запросам (core_models.middleware.QueryStatsMiddleware):
+# в DEBUG — каждый запрос и заголовки X-Query-*, в продакшене — выборка в лог
+QUERY_STATS_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_STATS_HEADERS = DEBUG
+
+# HTMX-эндпоинты, для которых подключается асинхронная версия представления
+# (core_models.views.select_view). Сравнение версий: manage.py bench_htmx.
+# На SQLite асинхронные версии не быстрее синхронных, поэтому по умолчанию выключены
+ASYNC_HTMX_VIEWS = set()
+
+# manage.py test: лог статистики SQL молчит, бюджеты в тестах проверяет
+# QueryBudgetMixin.assertQueryBudget (core_models.testing)
+TESTING = sys.argv[1:2] == ['test']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'null': {'class': 'logging.NullHandler'},
+    },
+    'loggers': {
+        'query_stats': {'handlers': ['null' if TESTING else 'console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = 'HH.urls'
 
 TEMPLATES = [
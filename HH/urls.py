@@ -2,6 +2,19 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from rest_framework.routers import DefaultRouter
+
+from core_models.views import CategoryViewSet, NotificationViewSet, ReviewViewSet, SkillViewSet
+from employers.views import VacancyViewSet
+from jobseekers.views import JobseekerProfileViewSet
+
+router = DefaultRouter()
+router.register('categories', CategoryViewSet)
+router.register('skills', SkillViewSet)
+router.register('notifications', NotificationViewSet)
+router.register('reviews', ReviewViewSet)
+router.register('vacancies', VacancyViewSet)
+router.register('resumes', JobseekerProfileViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +23,7 @@ urlpatterns = [
     path('jobseeker/', include('jobseekers.urls', namespace='jobseekers')),
     path('employer/', include('employers.urls', namespace='employes')),
     path('messages/', include('messenger.urls', namespace='messenger')),
+    path('api/', include(router.urls)),
     
     path('accounts/', include('django.contrib.auth.urls')),  # logout, password_change и т.д.
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Count
+
+from . import reference
+from .models import Skill
+
+# Подсказки навыков по префиксу. Индекс строится в памяти процесса из справочника
+# (core_models.reference) и перестраивается, когда справочник перечитан или
+# популярность устарела (POPULARITY_TTL). Ищется начало любого слова названия
+# без учёта регистра, «ё» и похожих кириллических/латинских букв (с/c, о/o, ...).
+# Если по запросу мало подсказок, запрос пробуется в другой раскладке
+# клавиатуры («знерщт» -> «python»).
+# Для коротких префиксов (до PRECOMPUTED_PREFIX символов) лучшие MAX_LIMIT
+# навыков считаются заранее, для длинных — выбираются из диапазона
+# отсортированного массива ключей.
+MAX_LIMIT = 20
+PRECOMPUTED_PREFIX = 3
+POPULARITY_TTL = 10 * 60
+
+HOMOGLYPHS = str.maketrans('аеорсухіё', 'aeopcyxie')
+SEPARATORS = frozenset(' -_/.,()')
+
+RU_LAYOUT = 'йцукенгшщзхъфывапролджэячсмитьбю.ё'
+EN_LAYOUT = "qwertyuiop[]asdfghjkl;'zxcvbnm,./`"
+TO_EN = str.maketrans(RU_LAYOUT, EN_LAYOUT)
+TO_RU = str.maketrans(EN_LAYOUT, RU_LAYOUT)
+
+
+def normalize(text):
+    return ' '.join(text.casefold().translate(HOMOGLYPHS).split())
+
+
+def switch_layout(text):
+    text = text.casefold()
+    if any('а' <= char <= 'я' or char == 'ё' for char in text):
+        return text.translate(TO_EN)
+    return text.translate(TO_RU)
+
+
+def _word_starts(key):
+    # Позиции начала слов: «machine learning» ищется и по «mach», и по «lear»,
+    # «asp.net» — и по «net»
+    return [0] + [
+        position for position in range(1, len(key))
+        if key[position - 1] in SEPARATORS and key[position] not in SEPARATORS
+    ]
+
+
+class SkillIndex:
+    def __init__(self, skills, popularity):
+        # skills — объекты с id и name, popularity — {skill_id: число упоминаний}
+        self.skills = {skill.id: skill for skill in skills}
+        self.rank = {
+            skill.id: (-popularity.get(skill.id, 0), len(skill.name), skill.name.casefold())
+            for skill in skills
+        }
+        entries = []
+        for skill in skills:
+            key = normalize(skill.name)
+            entries.extend((key[start:], skill.id) for start in _word_starts(key))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [skill_id for _, skill_id in entries]
+
+        # Ключи отсортированы, поэтому навыки с общим префиксом лежат одним диапазоном
+        self.top = {}
+        for length in range(1, PRECOMPUTED_PREFIX + 1):
+            start = 0
+            while start < len(entries):
+                prefix = self.keys[start][:length]
+                end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+                if len(prefix) == length:
+                    self.top[prefix] = self._best(self.ids[start:end], MAX_LIMIT)
+                start = end
+
+    def _best(self, ids, limit):
+        return heapq.nsmallest(limit, set(ids), key=self.rank.__getitem__)
+
+    def _search(self, prefix, limit):
+        if len(prefix) <= PRECOMPUTED_PREFIX:
+            return self.top.get(prefix, [])[:limit]
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\U0010ffff', lo)
+        return self._best(self.ids[lo:hi], limit)
+
+    def search(self, query, limit=10):
+        limit = max(1, min(limit, MAX_LIMIT))
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        ids = self._search(prefix, limit)
+        if len(ids) < limit:
+            seen = set(ids)
+            ids += [skill_id for skill_id in self._search(normalize(switch_layout(query)), limit)
+                    if skill_id not in seen][:limit - len(ids)]
+        return [self.skills[skill_id] for skill_id in ids]
+
+
+def skill_popularity():
+    # Число упоминаний навыка во всех связанных таблицах (навыки соискателей,
+    # навыки вакансий): по одному сгруппированному запросу на таблицу
+    popularity = Counter()
+    for relation in Skill._meta.related_objects:
+        if relation.many_to_many:
+            model, field = relation.through, relation.field.m2m_reverse_field_name()
+        else:
+            model, field = relation.related_model, relation.field.name
+        popularity.update(dict(
+            model._default_manager.values_list(field).annotate(count=Count('pk')).values_list(field, 'count')
+        ))
+    return popularity
+
+
+class _Holder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._source = None
+        self._built_at = 0.0
+
+    def _stale(self, skills):
+        return self._source is not skills or time.monotonic() - self._built_at >= POPULARITY_TTL
+
+    def get(self):
+        skills = reference.skills.all()
+        index = self._index
+        if index is not None and not self._stale(skills):
+            return index
+        # Пока другой поток перестраивает индекс, отвечаем по прежнему
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self._index is None or self._stale(skills):
+                self._index = SkillIndex(skills, skill_popularity())
+                self._source, self._built_at = skills, time.monotonic()
+            return self._index
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+skill_index = _Holder()
+
+
+def autocomplete_skills(query, limit=10):
+    return skill_index.get().search(query, limit)
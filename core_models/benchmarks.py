@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template import Origin
+from django.template.loaders.base import Loader
+from django.test import override_settings
+
+# Общее для замеров (manage.py bench_*) и тестов: окружение без Redis
+# и отдельная база, в которую замер пишет свои строки.
+
+# Кэши и слой каналов в памяти процесса
+local_services = override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'counters': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'counters'},
+        'pages': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pages'},
+    },
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+
+
+class StubTemplateLoader(Loader):
+    # Пустой шаблон для любого имени: замеряются запросы самого представления
+    def get_template_sources(self, template_name):
+        yield Origin(name=template_name, template_name=template_name, loader=self)
+
+    def get_contents(self, origin):
+        return ''
+
+
+stub_templates = override_settings(TEMPLATES=[{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': ['core_models.benchmarks.StubTemplateLoader'],
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+        ],
+    },
+}])
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    # Замер пишет до миллиона строк: не в рабочую базу, а в отдельную, созданную
+    # и промигрированную тем же способом, что и тестовая. На SQLite — временный
+    # файл, на остальных СУБД — test_<имя базы>. Удаляется и после прерывания
+    connection = connections[DEFAULT_DB_ALIAS]
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    directory = None
+    if connection.vendor == 'sqlite':
+        directory = tempfile.mkdtemp(prefix='bench_')
+        test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = old_test_name
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
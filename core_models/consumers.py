@@ -0,0 +1,14 @@
+from channels.consumer import SyncConsumer
+
+from .notifications import fan_out
+
+
+class NotificationFanoutConsumer(SyncConsumer):
+    def notifications_fanout(self, event):
+        fan_out(
+            event['user_ids'],
+            event['title'],
+            event['message'],
+            context=event['context'],
+            contexts={user_id: values for user_id, values in event['contexts']},
+        )
@@ -0,0 +1,125 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Счётчик непрочитанных уведомлений в кэше 'counters' (Redis, в разработке locmem).
+# Ключ живёт RECONCILE_TIMEOUT секунд, после чего пересчитывается из БД,
+# так что возможный дрейф счётчика ограничен этим интервалом.
+RECONCILE_TIMEOUT = 10 * 60
+KEY = 'unread_notifications:{}'
+
+
+def _cache():
+    return caches['counters']
+
+
+def unread_notifications_from_db(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def get_unread_notifications(user_id):
+    key = KEY.format(user_id)
+    try:
+        count = _cache().get(key)
+    except Exception:
+        logger.warning('Кэш счётчиков недоступен, считаем по БД', exc_info=True)
+        return unread_notifications_from_db(user_id)
+    if count is None:
+        count = reconcile_unread_notifications(user_id)
+    return max(count, 0)
+
+
+async def aget_unread_notifications(user_id):
+    # Для асинхронных представлений: попадание в кэш обходится без запросов к БД
+    key = KEY.format(user_id)
+    try:
+        count = await _cache().aget(key)
+    except Exception:
+        logger.warning('Кэш счётчиков недоступен, считаем по БД', exc_info=True)
+        return await Notification.objects.filter(user_id=user_id, is_read=False).acount()
+    if count is None:
+        count = await sync_to_async(reconcile_unread_notifications)(user_id)
+    return max(count, 0)
+
+
+def reconcile_unread_notifications(user_id):
+    count = unread_notifications_from_db(user_id)
+    try:
+        _cache().set(KEY.format(user_id), count, RECONCILE_TIMEOUT)
+    except Exception:
+        logger.warning('Кэш счётчиков недоступен', exc_info=True)
+    return count
+
+
+def _change(user_id, delta):
+    key = KEY.format(user_id)
+    try:
+        # incr/decr не продлевают TTL: сверка с БД произойдёт по расписанию
+        if delta > 0:
+            _cache().incr(key, delta)
+        else:
+            if _cache().decr(key, -delta) < 0:
+                _cache().delete(key)
+    except ValueError:
+        # Ключа нет: значение будет посчитано из БД при следующем чтении
+        pass
+    except Exception:
+        logger.warning('Кэш счётчиков недоступен', exc_info=True)
+        _cache_delete_quietly(key)
+
+
+def _cache_delete_quietly(key):
+    try:
+        _cache().delete(key)
+    except Exception:
+        pass
+
+
+def incr_unread_notifications(user_id, delta=1):
+    # После коммита, чтобы откат транзакции не оставил лишнюю единицу
+    transaction.on_commit(lambda: _change(user_id, delta))
+
+
+def decr_unread_notifications(user_id, delta=1):
+    transaction.on_commit(lambda: _change(user_id, -delta))
+
+
+def get_many_unread_notifications(user_ids):
+    # Пакетное чтение для рассылок: один запрос в кэш и один GROUP BY для промахов
+    keys = {KEY.format(user_id): user_id for user_id in user_ids}
+    try:
+        cached = _cache().get_many(list(keys))
+    except Exception:
+        logger.warning('Кэш счётчиков недоступен, считаем по БД', exc_info=True)
+        cached = {}
+    counts = {keys[key]: max(count, 0) for key, count in cached.items()}
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        try:
+            counts.update(reconcile_all_unread_notifications(missing))
+        except Exception:
+            logger.warning('Кэш счётчиков недоступен', exc_info=True)
+            counts.update(_count_from_db(missing))
+    return counts
+
+
+def _count_from_db(user_ids):
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values_list('user_id').annotate(count=Count('id')).order_by()
+    )
+    return counts
+
+
+def reconcile_all_unread_notifications(user_ids):
+    counts = _count_from_db(user_ids)
+    _cache().set_many({KEY.format(user_id): count for user_id, count in counts.items()}, RECONCILE_TIMEOUT)
+    return counts
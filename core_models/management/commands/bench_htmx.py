@@ -0,0 +1,166 @@
+import asyncio
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import path
+from django.utils.crypto import get_random_string
+
+from core_models.models import Skill, User
+from core_models.benchmarks import local_services, scratch_database, stub_templates
+from employers import views as employer_views
+from employers.models import Application, Company, Vacancy
+from jobseekers import views as jobseeker_views
+from jobseekers.models import JobseekerProfile
+from messenger import views as messenger_views
+from messenger.models import ChatRoom
+
+PREFIX = 'bench_htmx_'
+
+# Эндпоинт -> (синхронная версия, асинхронная версия). htmx_apply_vacancy
+# не замеряется: повторный отклик на ту же вакансию отвечает 400 после первого запроса
+ENDPOINTS = {
+    'unread_count': (messenger_views.htmx_unread_count, messenger_views.htmx_unread_count_async),
+    'add_skill': (jobseeker_views.htmx_add_skill, jobseeker_views.htmx_add_skill_async),
+    'update_status': (employer_views.htmx_update_application_status,
+                      employer_views.htmx_update_application_status_async),
+    'send_message': (messenger_views.htmx_send_message, messenger_views.htmx_send_message_async),
+}
+
+# URLconf замера: обе версии каждого эндпоинта под /sync/... и /async/...
+urlpatterns = [
+    path(f'{mode}/{name}/' + ('<int:application_id>/' if name == 'update_status' else ''), views[number])
+    for name, views in ENDPOINTS.items()
+    for number, mode in enumerate(('sync', 'async'))
+]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест HTMX-эндпоинтов через ASGI в одном процессе: синхронная и асинхронная '
+            'версии при разной конкурентности. Печатает запросов/с и p99 задержки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на каждый замер')
+        parser.add_argument('--concurrency', default='1,10,50', help='Уровни конкурентности через запятую')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Эндпоинты через запятую')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        endpoints = [name for name in options['endpoints'].split(',') if name in ENDPOINTS]
+        # Статистика SQL выключена: замеряется само представление. Отдельная
+        # временная база, кэши и слой каналов в памяти процесса (local_services),
+        # шаблоны — пустые заглушки
+        overrides = override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['*'], QUERY_STATS_SAMPLE_RATE=0)
+        with scratch_database(), overrides, local_services, stub_templates:
+            fixture = self.create_fixture()
+            app = ASGIHandler()
+            for name in endpoints:
+                for level in levels:
+                    results = {
+                        mode: asyncio.run(self.run(app, fixture, name, mode, options['requests'], level))
+                        for mode in ('sync', 'async')
+                    }
+                    self.stdout.write(f'{name:14} c={level:<4} ' + ' | '.join(
+                        f'{mode} {result["rps"]:6.0f} запросов/с, p99 {result["p99"]:7.1f} мс'
+                        + (f', ошибок {result["errors"]}' if result['errors'] else '')
+                        for mode, result in results.items()
+                    ))
+
+    def create_fixture(self):
+        jobseeker = User.objects.create(username=f'{PREFIX}jobseeker', role='jobseeker')
+        employer = User.objects.create(username=f'{PREFIX}employer', role='employer')
+        recipient = User.objects.create(username=f'{PREFIX}recipient')
+        profile = JobseekerProfile.objects.create(user=jobseeker, desired_position='Разработчик')
+        company = Company.objects.create(user=employer, name=f'{PREFIX}company')
+        vacancy = Vacancy.objects.create(company=company, title='Разработчик', description='Описание',
+                                         requirements='Требования', location='Бишкек')
+        skill, _ = Skill.objects.get_or_create(name=f'{PREFIX}skill')
+        ChatRoom.get_or_create_room(jobseeker, recipient)
+        return {
+            'jobseeker_session': self.login(jobseeker),
+            'employer_session': self.login(employer),
+            'csrf': get_random_string(32),
+            'recipient_id': recipient.id,
+            'skill_id': skill.id,
+            'application_id': Application.objects.create(jobseeker=profile, vacancy=vacancy).id,
+        }
+
+    def login(self, user):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    def build_request(self, fixture, name, mode, number):
+        session = fixture['jobseeker_session']
+        url, data = f'/{mode}/{name}/', None
+        if name == 'add_skill':
+            data = {'skill_id': fixture['skill_id']}
+        elif name == 'update_status':
+            session = fixture['employer_session']
+            url += f'{fixture["application_id"]}/'
+            data = {'status': ('viewed', 'interview')[number % 2]}
+        elif name == 'send_message':
+            data = {'recipient_id': fixture['recipient_id'], 'content': f'Сообщение {number}'}
+        return ('GET' if data is None else 'POST'), url, urlencode(data or {}).encode(), session
+
+    async def call(self, app, fixture, method, url, body, session):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': url, 'raw_path': url.encode(),
+            'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'cookie', f'sessionid={session}; csrftoken={fixture["csrf"]}'.encode()),
+                (b'x-csrftoken', fixture['csrf'].encode()),
+                (b'content-type', b'application/x-www-form-urlencoded'),
+            ],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        events = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = None
+
+        async def receive():
+            if events:
+                return events.pop()
+            # Клиент не отключается: Django отменит ожидание после ответа
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await app(scope, receive, send)
+        return status
+
+    async def run(self, app, fixture, name, mode, total, concurrency):
+        latencies = []
+        errors = 0
+        numbers = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for number in numbers:
+                request = self.build_request(fixture, name, mode, number)
+                started = time.perf_counter()
+                status = await self.call(app, fixture, *request)
+                latencies.append(time.perf_counter() - started)
+                errors += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'rps': total / seconds,
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            'errors': errors,
+        }
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core_models.counters import reconcile_all_unread_notifications
+from core_models.models import User
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики непрочитанных уведомлений в кэше с базой данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        total = 0
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                reconcile_all_unread_notifications(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            reconcile_all_unread_notifications(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Сверено счётчиков: {total}'))
@@ -0,0 +1,84 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .query_stats import QueryStats, get_query_budget
+
+logger = logging.getLogger('query_stats')
+
+
+class QueryStatsMiddleware:
+    # В DEBUG статистика собирается для каждого запроса и отдаётся заголовками
+    # X-Query-*, в продакшене — для доли QUERY_STATS_SAMPLE_RATE запросов, только в лог
+    # Работает и в асинхронной цепочке: иначе асинхронное представление под ASGI
+    # вызывалось бы через переход в поток ради одного этого middleware
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 1.0 if settings.DEBUG else 0.0)
+        self.headers = getattr(settings, 'QUERY_STATS_HEADERS', settings.DEBUG)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        # Асинхронный ORM выполняет запросы в общем для запроса синхронном потоке
+        # (thread_sensitive), поэтому обёртка ставится на соединение этого потока
+        stats = QueryStats()
+        await sync_to_async(lambda: connection.execute_wrappers.append(stats))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(stats))()
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        budget = getattr(request, 'query_budget', None)
+        over_budget = budget is not None and stats.count > budget
+        record = {
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.count,
+            'sql_ms': round(stats.duration * 1000, 2),
+            'budget': budget,
+            'duplicates': stats.duplicates,
+        }
+        if over_budget:
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+        if self.headers:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+            response['X-Query-Duplicates'] = str(sum(stats.duplicates.values()))
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
@@ -55,6 +55,11 @@ class Notification(models.Model):
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_date_idx'),
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False),
+                         name='notification_user_unread_idx'),
+        ]
 
 
 class Review(models.Model):
@@ -0,0 +1,87 @@
+import logging
+import time
+from itertools import islice
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .models import Notification
+from .signals import notifications_created
+
+logger = logging.getLogger(__name__)
+
+# Массовая рассылка уведомлений: bulk_create пачками по FANOUT_BATCH_SIZE.
+# Шаблоны title/message форматируются через str.format с контекстом
+# получателя (contexts: {user_id: {...}}), общий контекст — в context.
+FANOUT_BATCH_SIZE = 1000
+# Фоновый воркер: python manage.py runworker notifications-fanout,
+# включается настройкой NOTIFICATIONS_FANOUT_WORKER (HH/settings.py)
+FANOUT_CHANNEL = 'notifications-fanout'
+# notify: при включённом воркере рассылки больше FANOUT_INLINE_LIMIT получателей уходят ему
+FANOUT_INLINE_LIMIT = 200
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def fan_out(user_ids, title, message, context=None, contexts=None, batch_size=FANOUT_BATCH_SIZE):
+    context = context or {}
+    contexts = contexts or {}
+    started = time.perf_counter()
+    created = 0
+
+    for batch in _batches(user_ids, batch_size):
+        notifications = []
+        for user_id in batch:
+            values = {**context, **contexts.get(user_id, {})}
+            notifications.append(Notification(
+                user_id=user_id,
+                title=title.format(**values),
+                message=message.format(**values),
+            ))
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+            notifications_created.send(sender=Notification, notifications=notifications)
+        created += len(notifications)
+
+    elapsed = time.perf_counter() - started
+    per_second = created / elapsed if elapsed else 0
+    logger.info('Рассылка уведомлений: %d шт. за %.3f с (%.0f/с)', created, elapsed, per_second)
+    return {'created': created, 'seconds': elapsed, 'per_second': per_second}
+
+
+def fan_out_in_background(user_ids, title, message, context=None, contexts=None):
+    # Ключи словаря в msgpack (channels_redis) должны быть строками,
+    # поэтому контексты получателей передаются списком пар
+    async_to_sync(get_channel_layer().send)(FANOUT_CHANNEL, {
+        'type': 'notifications.fanout',
+        'user_ids': list(user_ids),
+        'title': title,
+        'message': message,
+        'context': context or {},
+        'contexts': [[user_id, values] for user_id, values in (contexts or {}).items()],
+    })
+
+
+def notify(user_ids, title, message, context=None, contexts=None):
+    # Точка входа для представлений: рассылка выполняется сразу, в текущей транзакции.
+    # Крупная при включённом воркере уходит ему после коммита, чтобы не держать запрос;
+    # если слой каналов недоступен, она всё же выполняется в запросе
+    user_ids = list(user_ids)
+    if len(user_ids) <= FANOUT_INLINE_LIMIT or not settings.NOTIFICATIONS_FANOUT_WORKER:
+        fan_out(user_ids, title, message, context=context, contexts=contexts)
+        return
+
+    def send():
+        try:
+            fan_out_in_background(user_ids, title, message, context=context, contexts=contexts)
+        except Exception:
+            logger.warning('Воркер рассылок недоступен, рассылаем в запросе', exc_info=True)
+            fan_out(user_ids, title, message, context=context, contexts=contexts)
+
+    transaction.on_commit(send)
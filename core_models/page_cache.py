@@ -0,0 +1,132 @@
+import hashlib
+import logging
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+# Кэш страниц и фрагментов в кэше 'pages' (в разработке locmem, в продакшене Redis).
+# Ключ включает версии данных (core_models.versions): сохранение или удаление
+# вакансии/категории меняет версию, и старые записи просто перестают читаться,
+# а потом вытесняются по таймауту. Удалять ключи по шаблону не нужно.
+ALIAS = 'pages'
+KEY = 'page:{}'
+FRAGMENT_KEY = 'fragment:{}:{}'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+
+def _digest(*parts):
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def _versions_part(versions):
+    return ','.join(f'{name}:{value}' for name, value in sorted(versions.items()))
+
+
+def normalize_query(query_dict, params):
+    # Только параметры, которые понимает представление, без пустых значений
+    # и в постоянном порядке: ?b=2&a=1&utm=x и ?a=1&b=2 дают один ключ
+    items = []
+    for name in sorted(params):
+        values = sorted({value.strip() for value in query_dict.getlist(name)} - {''})
+        items.extend((name, value) for value in values)
+    if ('page', '1') in items:
+        items.remove(('page', '1'))
+    return urlencode(items)
+
+
+def cached_fragment(name, versions, build, timeout=None):
+    # Фрагмент данных страницы (например, список категорий) под ключом версий.
+    # Без кэша версий фрагмент просто строится заново.
+    current = get_versions(*versions)
+    if current is None:
+        return build()
+    key = FRAGMENT_KEY.format(name, _digest(_versions_part(current)))
+    try:
+        value = _cache().get(key)
+    except Exception:
+        logger.warning('Кэш страниц недоступен', exc_info=True)
+        return build()
+    if value is None:
+        value = build()
+        try:
+            _cache().set(key, value, timeout or _timeout())
+        except Exception:
+            logger.warning('Не удалось сохранить фрагмент %s', name, exc_info=True)
+    return value
+
+
+class VersionedPageCacheMixin:
+    # Кэш целой страницы для анонимных GET-запросов. Ключ — путь,
+    # нормализованная строка запроса (page_cache_params) и версии page_cache_versions.
+    # Не кэшируются ответы с flash-сообщениями и с CSRF-токеном: они личные.
+    page_cache_versions = ()
+    page_cache_params = ()
+    page_cache_timeout = None
+
+    def get_page_cache_key(self, request):
+        versions = get_versions(*self.page_cache_versions)
+        if versions is None:
+            return None
+        return KEY.format(_digest(
+            request.path,
+            normalize_query(request.GET, self.page_cache_params),
+            _versions_part(versions),
+        ))
+
+    def page_cacheable(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+            and not len(get_messages(request))
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = self.get_page_cache_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        try:
+            cached = _cache().get(key)
+        except Exception:
+            logger.warning('Кэш страниц недоступен', exc_info=True)
+            return super().dispatch(request, *args, **kwargs)
+        if cached is not None:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+                response.add_post_render_callback(lambda r: self._store(request, key, r))
+            else:
+                self._store(request, key, response)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    def _store(self, request, key, response):
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or response.cookies:
+            return
+        try:
+            _cache().set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            }, self.page_cache_timeout or _timeout())
+        except Exception:
+            logger.warning('Не удалось сохранить страницу %s', request.path, exc_info=True)
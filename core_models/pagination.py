@@ -0,0 +1,94 @@
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cursors import decode_cursor, encode_cursor
+
+
+class KeysetPagination(BasePagination):
+    # Постраничный вывод по ключу (время, id) от новых к старым: следующая
+    # страница выбирается условием по индексу, без OFFSET, поэтому глубокие
+    # страницы стоят столько же, сколько первая. Поле времени задаёт
+    # представление атрибутом keyset_field.
+    # Выборка, упорядоченная по релевантности (поле keyset_rank_field
+    # представления, например ранг поиска), не пересортировывается: у ранга
+    # нет устойчивого ключа, такие страницы листаются по смещению.
+    cursor_query_param = 'cursor'
+    offset_query_param = 'offset'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field = getattr(view, 'keyset_field', 'created_at')
+        size = self.get_page_size(request)
+
+        rank_field = getattr(view, 'keyset_rank_field', None)
+        ordering = queryset.query.order_by
+        self.offset = None
+        if rank_field and ordering and ordering[0] == rank_field:
+            return self.paginate_ranked(queryset.order_by(*ordering, '-id'), request, size)
+
+        queryset = queryset.order_by(f'-{self.field}', '-id')
+        cursor = decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor:
+            timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__lt': timestamp}) | Q(**{self.field: timestamp, 'id__lt': pk})
+            )
+
+        page = list(queryset[:size + 1])
+        self.has_next = len(page) > size
+        page = page[:size]
+        self.last = page[-1] if page else None
+        return page
+
+    def paginate_ranked(self, queryset, request, size):
+        try:
+            self.offset = max(int(request.query_params[self.offset_query_param]), 0)
+        except (KeyError, ValueError):
+            self.offset = 0
+        page = list(queryset[self.offset:self.offset + size + 1])
+        self.has_next = len(page) > size
+        self.offset += size
+        return page[:size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.offset is not None:
+            return replace_query_param(url, self.offset_query_param, self.offset)
+        cursor = encode_cursor(getattr(self.last, self.field), self.last.pk)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_first_link(self):
+        url = remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return remove_query_param(url, self.offset_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
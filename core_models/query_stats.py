@@ -0,0 +1,53 @@
+import re
+import time
+from collections import Counter
+
+# Учёт SQL-запросов в пределах одного запроса к приложению:
+# число запросов, суммарное время и повторяющиеся запросы (признак N+1).
+# Запросы с разными параметрами и разной длиной IN (...) считаются одним отпечатком.
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    sql = IN_LIST.sub('(...)', sql)
+    sql = NUMBER.sub('N', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    # Используется как connection.execute_wrapper
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+def query_budget(limit):
+    # Бюджет запросов для функциональных представлений;
+    # у классов — атрибут query_budget
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+    if view_class is not None:
+        return getattr(view_class, 'query_budget', None)
+    return getattr(view, 'query_budget', None)
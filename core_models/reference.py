@@ -0,0 +1,183 @@
+import threading
+import time
+
+import django_filters
+from asgiref.sync import sync_to_async
+from django import forms
+from django.db import connections
+from rest_framework import serializers
+
+from .models import Category, Skill
+from .versions import get_version
+
+# Справочники (категории, навыки) в памяти процесса. Таблицы маленькие и почти
+# не меняются, а читаются на каждой форме, в сериализаторах и фильтрах API.
+# Изменение справочника увеличивает его версию в общем кэше (core_models.versions);
+# процесс сверяет версию не чаще раза в CHECK_INTERVAL секунд и при расхождении
+# перечитывает таблицу целиком. В процессе, где произошло изменение, копия
+# сбрасывается сразу после коммита (core_models/signals.py).
+# Прочитанное внутри транзакции может включать незакоммиченные строки, поэтому
+# такая копия не сохраняется; не сохраняется она и без кэша версий.
+# Объекты общие для всех потоков процесса — изменять их нельзя.
+CHECK_INTERVAL = 1.0
+
+
+class ReferenceCache:
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self._lock = threading.Lock()
+        self._data = None
+        self._loaded_version = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        objects = list(self.model._default_manager.order_by('pk'))
+        return {
+            'list': objects,
+            'by_pk': {obj.pk: obj for obj in objects},
+            'by_name': {obj.name: obj for obj in objects},
+        }
+
+    def _fresh(self):
+        # Копия, версию которой недавно сверяли, или None
+        data = self._data
+        if data is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL:
+            return data
+        return None
+
+    def _current(self):
+        data = self._fresh()
+        if data is not None:
+            return data
+        now = time.monotonic()
+        with self._lock:
+            if self._data is not None and now - self._checked_at < CHECK_INTERVAL:
+                return self._data
+            version = get_version(self.version)
+            if self._data is not None and version is not None and version == self._loaded_version:
+                self._checked_at = now
+                return self._data
+            data = self._load()
+            if version is not None and not connections[self.model._default_manager.db].in_atomic_block:
+                self._data, self._loaded_version, self._checked_at = data, version, now
+            return data
+
+    def __deepcopy__(self, memo):
+        # Один объект на процесс: поля форм и сериализаторов копируют свои аргументы
+        return self
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def all(self):
+        return self._current()['list']
+
+    def get(self, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        return self._current()['by_pk'].get(pk)
+
+    async def aget(self, pk):
+        # В асинхронном представлении: пока копия свежая, без перехода в поток
+        data = self._fresh()
+        if data is None:
+            return await sync_to_async(self.get)(pk)
+        try:
+            return data['by_pk'].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def by_name(self):
+        return self._current()['by_name']
+
+
+categories = ReferenceCache(Category, 'categories')
+skills = ReferenceCache(Skill, 'skills')
+
+
+# Поля форм и сериализаторов, которые берут варианты и проверяют значения по справочнику
+
+class ReferenceChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.reference.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.reference.all()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.reference.all())
+
+
+class ReferenceChoiceMixin:
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, *args, reference, **kwargs):
+        self.reference = reference
+        kwargs.setdefault('queryset', reference.model._default_manager.all())
+        super().__init__(*args, **kwargs)
+
+
+class ReferenceChoiceField(ReferenceChoiceMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.reference.model):
+            value = value.pk
+        self.validate_no_null_characters(value)
+        obj = self.reference.get(value)
+        if obj is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return obj
+
+
+class ReferenceMultipleChoiceField(ReferenceChoiceMixin, forms.ModelMultipleChoiceField):
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        objects = []
+        for pk in value:
+            self.validate_no_null_characters(pk)
+            obj = self.reference.get(pk)
+            if obj is None:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_choice'], code='invalid_choice', params={'value': pk},
+                )
+            objects.append(obj)
+        return objects
+
+
+class ReferencePrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', reference.model._default_manager.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.reference.get(data)
+        if obj is None:
+            try:
+                int(data)
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class ReferenceChoiceFilter(django_filters.ModelChoiceFilter):
+    field_class = ReferenceChoiceField
+
+
+class ReferenceMultipleChoiceFilter(django_filters.ModelMultipleChoiceFilter):
+    field_class = ReferenceMultipleChoiceField
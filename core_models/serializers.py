@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Category, Skill, Notification, Review
 from django.contrib.auth import get_user_model
@@ -5,6 +6,39 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+class EagerLoadingMixin:
+    # Сериализатор сам объявляет связи, которые читает:
+    # select_related_fields — FK/OneToOne, prefetch_related_fields — обратные и M2M.
+    # Если связь выводится вложенным сериализатором с тем же миксином,
+    # его связи подтягиваются в Prefetch автоматически.
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def nested_serializer(cls, lookup):
+        for name, field in cls._declared_fields.items():
+            if (field.source or name) == lookup:
+                return getattr(field, 'child', field)
+        return None
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        prefetches = []
+        for lookup in cls.prefetch_related_fields:
+            nested = cls.nested_serializer(lookup) if isinstance(lookup, str) else None
+            if isinstance(nested, EagerLoadingMixin):
+                related_model = queryset.model._meta.get_field(lookup).related_model
+                lookup = Prefetch(lookup, queryset=nested.setup_eager_loading(
+                    related_model._default_manager.all()
+                ))
+            prefetches.append(lookup)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -24,7 +58,9 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('reviewer', 'reviewed')
+
     reviewer = serializers.StringRelatedField(read_only=True)
     reviewed = serializers.StringRelatedField(read_only=True)
 
@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import reference
+from .counters import incr_unread_notifications
+from .models import Category, Notification, Skill
+from .versions import bump_version
+
+# Отправляется после создания уведомлений: по одному (post_save)
+# или пачкой через bulk_create, где post_save не срабатывает.
+# Аргументы: notifications — список созданных объектов.
+notifications_created = Signal()
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    if created:
+        notifications_created.send(sender=Notification, notifications=[instance])
+
+
+@receiver(notifications_created)
+def update_unread_counters(sender, notifications, **kwargs):
+    per_user = Counter(n.user_id for n in notifications if not n.is_read)
+    for user_id, count in per_user.items():
+        incr_unread_notifications(user_id, count)
+
+
+# Справочники: новая версия для всех процессов (кэш страниц, core_models.reference)
+# и сброс копии в этом процессе после коммита
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def categories_changed(sender, **kwargs):
+    bump_version('categories')
+    transaction.on_commit(reference.categories.invalidate)
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def skills_changed(sender, **kwargs):
+    bump_version('skills')
+    transaction.on_commit(reference.skills.invalidate)
@@ -0,0 +1,79 @@
+import importlib
+import re
+import sys
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, connections
+from django.dispatch import receiver
+from django.urls import clear_url_caches, resolve
+
+from .benchmarks import local_services, stub_templates  # noqa: F401
+from .query_stats import QueryStats, get_query_budget
+
+# Проверка планов запросов в тестах: EXPLAIN горячих запросов не должен
+# содержать полного просмотра таблицы. На PostgreSQL последовательное
+# сканирование отключается для теста, иначе на пустых таблицах планировщик
+# всегда выбирает его.
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)\s*$', re.MULTILINE)
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class QueryPlanMixin:
+    def explain(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def full_scans(self, queryset):
+        connection = connections[queryset.db]
+        plan = self.explain(queryset)
+        pattern = {'sqlite': SQLITE_FULL_SCAN, 'postgresql': POSTGRES_FULL_SCAN}.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f'Разбор EXPLAIN для {connection.vendor} не поддерживается')
+        tables = set(connection.introspection.table_names())
+        return plan, [table for table in pattern.findall(plan) if table in tables]
+
+    def assertNoFullScan(self, queryset):
+        plan, scans = self.full_scans(queryset)
+        self.assertFalse(scans, f'Полный просмотр таблиц {scans}:\n{plan}')
+
+
+class QueryBudgetMixin:
+    # Запрос через тестовый клиент с проверкой бюджета запросов представления
+    # (атрибут query_budget класса или декоратор query_budget)
+    def assertQueryBudget(self, method, url, data=None, **extra):
+        view = resolve(urlsplit(url).path).func
+        budget = get_query_budget(view)
+        self.assertIsNotNone(budget, f'У представления для {url} не задан query_budget')
+
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = getattr(self.client, method)(url, data, **extra)
+
+        self.assertLessEqual(
+            stats.count, budget,
+            f'{method.upper()} {url}: {stats.count} запросов при бюджете {budget}\n'
+            + '\n'.join(f'{count} x {sql}' for sql, count in stats.fingerprints.most_common())
+        )
+        return response
+
+
+# override_settings(ASYNC_HTMX_VIEWS=...) в тестах: версия представления
+# выбирается при загрузке URLconf (core_models.views.select_view), поэтому
+# модули urls с такими эндпоинтами перезагружаются, а за ними корневой URLconf,
+# в котором закэшированы их маршруты
+HTMX_URLCONFS = ('employers.urls', 'jobseekers.urls', 'messenger.urls')
+
+
+@receiver(setting_changed)
+def reload_htmx_urls(setting, **kwargs):
+    if setting != 'ASYNC_HTMX_VIEWS':
+        return
+    for name in (*HTMX_URLCONFS, settings.ROOT_URLCONF):
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    clear_url_caches()
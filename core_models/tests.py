@@ -1,3 +1,275 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import URLPattern, get_resolver
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from employers.forms import VacancyForm
+from employers.models import Company, Vacancy
+from employers.serializers import VacancyCreateUpdateSerializer
+from jobseekers.models import JobseekerProfile, JobseekerSkill
+from . import counters, reference, versions
+from .autocomplete import autocomplete_skills
+from .consumers import NotificationFanoutConsumer
+from .models import Category, Notification, Review, Skill, User
+from .notifications import FANOUT_CHANNEL, fan_out, notify
+from .query_stats import fingerprint, get_query_budget
+from .signals import notifications_created
+from .testing import QueryBudgetMixin, QueryPlanMixin, local_services, stub_templates
+from .views import ReviewViewSet
+
+BUDGETED_NAMESPACES = ('core', 'jobseekers', 'employes', 'messenger')
+
+
+class NotificationQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', role='jobseeker')
+
+    def test_notification_list(self):
+        self.assertNoFullScan(Notification.objects.filter(user=self.user).order_by('-created_at')[:20])
+
+    def test_unread_count(self):
+        self.assertNoFullScan(Notification.objects.filter(user=self.user, is_read=False))
+
+
+class QueryBudgetDeclarationTests(TestCase):
+    def test_every_view_has_budget(self):
+        missing = []
+        for namespace in BUDGETED_NAMESPACES:
+            _, resolver = get_resolver().namespace_dict[namespace]
+            for pattern in resolver.url_patterns:
+                if isinstance(pattern, URLPattern) and get_query_budget(pattern.callback) is None:
+                    missing.append(f'{namespace}:{pattern.name}')
+        self.assertFalse(missing, f'Не задан query_budget: {missing}')
+
+    def test_fingerprint_collapses_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s) LIMIT 5'),
+        )
+
+
+@stub_templates
+@local_services
+class DashboardQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', role='employer')
+        Notification.objects.bulk_create([
+            Notification(user=cls.user, title=f'Уведомление {i}', message='Текст') for i in range(20)
+        ])
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        response = self.assertQueryBudget('get', '/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+
+@stub_templates
+@local_services
+class HomePageCacheTests(TestCase):
+    def setUp(self):
+        caches['pages'].clear()
+
+    def test_home_is_cached_until_category_changes(self):
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/')['X-Page-Cache'], 'hit')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='IT')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'miss')
+
+
+
+@local_services
+class FanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(5)])
+        cls.user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        caches['counters'].clear()
+        self.batches = []
+        notifications_created.connect(self.collect_batch)
+        self.addCleanup(notifications_created.disconnect, self.collect_batch)
+
+    def collect_batch(self, sender, notifications, **kwargs):
+        self.batches.append(notifications)
+
+    def test_batches_and_signal(self):
+        with self.assertNumQueries(3 * 3):  # на пачку: SAVEPOINT, INSERT, RELEASE
+            result = fan_out(self.user_ids, 'Привет, {name}', 'Вакансия {vacancy}', context={'vacancy': 'Python'},
+                             contexts={user_id: {'name': f'user{n}'} for n, user_id in enumerate(self.user_ids)},
+                             batch_size=2)
+        self.assertEqual(result['created'], 5)
+        self.assertEqual([len(batch) for batch in self.batches], [2, 2, 1])
+        self.assertEqual(
+            list(Notification.objects.order_by('user_id').values_list('title', 'message'))[:2],
+            [('Привет, user0', 'Вакансия Python'), ('Привет, user1', 'Вакансия Python')],
+        )
+
+    def test_counters_incremented_after_commit(self):
+        for user_id in self.user_ids:
+            self.assertEqual(counters.get_unread_notifications(user_id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out(self.user_ids, 'Уведомление', 'Текст', batch_size=2)
+            # До коммита счётчики не меняются: откат не оставит лишних единиц
+            self.assertEqual(caches['counters'].get(counters.KEY.format(self.user_ids[0])), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out(self.user_ids[:1], 'Уведомление', 'Текст')
+        self.assertEqual(
+            [caches['counters'].get(counters.KEY.format(user_id)) for user_id in self.user_ids], [2, 1, 1, 1, 1],
+        )
+
+    def test_notify_small_set_inline(self):
+        notify(self.user_ids, 'Уведомление', 'Текст')
+        self.assertEqual(Notification.objects.count(), 5)
+
+    @mock.patch('core_models.notifications.FANOUT_INLINE_LIMIT', 2)
+    def test_notify_large_set_inline_without_worker(self):
+        # Воркер не включён: задание некому забрать, уведомления пишутся в запросе
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(self.user_ids, 'Уведомление', 'Текст')
+            self.assertEqual(Notification.objects.count(), 5)
+        with self.assertRaises(asyncio.TimeoutError):
+            async_to_sync(asyncio.wait_for)(get_channel_layer().receive(FANOUT_CHANNEL), 0.1)
+
+    @mock.patch('core_models.notifications.FANOUT_INLINE_LIMIT', 2)
+    @override_settings(NOTIFICATIONS_FANOUT_WORKER=True)
+    def test_notify_large_set_in_background(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            notify(self.user_ids, 'Вакансия {title} закрыта', 'Текст', context={'title': 'Python'})
+        # До коммита ни уведомлений, ни задания воркеру
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+
+        event = async_to_sync(get_channel_layer().receive)(FANOUT_CHANNEL)
+        self.assertEqual(event['user_ids'], self.user_ids)
+        NotificationFanoutConsumer().notifications_fanout(event)
+        self.assertEqual(set(Notification.objects.values_list('title', flat=True)), {'Вакансия Python закрыта'})
+        self.assertEqual(Notification.objects.count(), 5)
+
+    @mock.patch('core_models.notifications.FANOUT_INLINE_LIMIT', 2)
+    @mock.patch('core_models.notifications.fan_out_in_background', side_effect=OSError)
+    @override_settings(NOTIFICATIONS_FANOUT_WORKER=True)
+    def test_notify_without_worker_runs_inline(self, background):
+        with self.assertLogs('core_models.notifications', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            notify(self.user_ids, 'Уведомление', 'Текст')
+        self.assertTrue(background.called)
+        self.assertEqual(Notification.objects.count(), 5)
+
+
+@local_services
+class ReferenceCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='IT')
+        self.skill = Skill.objects.create(name='Python')
+        reference.categories.invalidate()
+        reference.skills.invalidate()
+
+    def tearDown(self):
+        reference.categories.invalidate()
+        reference.skills.invalidate()
+
+    def test_lookups_read_table_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(reference.categories.all(), [self.category])
+            self.assertEqual(reference.categories.get(str(self.category.pk)), self.category)
+            self.assertIsNone(reference.categories.get('abc'))
+            self.assertEqual(reference.categories.by_name()['IT'], self.category)
+
+    def test_save_resets_local_copy(self):
+        reference.skills.all()
+        Skill.objects.create(name='Django')
+        self.assertEqual([skill.name for skill in reference.skills.all()], ['Python', 'Django'])
+
+    def test_version_change_from_other_process(self):
+        reference.categories.all()
+        # Другой процесс изменил справочник: в этом процессе копия та же,
+        # но после CHECK_INTERVAL версия в общем кэше уже другая
+        Category.objects.filter(pk=self.category.pk).update(name='Дизайн')
+        versions._bump('categories')
+        self.assertEqual(reference.categories.all()[0].name, 'IT')
+        reference.categories._checked_at = 0
+        self.assertEqual(reference.categories.all()[0].name, 'Дизайн')
+
+    def test_api_and_serializers_use_cache(self):
+        self.client.get('/api/categories/')
+        self.client.get('/api/skills/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/categories/').json(), [{'id': self.category.pk, 'name': 'IT'}])
+            self.assertEqual(self.client.get(f'/api/skills/{self.skill.pk}/').json()['name'], 'Python')
+            self.assertEqual(self.client.get('/api/skills/0/').status_code, 404)
+            serializer = VacancyCreateUpdateSerializer(data={
+                'title': 'Разработчик', 'description': 'Описание', 'requirements': 'Требования',
+                'location': 'Бишкек', 'category': self.category.pk, 'skills': [self.skill.pk],
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            form = VacancyForm(data={
+                'title': 'Разработчик', 'description': 'Описание', 'requirements': 'Требования',
+                'location': 'Бишкек', 'category': self.category.pk, 'skills': [self.skill.pk],
+            })
+            self.assertTrue(form.is_valid(), form.errors)
+            self.assertEqual(len(form.fields['skills'].choices), 1)
+        self.assertFalse(VacancyForm(data={'skills': [0]}).is_valid())
+
+
+@local_services
+class SkillAutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ['Python', 'PyTorch', 'PHP', 'Machine Learning', 'ASP.NET', 'Сетевое администрирование', 'Ёмкостное планирование']
+        cls.skills = {name: Skill.objects.create(name=name) for name in names}
+        user = User.objects.create(username='jobseeker', role='jobseeker')
+        profile = JobseekerProfile.objects.create(user=user)
+        JobseekerSkill.objects.create(profile=profile, skill=cls.skills['PyTorch'])
+        company = Company.objects.create(user=User.objects.create(username='employer', role='employer'), name='Компания')
+        vacancy = Vacancy.objects.create(company=company, title='ML', description='-', requirements='-', location='Бишкек')
+        vacancy.skills.add(cls.skills['PyTorch'], cls.skills['Machine Learning'])
+
+    def names(self, query, limit=10):
+        return [skill.name for skill in autocomplete_skills(query, limit)]
+
+    def test_popular_skills_first(self):
+        self.assertEqual(self.names('py'), ['PyTorch', 'Python'])
+        self.assertEqual(self.names('p', 2), ['PyTorch', 'PHP'])
+
+    def test_word_starts_case_and_script(self):
+        self.assertEqual(self.names('LEARN'), ['Machine Learning'])
+        self.assertEqual(self.names('net'), ['ASP.NET'])
+        self.assertEqual(self.names('емк'), ['Ёмкостное планирование'])
+        # Латинские c/e/o в запросе совпадают с кириллическими буквами названия
+        self.assertEqual(self.names('ceт'), ['Сетевое администрирование'])
+        # Запрос набран в русской раскладке
+        self.assertEqual(self.names('знер'), ['Python'])
+        self.assertEqual(self.names('rust'), [])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/skills/autocomplete/', {'q': 'py', 'limit': 1})
+        self.assertEqual(response.json(), [{'id': self.skills['PyTorch'].pk, 'name': 'PyTorch'}])
+        self.assertEqual(self.client.get('/api/skills/autocomplete/', {'limit': 'x'}).status_code, 400)
+
+
+class ReviewViewSetQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'user{i}') for i in range(20)]
+        Review.objects.bulk_create([
+            Review(reviewer=reviewer, reviewed=reviewed, rating=5)
+            for reviewer in cls.users[:10] for reviewed in cls.users[10:]
+        ])
+
+    def test_list_queries_do_not_grow(self):
+        request = APIRequestFactory().get('/reviews/')
+        force_authenticate(request, user=self.users[0])
+        with self.assertNumQueries(1):
+            response = ReviewViewSet.as_view({'get': 'list'})(request)
+            response.render()
+        self.assertEqual(len(response.data), 100)
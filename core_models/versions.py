@@ -0,0 +1,57 @@
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Версии наборов данных в общем кэше 'counters'. Любое изменение данных
+# увеличивает версию, так что ETag и ключи кэша, построенные на версии,
+# устаревают сразу у всех процессов. Потерянный ключ создаётся заново
+# от текущего времени, чтобы не повторить одну из прежних версий.
+KEY = 'version:{}'
+
+
+def _cache():
+    return caches['counters']
+
+
+def _initial():
+    return time.time_ns()
+
+
+def get_versions(*names):
+    keys = {KEY.format(name): name for name in names}
+    try:
+        versions = _cache().get_many(keys)
+        for key in keys.keys() - versions.keys():
+            _cache().add(key, _initial(), None)
+            versions[key] = _cache().get(key)
+    except Exception:
+        logger.warning('Кэш версий недоступен', exc_info=True)
+        return None
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(name):
+    versions = get_versions(name)
+    return None if versions is None else versions[name]
+
+
+def _bump(name):
+    key = KEY.format(name)
+    try:
+        try:
+            _cache().incr(key)
+        except ValueError:
+            _cache().set(key, _initial(), None)
+    except Exception:
+        logger.warning('Не удалось обновить версию %s', name, exc_info=True)
+
+
+def bump_version(*names):
+    # Версия меняется после коммита: иначе параллельный запрос успеет
+    # закэшировать старые данные под новой версией
+    for name in names:
+        transaction.on_commit(lambda name=name: _bump(name))
@@ -1,41 +1,57 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
+from django.http import Http404
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, CreateView
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .autocomplete import autocomplete_skills
+from .counters import decr_unread_notifications, get_unread_notifications
 from .forms import CustomUserCreationForm
 from .models import Category
 from .models import Skill, Notification, Review
+from .page_cache import VersionedPageCacheMixin, cached_fragment
+from .reference import categories, skills
 from .serializers import CategorySerializer, SkillSerializer, NotificationSerializer, ReviewSerializer
+from .versions import get_versions
 
 
 class CustomLoginView(LoginView):
+    query_budget = 5
     template_name = 'core_models/login.html'
     # redirect_authenticated_user = True
 
 
-class HomeView(TemplateView):
+class HomeView(VersionedPageCacheMixin, TemplateView):
+    query_budget = 2
     template_name = 'core_models/home.html'
+    page_cache_versions = ('vacancies',)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = categories.all()
         try:
             from employers.models import Vacancy
-            context['recent_vacancies'] = Vacancy.objects.filter(is_active=True)[:8]
+            context['recent_vacancies'] = cached_fragment('recent_vacancies', ('vacancies',), lambda: list(
+                Vacancy.objects.filter(is_active=True).select_related('company').order_by('-created_at')[:8]
+            ))
         except:
             context['recent_vacancies'] = []
         return context
 
 
 class RegisterView(CreateView):
+    query_budget = 12
     form_class = CustomUserCreationForm
     template_name = 'core_models/register.html'
     success_url = reverse_lazy('core:home')
@@ -53,6 +69,7 @@ class RegisterView(CreateView):
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
+    query_budget = 8
     template_name = 'core_models/dashboard.html'
 
     def get_context_data(self, **kwargs):
@@ -68,21 +85,94 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         else:
             context['role_name'] = 'Не выбран'
 
-        context['unread_notifications'] = user.notifications.filter(is_read=False).count()
+        context['unread_notifications'] = get_unread_notifications(user.id)
         return context
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+def select_view(name, sync_view, async_view):
+    # Версия HTMX-эндпоинта для urls.py: асинхронная, если имя синхронного
+    # представления есть в ASYNC_HTMX_VIEWS. Выбор делается один раз, при загрузке URLconf
+    return async_view if name in getattr(settings, 'ASYNC_HTMX_VIEWS', ()) else sync_view
+
+
+class EagerLoadingViewSetMixin:
+    # Применяет к queryset связи, объявленные сериализатором (EagerLoadingMixin)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+
+class VersionETagMixin:
+    # Условный GET для read-only API: ETag строится из версий данных
+    # (core_models.versions), адреса и формата ответа, без запросов к БД.
+    # Пока версии не изменились, повторный запрос получает 304.
+    etag_versions = ()
+
+    def get_etag(self, request, *args, **kwargs):
+        versions = get_versions(*self.etag_versions)
+        if versions is None:
+            return None
+        raw = '|'.join([
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            *(f'{name}:{versions[name]}' for name in self.etag_versions),
+        ])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def conditional(self, handler, request, *args, **kwargs):
+        return condition(etag_func=self.get_etag)(handler)(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class ReferenceViewSetMixin:
+    # Справочник отдаётся из памяти процесса (core_models.reference), без запросов к БД
+    reference = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_serializer(self.reference.all(), many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.reference.get(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(request, obj)
+        return Response(self.get_serializer(obj).data)
+
+
+class CategoryViewSet(ReferenceViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budget = 3
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    reference = categories
 
 
-class SkillViewSet(viewsets.ReadOnlyModelViewSet):
+class SkillViewSet(ReferenceViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budget = 3
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
+    reference = skills
+
+    # Подсказки для поля ввода навыка: ?q=<префикс>&limit=<до 20>
+    @action(detail=False)
+    def autocomplete(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'limit': ['Ожидается целое число']}, status=400)
+        found = autocomplete_skills(request.query_params.get('q', ''), limit)
+        return Response(self.get_serializer(found, many=True).data)
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    query_budget = 5
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -93,12 +183,14 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        if updated:
+            decr_unread_notifications(notification.user_id)
         return Response({'status': 'ok'})
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
+    query_budget = 8
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
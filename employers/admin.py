@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Company, Vacancy, Application
+from .models import Company, Vacancy, Application, VacancyStats, CompanyStats
 
 
 @admin.register(Company)
@@ -28,3 +28,15 @@ class ApplicationAdmin(admin.ModelAdmin):
     search_fields = ('jobseeker__user__username', 'vacancy__title', 'vacancy__company__name')
     raw_id_fields = ('jobseeker', 'vacancy')
     readonly_fields = ('applied_at',)
+
+
+@admin.register(VacancyStats)
+class VacancyStatsAdmin(admin.ModelAdmin):
+    list_display = ('vacancy', 'total', 'sent', 'viewed', 'interview', 'rejected', 'hired', 'views')
+    raw_id_fields = ('vacancy',)
+
+
+@admin.register(CompanyStats)
+class CompanyStatsAdmin(admin.ModelAdmin):
+    list_display = ('company', 'total', 'sent', 'new_since_visit', 'views', 'last_visit_at')
+    raw_id_fields = ('company',)
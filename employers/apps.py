@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from .search import repair_search_index as repair
+    repair(connections[using])
 
 
 class EmployersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'employers'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(repair_search_index, sender=self)
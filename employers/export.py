@@ -0,0 +1,115 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Application, Vacancy
+
+# Потоковая выгрузка вакансий и откликов в CSV/JSONL.
+# Строки читаются курсором (на PostgreSQL — серверным) пачками по CHUNK_SIZE
+# и сразу превращаются в текст, поэтому память не зависит от числа строк.
+# Навыки вакансий подгружаются одним запросом на пачку.
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+VACANCY_FIELDS = [
+    'id', 'title', 'company', 'category', 'location', 'salary_from', 'salary_to',
+    'description', 'requirements', 'responsibilities', 'skills', 'created_at', 'updated_at',
+]
+APPLICATION_FIELDS = [
+    'id', 'vacancy_id', 'vacancy', 'status', 'applied_at', 'first_name', 'last_name',
+    'email', 'phone_number', 'desired_position', 'experience_years', 'cover_letter',
+]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def vacancy_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    queryset = Vacancy.objects.filter(is_active=True) if queryset is None else queryset
+    rows = queryset.order_by('id').values(
+        'id', 'title', 'company__name', 'category__name', 'location', 'salary_from', 'salary_to',
+        'description', 'requirements', 'responsibilities', 'created_at', 'updated_at',
+    ).iterator(chunk_size=chunk_size)
+
+    through = Vacancy.skills.through
+    for chunk in _chunks(rows, chunk_size):
+        # Навыки только вакансий пачки: диапазон id захватил бы и вакансии
+        # между ними, не попавшие в выборку (другие компании, закрытые)
+        skills = {}
+        for vacancy_id, name in through.objects.filter(
+                vacancy_id__in=[row['id'] for row in chunk]
+        ).order_by('vacancy_id', 'skill__name').values_list('vacancy_id', 'skill__name'):
+            skills.setdefault(vacancy_id, []).append(name)
+        for row in chunk:
+            row['company'] = row.pop('company__name')
+            row['category'] = row.pop('category__name')
+            row['skills'] = skills.get(row['id'], [])
+            yield row
+
+
+def application_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    queryset = Application.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values(
+        'id', 'vacancy_id', 'vacancy__title', 'status', 'applied_at',
+        'jobseeker__user__first_name', 'jobseeker__user__last_name', 'jobseeker__user__email',
+        'jobseeker__phone_number', 'jobseeker__desired_position', 'jobseeker__experience_years',
+        'cover_letter',
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield {
+            'id': row['id'],
+            'vacancy_id': row['vacancy_id'],
+            'vacancy': row['vacancy__title'],
+            'status': row['status'],
+            'applied_at': row['applied_at'],
+            'first_name': row['jobseeker__user__first_name'],
+            'last_name': row['jobseeker__user__last_name'],
+            'email': row['jobseeker__user__email'],
+            'phone_number': str(row['jobseeker__phone_number'] or ''),
+            'desired_position': row['jobseeker__desired_position'],
+            'experience_years': row['jobseeker__experience_years'],
+            'cover_letter': row['cover_letter'],
+        }
+
+
+class _Line:
+    # csv.writer пишет в объект с write(); возвращаем строку вместо записи
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return '; '.join(value)
+    if value is None:
+        return ''
+    return value
+
+
+def render_lines(fields, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([_csv_value(row[field]) for field in fields])
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f'Неизвестный формат выгрузки: {fmt}')
+
+
+def export_vacancies(fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    return render_lines(VACANCY_FIELDS, vacancy_rows(queryset, chunk_size), fmt)
+
+
+def export_applications(fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    return render_lines(APPLICATION_FIELDS, application_rows(queryset, chunk_size), fmt)
@@ -0,0 +1,111 @@
+import hashlib
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+from django.db.models.functions import Trim, Upper
+
+from core_models import reference
+from core_models.page_cache import cached_fragment, normalize_query
+from .models import Vacancy
+from .search import search_vacancies
+
+# Фасеты страницы поиска вакансий: число вакансий по категориям, городам
+# и порогам зарплаты для текущего набора фильтров.
+# Все счётчики берутся из одного сгруппированного запроса по
+# (категория, город, интервал зарплаты) с учётом только поискового запроса q.
+# Остальные фильтры применяются к группам в Python, причём к каждому фасету —
+# все фильтры, кроме его собственного: выбранная категория не обнуляет
+# счётчики соседних категорий.
+# Результат кэшируется под версией 'vacancies' для нормализованного набора фильтров.
+SALARY_THRESHOLDS = [20000, 40000, 60000, 80000, 100000, 150000, 200000]
+TOP_LOCATIONS = 10
+PARAMS = ('q', 'category', 'location', 'salary_min')
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(value):
+    try:
+        return Decimal(value) if value else None
+    except InvalidOperation:
+        return None
+
+
+def _grouped(query, thresholds, location):
+    # Номер интервала зарплаты: 0 — без зарплаты или ниже первого порога,
+    # i — не меньше thresholds[i - 1]
+    bucket = Case(
+        *[When(salary_from__gte=threshold, then=Value(number))
+          for number, threshold in reversed(list(enumerate(thresholds, 1)))],
+        default=Value(0), output_field=IntegerField(),
+    )
+    # Город сравнивает СУБД тем же location__icontains, что и фильтр списка, а
+    # написания города сводятся её же UPPER: SQLite без учёта регистра
+    # сравнивает только латиницу, и «бишкек» с «Бишкек» не совпадает ни там, ни тут
+    in_location = Value(True)
+    if location:
+        in_location = Case(When(location__icontains=location, then=Value(True)),
+                           default=Value(False), output_field=BooleanField())
+    queryset = search_vacancies(Vacancy.objects.filter(is_active=True), query)
+    return list(
+        queryset.order_by().annotate(bucket=bucket, in_location=in_location, city_key=Upper(Trim('location')))
+        .values('category_id', 'location', 'city_key', 'in_location', 'bucket').annotate(count=Count('id'))
+        .values_list('category_id', 'location', 'city_key', 'in_location', 'bucket', 'count')
+    )
+
+
+def _build(query, category, location, salary_min):
+    thresholds = sorted(set(SALARY_THRESHOLDS) | ({salary_min} if salary_min is not None else set()))
+    min_bucket = bisect_right(thresholds, salary_min) if salary_min is not None else 0
+
+    categories, locations, buckets = defaultdict(int), defaultdict(int), defaultdict(int)
+    spellings = {}
+    total = 0
+    for category_id, city, key, in_location, bucket, count in _grouped(query, thresholds, location):
+        in_category = category is None or category_id == category
+        in_salary = bucket >= min_bucket
+        if in_location and in_salary:
+            categories[category_id] += count
+        if in_category and in_salary:
+            locations[key] += count
+            spellings.setdefault(key, city.strip())
+        if in_category and in_location:
+            buckets[bucket] += count
+        if in_category and in_location and in_salary:
+            total += count
+
+    names = {obj.pk: obj.name for obj in reference.categories.all()}
+    top_locations = sorted(locations.items(), key=lambda item: (-item[1], item[0]))[:TOP_LOCATIONS]
+    return {
+        'total': total,
+        'categories': sorted(
+            ({'id': pk, 'name': names[pk], 'count': count} for pk, count in categories.items() if pk in names),
+            key=lambda item: (-item['count'], item['name']),
+        ),
+        'locations': [{'name': spellings[key], 'count': count} for key, count in top_locations if key],
+        # Пороги накопительные, как фильтр salary_min: «от 60 000» включает и более высокие зарплаты
+        'salary': [
+            {'from': threshold, 'count': sum(count for bucket, count in buckets.items() if bucket >= number)}
+            for number, threshold in enumerate(thresholds, 1)
+            if threshold in SALARY_THRESHOLDS
+        ],
+    }
+
+
+def vacancy_facets(params):
+    query = (params.get('q') or '').strip()
+    category = _int(params.get('category'))
+    location = (params.get('location') or '').strip()
+    salary_min = _decimal(params.get('salary_min'))
+    key = hashlib.md5(normalize_query(params, PARAMS).encode()).hexdigest()
+    return cached_fragment(
+        f'vacancy_facets:{key}', ('vacancies',),
+        lambda: _build(query, category, location, salary_min),
+    )
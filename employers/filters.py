@@ -0,0 +1,21 @@
+import django_filters
+
+from core_models import reference
+from .models import Vacancy
+from .search import search_vacancies
+
+
+class VacancyFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method='filter_search')
+    location = django_filters.CharFilter(lookup_expr='icontains')
+    salary_min = django_filters.NumberFilter(field_name='salary_from', lookup_expr='gte')
+    category = reference.ReferenceChoiceFilter(reference=reference.categories)
+    skills = reference.ReferenceMultipleChoiceFilter(reference=reference.skills)
+
+    class Meta:
+        model = Vacancy
+        fields = ['category', 'company', 'location', 'salary_min', 'skills']
+
+    def filter_search(self, queryset, name, value):
+        # Ранжированный полнотекстовый поиск (см. employers/search.py)
+        return search_vacancies(queryset, value)
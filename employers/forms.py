@@ -0,0 +1,22 @@
+from django import forms
+
+from core_models import reference
+from .models import Vacancy
+
+
+class VacancyForm(forms.ModelForm):
+    # Категории и навыки берутся из справочников в памяти процесса (core_models.reference)
+    category = reference.ReferenceChoiceField(reference=reference.categories, label='Категория')
+    skills = reference.ReferenceMultipleChoiceField(reference=reference.skills, label='Навыки')
+
+    class Meta:
+        model = Vacancy
+        fields = ['title', 'description', 'requirements', 'responsibilities', 'skills',
+                  'salary_from', 'salary_to', 'location', 'experience_years', 'category', 'is_active']
+
+    def _get_validation_exclusions(self):
+        # Категория уже найдена в справочнике: проверка внешнего ключа
+        # в Model.full_clean повторила бы её запросом к БД
+        exclude = super()._get_validation_exclusions()
+        exclude.add('category')
+        return exclude
@@ -0,0 +1,183 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from core_models import reference
+from core_models.versions import bump_version
+from .models import Vacancy, VacancyStats
+from .serializers import VacancyImportSerializer
+
+# Массовый импорт вакансий из CSV/JSONL.
+# Строки проверяются VacancyImportSerializer, категории и навыки разрешаются
+# по названиям через справочники в памяти (core_models.reference), вакансии сопоставляются с уже
+# существующими по (company, external_id) и пишутся одним upsert на пачку,
+# связи с навыками — пачкой в промежуточную таблицу. Ошибочная строка
+# попадает в отчёт и не мешает остальным.
+BATCH_SIZE = 500
+FORMATS = ('csv', 'jsonl')
+UPDATE_FIELDS = [
+    'title', 'description', 'requirements', 'responsibilities', 'salary_from', 'salary_to',
+    'location', 'experience_years', 'category', 'is_active', 'updated_at',
+]
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('json', 'ndjson'):
+        return 'jsonl'
+    return extension if extension in FORMATS else None
+
+
+def read_rows(stream, fmt):
+    # Строки файла нумеруются с 1, в CSV — не считая заголовка
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 1):
+            yield number, row, None
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, None, {'row': [f'Некорректный JSON: {error}']}
+                continue
+            if not isinstance(row, dict):
+                yield number, None, {'row': ['Ожидается JSON-объект']}
+                continue
+            yield number, row, None
+    else:
+        raise ImportFormatError(f'Неизвестный формат импорта: {fmt}')
+
+
+def _skill_names(value):
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        value = value.split(';')
+    return [str(name).strip() for name in value if str(name).strip()]
+
+
+def _category_name(value):
+    return str(value).strip() if value not in (None, '') else None
+
+
+def _import_batch(company, batch, report):
+    categories = reference.categories.by_name()
+    skills = reference.skills.by_name()
+
+    # Один экземпляр сериализатора на пачку: поля строятся один раз,
+    # а не для каждой строки
+    serializer = VacancyImportSerializer()
+    valid = {}
+    for number, row in batch:
+        errors, validated_data = {}, None
+        try:
+            validated_data = serializer.run_validation(row)
+        except ValidationError as error:
+            errors = {field: [str(message) for message in messages] for field, messages in error.detail.items()}
+
+        category = _category_name(row.get('category'))
+        if category is not None and category not in categories:
+            errors['category'] = [f'Категория «{category}» не найдена']
+        names = _skill_names(row.get('skills'))
+        unknown = [name for name in names if name not in skills]
+        if unknown:
+            errors['skills'] = [f'Навыки не найдены: {", ".join(unknown)}']
+
+        external_id = None if errors else validated_data['external_id']
+        if external_id in valid:
+            errors['external_id'] = [f'Повтор external_id {external_id} в строке {valid[external_id]["row"]}']
+        if errors:
+            report['errors'].append({'row': number, 'errors': errors})
+            continue
+
+        data = dict(validated_data)
+        if 'category' in row:
+            data['category_id'] = categories[category].pk if category is not None else None
+        valid[external_id] = {
+            'row': number,
+            'data': data,
+            # None — навыки в строке не указаны, у существующей вакансии они не меняются
+            'skills': [skills[name].pk for name in names] if 'skills' in row else None,
+        }
+
+    if not valid:
+        return
+
+    try:
+        created, updated = _write_batch(company, valid)
+    except DatabaseError as error:
+        # Пачка откатывается целиком, остальные пачки файла продолжают импорт
+        report['errors'].extend({'row': item['row'], 'errors': {'row': [str(error)]}} for item in valid.values())
+        return
+    report['created'] += created
+    report['updated'] += updated
+
+
+def _write_batch(company, valid):
+    with transaction.atomic():
+        existing = {
+            vacancy.external_id: vacancy
+            for vacancy in Vacancy.objects.filter(company=company, external_id__in=valid).select_for_update()
+        }
+        vacancies = []
+        for external_id, item in valid.items():
+            vacancy = existing.get(external_id) or Vacancy(company=company)
+            for field, value in item['data'].items():
+                setattr(vacancy, field, value)
+            vacancies.append(vacancy)
+
+        # Один INSERT ... ON CONFLICT на пачку вместо bulk_update с CASE по каждому полю.
+        # Поля, которых нет в строке, берутся из существующей вакансии и не меняются.
+        Vacancy.objects.bulk_create(
+            vacancies, update_conflicts=True, unique_fields=['company', 'external_id'], update_fields=UPDATE_FIELDS,
+        )
+        created = [vacancy for vacancy in vacancies if vacancy.external_id not in existing]
+        # Сигналы при bulk_create не срабатывают: строки статистики создаём сами
+        VacancyStats.objects.bulk_create([VacancyStats(vacancy=vacancy) for vacancy in created])
+
+        through = Vacancy.skills.through
+        ids = {vacancy.external_id: vacancy.pk for vacancy in vacancies}
+        replaced = [ids[external_id] for external_id, item in valid.items()
+                    if item['skills'] is not None and external_id in existing]
+        if replaced:
+            through.objects.filter(vacancy_id__in=replaced).delete()
+        through.objects.bulk_create([
+            through(vacancy_id=ids[external_id], skill_id=skill_id)
+            for external_id, item in valid.items()
+            for skill_id in dict.fromkeys(item['skills'] or [])
+        ])
+    return len(created), len(vacancies) - len(created)
+
+
+def import_vacancies(company, stream, fmt, batch_size=BATCH_SIZE):
+    started = time.monotonic()
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'errors': []}
+
+    rows = read_rows(stream, fmt)
+    while chunk := list(islice(rows, batch_size)):
+        report['rows'] += len(chunk)
+        batch = []
+        for number, row, errors in chunk:
+            if errors:
+                report['errors'].append({'row': number, 'errors': errors})
+            else:
+                batch.append((number, row))
+        _import_batch(company, batch, report)
+
+    if report['created'] or report['updated']:
+        bump_version('vacancies')
+    report['errors'].sort(key=lambda error: error['row'])
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    report['per_second'] = round(report['rows'] / report['seconds']) if report['seconds'] else report['rows']
+    return report
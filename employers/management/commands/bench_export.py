@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core_models.models import Skill, User
+from core_models.benchmarks import local_services, scratch_database
+from employers.export import CHUNK_SIZE, export_applications, export_vacancies
+from employers.models import Application, Company, Vacancy
+from jobseekers.models import JobseekerProfile
+
+BATCH_SIZE = 5000
+SKILLS_PER_VACANCY = 3
+
+
+class Command(BaseCommand):
+    help = ('Замер потоковой выгрузки: растит таблицы вакансий и откликов до заданных размеров и '
+            'для каждого печатает время и пик памяти Python (tracemalloc). При постоянной памяти '
+            'пик не растёт вместе с числом строк')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,50000,200000', help='Число строк через запятую')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        # Отдельная временная база: рабочие данные не трогаются. Кэши в памяти
+        # процесса: сигналы сохранения сбрасывают версии страниц
+        with scratch_database(), local_services:
+            fixture = self.create_fixture()
+            created = 0
+            for size in sizes:
+                created = self.fill(fixture, created, size)
+                for name, export, queryset in (
+                    ('vacancies', export_vacancies, Vacancy.objects.all()),
+                    ('applications', export_applications, Application.objects.all()),
+                ):
+                    seconds, peak, lines = self.measure(export, options['format'], queryset, options['chunk_size'])
+                    self.stdout.write(f'{size:>8} {name:12} {seconds:6.2f} с, '
+                                      f'пик памяти {peak / 2 ** 20:6.1f} МБ, строк {lines - 1}')
+
+    def create_fixture(self):
+        employer = User.objects.create(username='employer', role='employer')
+        jobseeker = User.objects.create(username='jobseeker', role='jobseeker', first_name='Айбек')
+        return {
+            'company': Company.objects.create(user=employer, name='Компания'),
+            'profile': JobseekerProfile.objects.create(user=jobseeker, desired_position='Разработчик',
+                                                       phone_number='+996555123456'),
+            'skills': Skill.objects.bulk_create([Skill(name=f'Навык {i}') for i in range(SKILLS_PER_VACANCY)]),
+        }
+
+    def fill(self, fixture, created, size):
+        # Вакансия с навыками и откликом на каждую строку выгрузки
+        through = Vacancy.skills.through
+        while created < size:
+            count = min(BATCH_SIZE, size - created)
+            vacancies = Vacancy.objects.bulk_create([
+                Vacancy(company=fixture['company'], title=f'Вакансия {created + i}', description='Описание ' * 20,
+                        requirements='Требования ' * 10, location='Бишкек', salary_from=1000)
+                for i in range(count)
+            ])
+            through.objects.bulk_create([
+                through(vacancy_id=vacancy.id, skill_id=skill.id)
+                for vacancy in vacancies for skill in fixture['skills']
+            ])
+            Application.objects.bulk_create([
+                Application(jobseeker=fixture['profile'], vacancy=vacancy, cover_letter='Письмо ' * 20)
+                for vacancy in vacancies
+            ])
+            created += count
+        return created
+
+    def measure(self, export, fmt, queryset, chunk_size):
+        lines = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            for _ in export(fmt, queryset, chunk_size):
+                lines += 1
+            return time.perf_counter() - started, tracemalloc.get_traced_memory()[1], lines
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core_models.models import User
+from core_models.benchmarks import local_services, scratch_database
+from employers.models import Company, Vacancy
+from employers.search import search_vacancies
+
+BATCH_SIZE = 5000
+PAGE_SIZE = 12
+
+# Словарь генератора: заголовки и фразы описаний, из которых собираются вакансии
+TITLES = [
+    'Разработчик Python', 'Старший разработчик Java', 'Менеджер по продажам', 'Аналитик данных',
+    'Бухгалтер', 'Дизайнер интерфейсов', 'Тестировщик', 'Водитель категории C',
+    'Оператор колл-центра', 'Системный администратор', 'Продавец-консультант', 'Юрист',
+]
+PHRASES = [
+    'работа в дружной команде', 'опыт разработки от трёх лет', 'знание SQL', 'ведение отчётности',
+    'переговоры с клиентами', 'официальное трудоустройство', 'гибкий график', 'удалённая работа',
+    'обучение за счёт компании', 'работа с первичной документацией', 'поиск новых клиентов',
+    'автоматизация тестирования', 'поддержка пользователей', 'анализ продаж', 'разработка макетов',
+]
+QUERIES = ['разработчик', 'менеджер продаж', 'аналитика данных', 'SQL', 'удалённая работа']
+
+
+class Command(BaseCommand):
+    help = ('Замер поиска вакансий на 10k/100k/1M строк: icontains по трём полям (как до FTS) '
+            'и полнотекстовый индекс. Печатает медиану задержки первой страницы со счётчиком')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help='Размеры таблицы через запятую')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+
+    def handle(self, *args, **options):
+        # Отдельная временная база: рабочие данные не трогаются. Кэши в памяти
+        # процесса: сигналы сохранения сбрасывают версии страниц
+        with scratch_database(), local_services:
+            self.run(options)
+
+    def run(self, options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        rng = random.Random(0)
+        user = User.objects.create(username='bench_employer', role='employer')
+        company = Company.objects.create(user=user, name='Компания')
+        created = 0
+        for size in sizes:
+            started = time.perf_counter()
+            created = self.fill(company, created, size, rng)
+            self.stdout.write(f'{size} вакансий (генерация {time.perf_counter() - started:.1f} с)')
+            for query in QUERIES:
+                before = self.measure(self.before, company, query, options['repeat'])
+                after = self.measure(search_vacancies, company, query, options['repeat'])
+                self.stdout.write(
+                    f'  {query!r:20} icontains {before[0]:8.1f} мс ({before[1]} найдено) | '
+                    f'FTS {after[0]:7.1f} мс ({after[1]} найдено)'
+                )
+
+    def fill(self, company, created, size, rng):
+        # Триггеры FTS срабатывают и на bulk_create: индекс наполняется вместе с таблицей
+        while created < size:
+            count = min(BATCH_SIZE, size - created)
+            Vacancy.objects.bulk_create([
+                Vacancy(
+                    company=company,
+                    title=rng.choice(TITLES),
+                    description='. '.join(rng.sample(PHRASES, 4)).capitalize(),
+                    requirements='. '.join(rng.sample(PHRASES, 2)).capitalize(),
+                    location='Бишкек',
+                )
+                for _ in range(count)
+            ])
+            created += count
+        return created
+
+    def before(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query) | Q(requirements__icontains=query)
+        )
+
+    def measure(self, search, company, query, repeat):
+        # Как страница списка: первые PAGE_SIZE вакансий и общее число для пагинатора
+        queryset = Vacancy.objects.filter(company=company, is_active=True).order_by('-created_at')
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = search(queryset, query)
+            list(found[:PAGE_SIZE])
+            total = found.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), total
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employers.export import CHUNK_SIZE, FORMATS, export_applications, export_vacancies
+from employers.models import Application, Vacancy
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка активных вакансий или откликов в CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['vacancies', 'applications'])
+        parser.add_argument('--format', choices=list(FORMATS), default='jsonl')
+        parser.add_argument('--output', help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument('--company', type=int, action='append', help='id компании (можно несколько)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['dataset'] == 'vacancies':
+            queryset = Vacancy.objects.filter(is_active=True)
+            if options['company']:
+                queryset = queryset.filter(company_id__in=options['company'])
+            lines = export_vacancies(options['format'], queryset, options['chunk_size'])
+        else:
+            queryset = Application.objects.all()
+            if options['company']:
+                queryset = queryset.filter(vacancy__company_id__in=options['company'])
+            lines = export_applications(options['format'], queryset, options['chunk_size'])
+
+        started = time.monotonic()
+        count = 0
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for line in lines:
+                    output.write(line)
+                    count += 1
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+                count += 1
+
+        if options['format'] == 'csv':
+            count -= 1
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {count} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employers.imports import BATCH_SIZE, FORMATS, detect_format, import_vacancies
+from employers.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт вакансий компании из CSV/JSONL с обновлением по external_id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--company', type=int, required=True, help='id компании')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f'Компания {options["company"]} не найдена')
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_vacancies(company, stream, fmt, options['batch_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {report["rows"]}, создано: {report["created"]}, обновлено: {report["updated"]}, '
+            f'ошибок: {len(report["errors"])} за {report["seconds"]} с ({report["per_second"]} строк/с)'
+        ))
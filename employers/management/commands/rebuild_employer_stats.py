@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from employers.models import Company
+from employers.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику откликов компаний и вакансий из таблицы откликов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', help='id компании (можно несколько)')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by('id')
+        if options['company']:
+            companies = companies.filter(id__in=options['company'])
+        rebuild_stats(companies)
+        self.stdout.write(self.style.SUCCESS(f'Статистика пересчитана: {companies.count()} компаний'))
@@ -0,0 +1,236 @@
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from jobseekers.models import JobseekerProfile, JobseekerSkill
+from .models import Vacancy
+
+# Подбор кандидатов к вакансии и вакансий к кандидату.
+# Навыки хранятся разреженными матрицами (строка — резюме/вакансия,
+# столбец — навык), оценка считается векторно сразу по всем строкам.
+# Итоговый балл — взвешенная сумма компонентов в диапазоне [0, 1].
+WEIGHTS = {
+    'skills': 0.6,
+    'salary': 0.2,
+    'location': 0.1,
+    'experience': 0.1,
+}
+MAX_LEVEL = 4
+# Опыт, после которого компонент опыта перестаёт расти, если вакансия его не требует
+EXPERIENCE_CAP = 5
+# Индексы пересобираются не реже раза в INDEX_TTL секунд: изменения в других
+# процессах видны с этой задержкой, изменения в этом — сразу (signals)
+INDEX_TTL = 5 * 60
+
+
+def _location_key(value):
+    return (value or '').strip().lower()
+
+
+def _to_float(values):
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def salary_score(want_from, want_to, offer_from, offer_to):
+    # Пересечение вилок = 1; если кандидат хочет больше, чем предлагают,
+    # балл падает пропорционально разрыву. Неизвестные границы не штрафуются.
+    want = np.where(np.isnan(want_from), want_to, want_from)
+    offer = np.where(np.isnan(offer_to), offer_from, offer_to)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.clip(offer / want, 0.0, 1.0)
+    return np.where(np.isnan(ratio), 1.0, ratio)
+
+
+def experience_score(experience, required):
+    # Требование вакансии указано: доля требуемого опыта (полное совпадение — 1).
+    # Не указано: опыт до EXPERIENCE_CAP лет, как общий плюс кандидату
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(np.isnan(required), experience / EXPERIENCE_CAP,
+                         np.where(required > 0, experience / required, 1.0))
+    return np.clip(ratio, 0.0, 1.0)
+
+
+def location_score(codes, code):
+    # -1: город не указан, -2: город не встречается в индексе
+    if code == -1:
+        return np.full(codes.shape, 0.5)
+    return np.where(codes < 0, 0.5, (codes == code).astype(np.float64))
+
+
+def _top(scores, ids, limit):
+    if not len(scores):
+        return []
+    limit = min(limit, len(scores))
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class SkillIndex:
+    def __init__(self):
+        self.built_at = 0
+        self.skill_columns = {}
+        self.location_codes = {}
+
+    def is_stale(self):
+        return time.monotonic() - self.built_at > INDEX_TTL
+
+    def skill_column(self, skill_id):
+        return self.skill_columns.setdefault(skill_id, len(self.skill_columns))
+
+    def location_code(self, location, create=False):
+        key = _location_key(location)
+        if not key:
+            return -1
+        if create:
+            return self.location_codes.setdefault(key, len(self.location_codes))
+        return self.location_codes.get(key, -2)
+
+    def matrix(self, rows, columns, values, shape):
+        return sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), (np.asarray(rows), np.asarray(columns))),
+            shape=shape,
+        )
+
+
+class CandidateIndex(SkillIndex):
+    def build(self):
+        profiles = list(JobseekerProfile.objects.filter(is_open_to_work=True).values_list(
+            'id', 'desired_salary_from', 'desired_salary_to', 'experience_years', 'user__location'
+        ).order_by('id'))
+        self.ids = np.array([p[0] for p in profiles], dtype=np.int64)
+        rows = {pk: i for i, pk in enumerate(self.ids.tolist())}
+        self.salary_from = _to_float(p[1] for p in profiles)
+        self.salary_to = _to_float(p[2] for p in profiles)
+        self.experience = np.array([p[3] for p in profiles], dtype=np.float64)
+        self.locations = np.array([self.location_code(p[4], create=True) for p in profiles], dtype=np.int64)
+
+        r, c, v = [], [], []
+        for profile_id, skill_id, level in JobseekerSkill.objects.filter(
+                profile__is_open_to_work=True).values_list('profile_id', 'skill_id', 'level').iterator():
+            if profile_id not in rows:
+                continue
+            r.append(rows[profile_id])
+            c.append(self.skill_column(skill_id))
+            v.append(level / MAX_LEVEL)
+        self.skills = self.matrix(r, c, v, (len(self.ids), max(len(self.skill_columns), 1)))
+        self.built_at = time.monotonic()
+        return self
+
+    def score(self, vacancy, skill_ids):
+        columns = [self.skill_columns[s] for s in skill_ids if s in self.skill_columns]
+        if skill_ids:
+            query = np.zeros(self.skills.shape[1])
+            query[columns] = 1.0
+            skills = self.skills @ query / len(skill_ids)
+        else:
+            skills = np.zeros(len(self.ids))
+
+        offer_from, offer_to = _to_float([vacancy.salary_from]), _to_float([vacancy.salary_to])
+        return (
+            WEIGHTS['skills'] * skills
+            + WEIGHTS['salary'] * salary_score(self.salary_from, self.salary_to, offer_from, offer_to)
+            + WEIGHTS['location'] * location_score(self.locations, self.location_code(vacancy.location))
+            + WEIGHTS['experience'] * experience_score(self.experience, _to_float([vacancy.experience_years]))
+        )
+
+    def recommend(self, vacancy, limit=20):
+        skill_ids = list(vacancy.skills.values_list('id', flat=True))
+        return _top(self.score(vacancy, skill_ids), self.ids, limit)
+
+
+class VacancyIndex(SkillIndex):
+    def build(self):
+        vacancies = list(Vacancy.objects.filter(is_active=True).values_list(
+            'id', 'salary_from', 'salary_to', 'location', 'experience_years'
+        ).order_by('id'))
+        self.ids = np.array([v[0] for v in vacancies], dtype=np.int64)
+        rows = {pk: i for i, pk in enumerate(self.ids.tolist())}
+        self.salary_from = _to_float(v[1] for v in vacancies)
+        self.salary_to = _to_float(v[2] for v in vacancies)
+        self.locations = np.array([self.location_code(v[3], create=True) for v in vacancies], dtype=np.int64)
+        self.experience_required = _to_float(v[4] for v in vacancies)
+
+        r, c = [], []
+        through = Vacancy.skills.through
+        for vacancy_id, skill_id in through.objects.filter(
+                vacancy__is_active=True).values_list('vacancy_id', 'skill_id').iterator():
+            if vacancy_id not in rows:
+                continue
+            r.append(rows[vacancy_id])
+            c.append(self.skill_column(skill_id))
+        self.skills = self.matrix(r, c, np.ones(len(r)), (len(self.ids), max(len(self.skill_columns), 1)))
+        self.required = np.asarray(self.skills.sum(axis=1)).ravel()
+        self.built_at = time.monotonic()
+        return self
+
+    def score(self, profile, levels):
+        query = np.zeros(self.skills.shape[1])
+        for skill_id, level in levels.items():
+            if skill_id in self.skill_columns:
+                query[self.skill_columns[skill_id]] = level / MAX_LEVEL
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skills = np.where(self.required > 0, (self.skills @ query) / self.required, 0.0)
+
+        want_from = _to_float([profile.desired_salary_from])
+        want_to = _to_float([profile.desired_salary_to])
+        return (
+            WEIGHTS['skills'] * skills
+            + WEIGHTS['salary'] * salary_score(want_from, want_to, self.salary_from, self.salary_to)
+            + WEIGHTS['location'] * location_score(self.locations, self.location_code(profile.user.location))
+            + WEIGHTS['experience'] * experience_score(float(profile.experience_years), self.experience_required)
+        )
+
+    def recommend(self, profile, limit=20):
+        levels = dict(profile.skills.values_list('skill_id', 'level'))
+        return _top(self.score(profile, levels), self.ids, limit)
+
+
+_indexes = {}
+# Своя блокировка на каждый индекс: сборка одного не задерживает запросы к другому
+_locks = {CandidateIndex: threading.Lock(), VacancyIndex: threading.Lock()}
+# Поколение данных индекса: invalidate_indexes увеличивает его, и индекс,
+# собранный по более старому поколению, считается устаревшим — даже если
+# изменение пришло во время его сборки
+_generations = dict.fromkeys(_locks, 0)
+
+
+def _is_fresh(index_class, index):
+    return index is not None and not index.is_stale() and index.generation == _generations[index_class]
+
+
+def get_index(index_class):
+    index = _indexes.get(index_class)
+    if _is_fresh(index_class, index):
+        return index
+    lock = _locks[index_class]
+    if index is None:
+        lock.acquire()
+    elif not lock.acquire(blocking=False):
+        # Устаревший индекс пересобирает другой поток: пока отвечаем по старому
+        return index
+    try:
+        index = _indexes.get(index_class)
+        if not _is_fresh(index_class, index):
+            generation = _generations[index_class]
+            index = index_class().build()
+            index.generation = generation
+            _indexes[index_class] = index
+        return index
+    finally:
+        lock.release()
+
+
+def invalidate_indexes(*index_classes):
+    for index_class in index_classes or list(_generations):
+        _generations[index_class] += 1
+
+
+def recommend_candidates(vacancy, limit=20):
+    return get_index(CandidateIndex).recommend(vacancy, limit)
+
+
+def recommend_vacancies(profile, limit=20):
+    return get_index(VacancyIndex).recommend(profile, limit)
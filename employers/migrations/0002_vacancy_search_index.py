@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# Копия SQL из employers/search.py на момент миграции: миграция не должна
+# меняться вместе с кодом приложения
+
+VACANCY_TABLE = 'employers_vacancy'
+FTS_TABLE = 'employers_vacancy_fts'
+PG_VECTOR_COLUMN = 'search_vector'
+PG_INDEX = 'employers_vacancy_search_gin'
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, requirements, description,
+        content='{VACANCY_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, requirements, description)
+        VALUES (new.id, new.title, new.requirements, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, requirements, description)
+        VALUES ('delete', old.id, old.title, old.requirements, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, requirements, description ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, requirements, description)
+        VALUES ('delete', old.id, old.title, old.requirements, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, requirements, description)
+        VALUES (new.id, new.title, new.requirements, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({', '.join(map(str, FTS_WEIGHTS))})')",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+PG_INSTALL = [
+    f"""ALTER TABLE {VACANCY_TABLE} ADD COLUMN IF NOT EXISTS {PG_VECTOR_COLUMN} tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(requirements, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+        ) STORED""",
+    f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {VACANCY_TABLE} USING GIN ({PG_VECTOR_COLUMN})',
+]
+
+PG_UNINSTALL = [
+    f'DROP INDEX IF EXISTS {PG_INDEX}',
+    f'ALTER TABLE {VACANCY_TABLE} DROP COLUMN IF EXISTS {PG_VECTOR_COLUMN}',
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    _execute(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': PG_INSTALL}.get(vendor, []))
+
+
+def uninstall(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    _execute(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': PG_UNINSTALL}.get(vendor, []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
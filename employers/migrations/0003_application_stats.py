@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employers', '0002_vacancy_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyStats',
+            fields=[
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего откликов')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('viewed', models.PositiveIntegerField(default=0, verbose_name='Просмотрено')),
+                ('interview', models.PositiveIntegerField(default=0, verbose_name='Приглашён')),
+                ('rejected', models.PositiveIntegerField(default=0, verbose_name='Отказано')),
+                ('hired', models.PositiveIntegerField(default=0, verbose_name='Принят')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='employers.company', verbose_name='Компания')),
+                ('new_since_visit', models.PositiveIntegerField(default=0, verbose_name='Новых с последнего визита')),
+                ('last_visit_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний визит')),
+            ],
+            options={
+                'verbose_name': 'Статистика компании',
+                'verbose_name_plural': 'Статистика компаний',
+            },
+        ),
+        migrations.CreateModel(
+            name='VacancyStats',
+            fields=[
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего откликов')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('viewed', models.PositiveIntegerField(default=0, verbose_name='Просмотрено')),
+                ('interview', models.PositiveIntegerField(default=0, verbose_name='Приглашён')),
+                ('rejected', models.PositiveIntegerField(default=0, verbose_name='Отказано')),
+                ('hired', models.PositiveIntegerField(default=0, verbose_name='Принят')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('vacancy', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='employers.vacancy', verbose_name='Вакансия')),
+            ],
+            options={
+                'verbose_name': 'Статистика вакансии',
+                'verbose_name_plural': 'Статистика вакансий',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, transaction
+from django.db.models import Count
+
+STATUSES = ['sent', 'viewed', 'interview', 'rejected', 'hired']
+
+
+def backfill_stats(apps, schema_editor):
+    Company = apps.get_model('employers', 'Company')
+    Vacancy = apps.get_model('employers', 'Vacancy')
+    Application = apps.get_model('employers', 'Application')
+    VacancyStats = apps.get_model('employers', 'VacancyStats')
+    CompanyStats = apps.get_model('employers', 'CompanyStats')
+    db = schema_editor.connection.alias
+
+    # По одной компании на транзакцию, чтобы не блокировать таблицы надолго
+    for company_id in Company.objects.using(db).order_by('id').values_list('id', flat=True).iterator():
+        with transaction.atomic(using=db):
+            vacancy_counts = {
+                pk: dict.fromkeys(STATUSES + ['total'], 0)
+                for pk in Vacancy.objects.using(db).filter(company_id=company_id).values_list('id', flat=True)
+            }
+            company_counts = dict.fromkeys(STATUSES + ['total'], 0)
+            rows = Application.objects.using(db).filter(vacancy__company_id=company_id).values(
+                'vacancy_id', 'status'
+            ).annotate(count=Count('id')).order_by()
+            for row in rows:
+                for counts in (vacancy_counts[row['vacancy_id']], company_counts):
+                    counts[row['status']] += row['count']
+                    counts['total'] += row['count']
+
+            VacancyStats.objects.using(db).bulk_create([
+                VacancyStats(vacancy_id=pk, **counts) for pk, counts in vacancy_counts.items()
+            ], ignore_conflicts=True)
+            CompanyStats.objects.using(db).get_or_create(company_id=company_id, defaults=company_counts)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('employers', '0003_application_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employers', '0006_vacancy_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacancy',
+            name='experience_years',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Требуемый опыт (лет)'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 
 from core_models.models import User, Category
 from jobseekers.models import JobseekerProfile
@@ -38,9 +39,13 @@ class Vacancy(models.Model):
     salary_from = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     salary_to = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     location = models.CharField(max_length=100, verbose_name='Город')
+    # Пустое значение — опыт не важен
+    experience_years = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Требуемый опыт (лет)')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, verbose_name='Категория')
     skills = models.ManyToManyField('core_models.Skill', related_name='required_in_vacancies')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
+    # Идентификатор вакансии в системе работодателя, по нему импорт обновляет вакансии
+    external_id = models.CharField(max_length=100, blank=True, null=True, verbose_name='Внешний id')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -48,6 +53,20 @@ class Vacancy(models.Model):
         verbose_name = 'Вакансия'
         verbose_name_plural = 'Вакансии'
         ordering = ['-created_at']
+        constraints = [
+            # NULL не участвует в уникальности: вакансии без external_id не ограничены
+            models.UniqueConstraint(fields=['company', 'external_id'], name='vacancy_company_external_id_uniq'),
+        ]
+        # Частичные индексы: список вакансий всегда фильтрует is_active=True
+        indexes = [
+            models.Index(fields=['-created_at'], condition=Q(is_active=True),
+                         name='vacancy_active_created_idx'),
+            models.Index(fields=['category', '-created_at'], condition=Q(is_active=True),
+                         name='vacancy_active_category_idx'),
+            models.Index(fields=['salary_from'], condition=Q(is_active=True),
+                         name='vacancy_active_salary_idx'),
+            models.Index(fields=['company', '-created_at'], name='vacancy_company_created_idx'),
+        ]
 
 
 class Application(models.Model):
@@ -69,3 +88,65 @@ class Application(models.Model):
         unique_together = ('jobseeker', 'vacancy')
         verbose_name = 'Отклик'
         verbose_name_plural = 'Отклики'
+        indexes = [
+            models.Index(fields=['vacancy', '-applied_at'], name='application_vacancy_date_idx'),
+            models.Index(fields=['jobseeker', '-applied_at'], name='application_seeker_date_idx'),
+            models.Index(fields=['vacancy', 'status'], name='application_vacancy_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходный статус нужен, чтобы пересчитать статистику при его смене
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.status
+
+    def save(self, *args, **kwargs):
+        # Статистика считает переход от статуса, который сейчас в базе: строка
+        # читается под блокировкой в транзакции сохранения. Устаревший экземпляр
+        # или Application(pk=...) поверх существующей строки счётчики не собьют
+        with transaction.atomic():
+            if self.pk is not None:
+                self._loaded_status = Application.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('status', flat=True).first()
+            super().save(*args, **kwargs)
+
+
+class ApplicationCounters(models.Model):
+    # Счётчики откликов по статусам, поддерживаются инкрементально (employers/stats.py)
+    total = models.PositiveIntegerField(default=0, verbose_name='Всего откликов')
+    sent = models.PositiveIntegerField(default=0, verbose_name='Отправлено')
+    viewed = models.PositiveIntegerField(default=0, verbose_name='Просмотрено')
+    interview = models.PositiveIntegerField(default=0, verbose_name='Приглашён')
+    rejected = models.PositiveIntegerField(default=0, verbose_name='Отказано')
+    hired = models.PositiveIntegerField(default=0, verbose_name='Принят')
+    views = models.PositiveIntegerField(default=0, verbose_name='Просмотры')
+
+    class Meta:
+        abstract = True
+
+
+class VacancyStats(ApplicationCounters):
+    vacancy = models.OneToOneField(Vacancy, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='stats', verbose_name='Вакансия')
+
+    class Meta:
+        verbose_name = 'Статистика вакансии'
+        verbose_name_plural = 'Статистика вакансий'
+
+
+class CompanyStats(ApplicationCounters):
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='stats', verbose_name='Компания')
+    new_since_visit = models.PositiveIntegerField(default=0, verbose_name='Новых с последнего визита')
+    last_visit_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний визит')
+
+    class Meta:
+        verbose_name = 'Статистика компании'
+        verbose_name_plural = 'Статистика компаний'
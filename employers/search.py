@@ -0,0 +1,173 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый индекс вакансий.
+# SQLite: внешняя FTS5-таблица, синхронизируется триггерами на employers_vacancy.
+# PostgreSQL: генерируемая колонка tsvector (конфигурация russian) + GIN-индекс.
+# Остальные СУБД: откат к icontains.
+
+VACANCY_TABLE = 'employers_vacancy'
+FTS_TABLE = 'employers_vacancy_fts'
+PG_VECTOR_COLUMN = 'search_vector'
+PG_INDEX = 'employers_vacancy_search_gin'
+
+# Веса колонок для bm25 (колонка rank в FTS5): title, requirements, description
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, requirements, description,
+        content='{VACANCY_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, requirements, description)
+        VALUES (new.id, new.title, new.requirements, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, requirements, description)
+        VALUES ('delete', old.id, old.title, old.requirements, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, requirements, description ON {VACANCY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, requirements, description)
+        VALUES ('delete', old.id, old.title, old.requirements, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, requirements, description)
+        VALUES (new.id, new.title, new.requirements, new.description);
+    END""",
+]
+
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+PG_INSTALL = [
+    f"""ALTER TABLE {VACANCY_TABLE} ADD COLUMN IF NOT EXISTS {PG_VECTOR_COLUMN} tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(requirements, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+        ) STORED""",
+    f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {VACANCY_TABLE} USING GIN ({PG_VECTOR_COLUMN})',
+]
+
+PG_UNINSTALL = [
+    f'DROP INDEX IF EXISTS {PG_INDEX}',
+    f'ALTER TABLE {VACANCY_TABLE} DROP COLUMN IF EXISTS {PG_VECTOR_COLUMN}',
+]
+
+# Грубый стеммер для SQLite: FTS5 не знает русской морфологии,
+# поэтому отрезаем окончание и ищем по префиксу.
+RU_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ой', 'ей', 'ий', 'ый', 'ую', 'юю',
+    'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ов', 'ев', 'ия', 'ии', 'ию',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+MIN_STEM = 3
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    for ending in RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def fts_match_expression(query):
+    # unicode61 не приравнивает ё к е: слово с ё ищем в обоих написаниях.
+    # Слово, набранное через е, текст с ё не найдёт
+    terms = []
+    for word in WORD_RE.findall(query):
+        term = stem(word)
+        spelled = word.lower()[:len(term)]
+        if spelled != term:
+            terms.append(f'("{term}"* OR "{spelled}"*)')
+        else:
+            terms.append(f'"{term}"*')
+    return ' AND '.join(terms)
+
+
+def install_search_index(connection):
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{FTS_TABLE}_%'],
+            )
+            triggers_before = cursor.fetchone()[0]
+            for statement in SQLITE_INSTALL:
+                cursor.execute(statement)
+            weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')")
+            # Триггеры пропадают при пересоздании таблицы (ALTER в SQLite),
+            # в этом случае индекс мог разойтись с данными
+            if triggers_before < 3:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in PG_INSTALL:
+                cursor.execute(statement)
+
+
+def repair_search_index(connection):
+    # Вызывается после migrate: на SQLite пересоздание таблицы вакансий
+    # удаляет триггеры, восстанавливаем их, если индекс уже установлен
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        install_search_index(connection)
+
+
+def uninstall_search_index(connection):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': PG_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_vacancies(queryset, query):
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'sqlite':
+        match = fts_match_expression(query)
+        if not match:
+            return queryset.none()
+        # Соединяем с FTS-таблицей, а не коррелированным подзапросом:
+        # MATCH выполняется один раз, rank считается за тот же проход
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            # Унарный плюс запрещает искать в FTS по rowid: иначе при фильтре по
+            # индексированной колонке (компания, категория) SQLite перебирает
+            # вакансии и выполняет MATCH заново на каждую, как в count() пагинатора
+            where=[f'+{FTS_TABLE}.rowid = {VACANCY_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            # bm25 отрицательный: чем меньше, тем релевантнее
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-created_at')
+
+    if vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        return queryset.annotate(
+            search_rank=RawSQL(f'-ts_rank_cd({VACANCY_TABLE}.{PG_VECTOR_COLUMN}, {tsquery})', [query],
+                               output_field=FloatField())
+        ).filter(
+            RawSQL(f'{VACANCY_TABLE}.{PG_VECTOR_COLUMN} @@ {tsquery}', [query], output_field=BooleanField())
+        ).order_by('search_rank', '-created_at')
+
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query) |
+        Q(requirements__icontains=query)
+    )
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
-from core_models.models import Skill
-from core_models.serializers import CategorySerializer, SkillSerializer
+from core_models import reference
+from core_models.serializers import CategorySerializer, EagerLoadingMixin, SkillSerializer
 from .models import Company, Vacancy, Application
 
 
@@ -14,7 +14,10 @@ class CompanySerializer(serializers.ModelSerializer):
         ]
 
 
-class VacancyListSerializer(serializers.ModelSerializer):
+class VacancyListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('company', 'category')
+    prefetch_related_fields = ('skills',)
+
     company = serializers.CharField(source='company.name')
     category = CategorySerializer()
     skills = SkillSerializer(many=True)
@@ -27,7 +30,10 @@ class VacancyListSerializer(serializers.ModelSerializer):
         ]
 
 
-class VacancyDetailSerializer(serializers.ModelSerializer):
+class VacancyDetailSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('company', 'category')
+    prefetch_related_fields = ('skills',)
+
     company = CompanySerializer()
     category = CategorySerializer()
     skills = SkillSerializer(many=True)
@@ -38,15 +44,15 @@ class VacancyDetailSerializer(serializers.ModelSerializer):
 
 
 class VacancyCreateUpdateSerializer(serializers.ModelSerializer):
-    skills = serializers.PrimaryKeyRelatedField(
-        queryset=Skill.objects.all(), many=True, required=False
-    )
+    # Категория и навыки проверяются по справочникам в памяти (core_models.reference)
+    category = reference.ReferencePrimaryKeyRelatedField(reference.categories, allow_null=True, required=False)
+    skills = reference.ReferencePrimaryKeyRelatedField(reference.skills, many=True, required=False)
 
     class Meta:
         model = Vacancy
         fields = [
             'title', 'description', 'requirements', 'responsibilities',
-            'salary_from', 'salary_to', 'location', 'category', 'skills', 'is_active'
+            'salary_from', 'salary_to', 'location', 'experience_years', 'category', 'skills', 'is_active'
         ]
 
     def create(self, validated_data):
@@ -63,7 +69,21 @@ class VacancyCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class VacancyImportSerializer(VacancyCreateUpdateSerializer):
+    # Проверка строк импорта теми же правилами, что и создание вакансии.
+    # Категория и навыки приходят названиями и разрешаются пачкой
+    # в employers/imports.py, поэтому здесь их нет.
+    external_id = serializers.CharField(max_length=100)
+
+    class Meta(VacancyCreateUpdateSerializer.Meta):
+        fields = [
+            field for field in VacancyCreateUpdateSerializer.Meta.fields if field not in ('category', 'skills')
+        ] + ['external_id']
+
+
+class ApplicationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('jobseeker__user', 'vacancy')
+
     jobseeker = serializers.StringRelatedField()
     vacancy = serializers.StringRelatedField()
     status_display = serializers.CharField(source='get_status_display', read_only=True)
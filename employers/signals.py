@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core_models.models import Category, Skill
+from core_models.versions import bump_version
+from jobseekers.models import JobseekerProfile, JobseekerSkill
+from . import stats
+from .matching import CandidateIndex, VacancyIndex, invalidate_indexes
+from .models import Application, Company, Vacancy, VacancyStats
+
+
+# Данные, из которых собирается лента вакансий API: их изменение
+# сбрасывает ETag ленты (core_models.versions)
+def vacancies_changed(sender, **kwargs):
+    bump_version('vacancies')
+
+
+for model in (Vacancy, Company, Category, Skill):
+    post_save.connect(vacancies_changed, sender=model, dispatch_uid=f'vacancies_version_save_{model.__name__}')
+    post_delete.connect(vacancies_changed, sender=model, dispatch_uid=f'vacancies_version_delete_{model.__name__}')
+m2m_changed.connect(vacancies_changed, sender=Vacancy.skills.through, dispatch_uid='vacancies_version_skills')
+
+
+# Индексы подбора (employers.matching) в этом процессе: пересобираются при
+# следующем подборе после коммита. Город соискателя хранится в User, его
+# изменения (как и изменения в других процессах) индекс увидит через INDEX_TTL
+def candidates_changed(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_indexes(CandidateIndex))
+
+
+def matching_vacancies_changed(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_indexes(VacancyIndex))
+
+
+for model, handler in ((JobseekerProfile, candidates_changed), (JobseekerSkill, candidates_changed),
+                       (Vacancy, matching_vacancies_changed)):
+    post_save.connect(handler, sender=model, dispatch_uid=f'matching_save_{model.__name__}')
+    post_delete.connect(handler, sender=model, dispatch_uid=f'matching_delete_{model.__name__}')
+m2m_changed.connect(matching_vacancies_changed, sender=Vacancy.skills.through, dispatch_uid='matching_vacancy_skills')
+
+
+@receiver(post_save, sender=Vacancy)
+def vacancy_saved(sender, instance, created, **kwargs):
+    if created:
+        VacancyStats.objects.get_or_create(vacancy=instance)
+
+
+@receiver(pre_delete, sender=Vacancy)
+def vacancy_deleting(sender, instance, **kwargs):
+    stats.vacancy_deleting(instance)
+
+
+@receiver(post_delete, sender=Vacancy)
+def vacancy_deleted(sender, instance, **kwargs):
+    stats.vacancy_deleted(instance)
+
+
+@receiver(post_save, sender=Application)
+def application_saved(sender, instance, created, **kwargs):
+    stats.application_saved(instance, created)
+
+
+@receiver(post_delete, sender=Application)
+def application_deleted(sender, instance, **kwargs):
+    stats.application_deleted(instance)
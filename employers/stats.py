@@ -0,0 +1,131 @@
+import threading
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Application, Company, CompanyStats, Vacancy, VacancyStats
+
+# Инкрементальная статистика кабинета работодателя.
+# Счётчики меняются атомарными UPDATE с F(), строка статистики создаётся
+# при первом обращении. rebuild_stats пересчитывает всё из откликов.
+STATUSES = [code for code, _ in Application._meta.get_field('status').choices]
+
+# Вакансии, удаляемые в текущем потоке: их отклики удаляются каскадом,
+# и счётчики компании уже скорректированы одним запросом в vacancy_deleting
+_deleting = threading.local()
+
+
+def _bump(model, pk, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+    with transaction.atomic():
+        if not model.objects.filter(pk=pk).update(**changes):
+            model.objects.get_or_create(pk=pk)
+            model.objects.filter(pk=pk).update(**changes)
+
+
+def _company_id(vacancy_id):
+    return Vacancy.objects.filter(pk=vacancy_id).values_list('company_id', flat=True).first()
+
+
+def apply_status_changes(changes):
+    # changes: {(vacancy_id, company_id, old_status, new_status): count};
+    # old_status=None — новый отклик, new_status=None — удалённый
+    per_vacancy, per_company = {}, {}
+    for (vacancy_id, company_id, old, new), count in changes.items():
+        for deltas in (per_vacancy.setdefault(vacancy_id, Counter()),
+                       per_company.setdefault(company_id, Counter())):
+            if old:
+                deltas[old] -= count
+            if new:
+                deltas[new] += count
+            if old is None:
+                deltas['total'] += count
+            if new is None:
+                deltas['total'] -= count
+        if old is None:
+            per_company[company_id]['new_since_visit'] += count
+
+    for vacancy_id, deltas in per_vacancy.items():
+        if vacancy_id is not None:
+            _bump(VacancyStats, vacancy_id, **deltas)
+    for company_id, deltas in per_company.items():
+        _bump(CompanyStats, company_id, **deltas)
+
+
+def application_saved(application, created):
+    old = None if created else getattr(application, '_loaded_status', None)
+    if not created and old == application.status:
+        return
+    company_id = _company_id(application.vacancy_id)
+    apply_status_changes({(application.vacancy_id, company_id, old, application.status): 1})
+    application._loaded_status = application.status
+
+
+def _deleting_vacancies():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def vacancy_deleting(vacancy):
+    rows = Application.objects.filter(vacancy=vacancy).values('status').annotate(
+        count=Count('id')
+    ).order_by()
+    apply_status_changes({
+        (None, vacancy.company_id, row['status'], None): row['count'] for row in rows
+    })
+    _deleting_vacancies().add(vacancy.pk)
+
+
+def vacancy_deleted(vacancy):
+    _deleting_vacancies().discard(vacancy.pk)
+
+
+def application_deleted(application):
+    if application.vacancy_id in _deleting_vacancies():
+        return
+    company_id = _company_id(application.vacancy_id)
+    if company_id is None:
+        return
+    status = getattr(application, '_loaded_status', None) or application.status
+    apply_status_changes({(application.vacancy_id, company_id, status, None): 1})
+
+
+def record_vacancy_view(vacancy):
+    _bump(VacancyStats, vacancy.pk, views=1)
+    _bump(CompanyStats, vacancy.company_id, views=1)
+
+
+def visit_cabinet(company):
+    stats, _ = CompanyStats.objects.get_or_create(pk=company.pk)
+    CompanyStats.objects.filter(pk=company.pk).update(new_since_visit=0, last_visit_at=timezone.now())
+    return stats
+
+
+def rebuild_stats(companies=None):
+    companies = Company.objects.all() if companies is None else companies
+    for company in companies.iterator():
+        with transaction.atomic():
+            rows = Application.objects.filter(vacancy__company=company).values(
+                'vacancy_id', 'status'
+            ).annotate(count=Count('id')).order_by()
+
+            vacancy_counts = {
+                pk: dict.fromkeys(STATUSES + ['total'], 0)
+                for pk in company.vacancies.values_list('id', flat=True)
+            }
+            company_counts = dict.fromkeys(STATUSES + ['total'], 0)
+            for row in rows:
+                for counts in (vacancy_counts[row['vacancy_id']], company_counts):
+                    counts[row['status']] += row['count']
+                    counts['total'] += row['count']
+
+            for vacancy_id, counts in vacancy_counts.items():
+                VacancyStats.objects.update_or_create(pk=vacancy_id, defaults=counts)
+            CompanyStats.objects.update_or_create(pk=company.pk, defaults=company_counts)
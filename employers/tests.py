@@ -1,3 +1,948 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core_models.models import Category, Notification, Skill, User
+from core_models.notifications import FANOUT_CHANNEL
+from core_models.testing import QueryBudgetMixin, QueryPlanMixin, local_services, stub_templates
+from jobseekers.models import JobseekerProfile, JobseekerSkill
+from . import matching
+from .models import Application, Company, CompanyStats, Vacancy, VacancyStats
+from .export import export_vacancies, vacancy_rows
+from .facets import vacancy_facets
+from .imports import import_vacancies
+from .search import fts_match_expression, search_vacancies, stem
+from .serializers import ApplicationSerializer, VacancyDetailSerializer, VacancyListSerializer
+from .stats import STATUSES, rebuild_stats
+
+
+class VacancyQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=user, name='Компания')
+        cls.category = Category.objects.create(name='IT')
+
+    def active(self):
+        return Vacancy.objects.filter(is_active=True).select_related(
+            'company__user', 'category'
+        ).order_by('-created_at')
+
+    def test_vacancy_list(self):
+        self.assertNoFullScan(self.active()[:12])
+
+    def test_vacancy_list_by_category(self):
+        self.assertNoFullScan(self.active().filter(category=self.category)[:12])
+
+    def test_vacancy_list_by_salary(self):
+        self.assertNoFullScan(self.active().filter(salary_from__gte=1000)[:12])
+
+    def test_vacancy_list_by_location(self):
+        self.assertNoFullScan(self.active().filter(location__icontains='Бишкек')[:12])
+
+    def test_vacancy_search(self):
+        self.assertNoFullScan(search_vacancies(self.active(), 'разработчик')[:12])
+
+    def test_company_vacancies(self):
+        self.assertNoFullScan(Vacancy.objects.filter(company=self.company).order_by('-created_at'))
+
+
+class VacancySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=user, name='Компания')
+
+    def create(self, title, description='Описание', requirements='Требования'):
+        return Vacancy.objects.create(company=self.company, title=title, description=description,
+                                      requirements=requirements, location='Бишкек')
+
+    def search(self, query):
+        return list(search_vacancies(Vacancy.objects.all(), query))
+
+    def test_stem(self):
+        self.assertEqual(stem('Разработчика'), 'разработчик')
+        self.assertEqual(stem('разработчиками'), 'разработчик')
+        self.assertEqual(stem('программистов'), 'программист')
+        self.assertEqual(stem('ёлка'), 'елк')
+        # Короткие слова не обрезаются до меньше чем MIN_STEM букв
+        self.assertEqual(stem('ИТ'), 'ит')
+        self.assertEqual(stem('Python'), 'python')
+        self.assertEqual(fts_match_expression('Старший  разработчик!'), '"старш"* AND "разработчик"*')
+        self.assertEqual(fts_match_expression('удалённая'), '("удаленн"* OR "удалённ"*)')
+
+    def test_word_forms(self):
+        vacancy = self.create('Разработчик Python')
+        self.assertEqual(self.search('разработчиков'), [vacancy])
+        self.assertEqual(self.search('Разработчика python'), [vacancy])
+        self.assertEqual(self.search('тестировщик'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_yo_spelling(self):
+        vacancy = self.create('Удалённая работа')
+        self.assertEqual(self.search('удалённой работы'), [vacancy])
+
+    def test_count_driven_by_match(self):
+        # count() пагинатора без сортировки по rank: MATCH всё равно выполняется один раз
+        found = search_vacancies(Vacancy.objects.filter(company=self.company), 'разработчик')
+        with CaptureQueriesContext(connection) as queries:
+            found.count()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[-1]['sql'])
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertIn('employers_vacancy_fts', plan[0], plan)
+
+    def test_ranking(self):
+        in_description = self.create('Менеджер', description='Нужен разработчик отчётов')
+        in_requirements = self.create('Аналитик', requirements='Опыт разработчика')
+        in_title = self.create('Разработчик')
+        self.assertEqual(self.search('разработчик'), [in_title, in_requirements, in_description])
+
+    def test_triggers(self):
+        vacancy = self.create('Разработчик')
+        Vacancy.objects.filter(pk=vacancy.pk).update(title='Тестировщик')
+        self.assertEqual(self.search('разработчик'), [])
+        self.assertEqual(self.search('тестировщик'), [vacancy])
+
+        # Изменение полей вне индекса не трогает FTS-таблицу
+        Vacancy.objects.filter(pk=vacancy.pk).update(location='Ош')
+        self.assertEqual(self.search('тестировщик'), [vacancy])
+
+        vacancy.delete()
+        self.assertEqual(self.search('тестировщик'), [])
+
+
+class MatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = Skill.objects.create(name='Python')
+        cls.django = Skill.objects.create(name='Django')
+        employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=employer, name='Компания')
+        cls.vacancy = Vacancy.objects.create(
+            company=cls.company, title='Разработчик', description='Описание', requirements='Требования',
+            location='Бишкек', salary_from=1000, salary_to=2000, experience_years=3,
+        )
+        cls.vacancy.skills.add(cls.python, cls.django)
+
+    def setUp(self):
+        matching._indexes.clear()
+
+    def create_profile(self, name, skills, experience=3, location='Бишкек', salary=1500, **kwargs):
+        user = User.objects.create(username=name, role='jobseeker', location=location)
+        profile = JobseekerProfile.objects.create(user=user, desired_position='Разработчик', desired_salary_from=salary,
+                                                  experience_years=experience, **kwargs)
+        for skill in skills:
+            JobseekerSkill.objects.create(profile=profile, skill=skill, level=4)
+        return profile
+
+    def test_components(self):
+        nan = np.nan
+        np.testing.assert_allclose(
+            matching.salary_score(np.array([1500.0, 4000.0, nan]), np.array([nan, nan, nan]),
+                                  np.array([1000.0]), np.array([2000.0])),
+            [1.0, 0.5, 1.0],
+        )
+        np.testing.assert_allclose(matching.location_score(np.array([0, 1, -2]), 0), [1.0, 0.0, 0.5])
+        np.testing.assert_allclose(matching.location_score(np.array([0, 1]), -1), [0.5, 0.5])
+        np.testing.assert_allclose(
+            matching.experience_score(np.array([0.0, 1.5, 3.0, 10.0]), np.array([3.0])), [0.0, 0.5, 1.0, 1.0],
+        )
+        np.testing.assert_allclose(matching.experience_score(2.0, np.array([0.0, nan])), [1.0, 0.4])
+
+    def test_candidate_ranking(self):
+        best = self.create_profile('best', [self.python, self.django])
+        junior = self.create_profile('junior', [self.python, self.django], experience=1)
+        partial = self.create_profile('partial', [self.python])
+        elsewhere = self.create_profile('elsewhere', [self.python, self.django], location='Ош')
+        self.create_profile('closed', [self.python, self.django], is_open_to_work=False)
+
+        ranked = matching.recommend_candidates(self.vacancy)
+        self.assertEqual([pk for pk, _ in ranked], [best.pk, junior.pk, elsewhere.pk, partial.pk])
+        self.assertAlmostEqual(ranked[0][1], 1.0)
+        self.assertAlmostEqual(dict(ranked)[partial.pk], 0.6 * 0.5 + 0.2 + 0.1 + 0.1)
+
+    def test_experience_matches_requirement(self):
+        # Требование 3 года: 10 лет опыта не лучше трёх; без требования опыт ценится до EXPERIENCE_CAP
+        senior = self.create_profile('senior', [self.python], experience=10)
+        middle = self.create_profile('middle', [self.python], experience=3)
+        scores = dict(matching.recommend_candidates(self.vacancy))
+        self.assertAlmostEqual(scores[senior.pk], scores[middle.pk])
+
+        Vacancy.objects.filter(pk=self.vacancy.pk).update(experience_years=None)
+        self.vacancy.refresh_from_db()
+        scores = dict(matching.recommend_candidates(self.vacancy))
+        self.assertGreater(scores[senior.pk], scores[middle.pk])
+
+    def test_vacancy_ranking(self):
+        profile = self.create_profile('jobseeker', [self.python, self.django], experience=1)
+        junior = Vacancy.objects.create(company=self.company, title='Стажёр', description='Описание',
+                                        requirements='Требования', location='Бишкек', salary_from=1500,
+                                        experience_years=0)
+        junior.skills.add(self.python, self.django)
+        other = Vacancy.objects.create(company=self.company, title='Аналитик', description='Описание',
+                                       requirements='Требования', location='Ош')
+        Vacancy.objects.create(company=self.company, title='Закрыта', description='Описание',
+                               requirements='Требования', location='Бишкек', is_active=False)
+
+        ranked = matching.recommend_vacancies(profile)
+        self.assertEqual([pk for pk, _ in ranked], [junior.pk, self.vacancy.pk, other.pk])
+        self.assertAlmostEqual(ranked[0][1], 1.0)
+
+    def test_signals_invalidate_index(self):
+        profile = self.create_profile('jobseeker', [self.python])
+        before = dict(matching.recommend_candidates(self.vacancy))[profile.pk]
+        with self.captureOnCommitCallbacks(execute=True):
+            JobseekerSkill.objects.create(profile=profile, skill=self.django, level=4)
+        self.assertGreater(dict(matching.recommend_candidates(self.vacancy))[profile.pk], before)
+
+        matching.recommend_vacancies(profile)
+        # Без коммита индекс не сбрасывается
+        other = Vacancy.objects.create(company=self.company, title='Аналитик', description='Описание',
+                                       requirements='Требования', location='Бишкек')
+        self.assertNotIn(other.pk, dict(matching.recommend_vacancies(profile)))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.skills.add(self.python)
+        self.assertIn(other.pk, dict(matching.recommend_vacancies(profile)))
+
+
+class MatchingLockTests(TransactionTestCase):
+    # Сборка индекса в другом потоке читает БД своим соединением: без транзакции теста
+    def setUp(self):
+        matching._indexes.clear()
+        user = User.objects.create(username='jobseeker', role='jobseeker')
+        JobseekerProfile.objects.create(user=user, desired_position='Разработчик')
+
+    def test_locks_are_per_index(self):
+        stale = matching.get_index(matching.CandidateIndex)
+        matching.invalidate_indexes(matching.CandidateIndex)
+        results = {}
+
+        def request():
+            results['vacancies'] = matching.get_index(matching.VacancyIndex)
+            results['candidates'] = matching.get_index(matching.CandidateIndex)
+            connection.close()
+
+        # Пока индекс кандидатов пересобирается (блокировка занята), индекс вакансий
+        # собирается без ожидания, а устаревший индекс кандидатов отдаётся как есть
+        with matching._locks[matching.CandidateIndex]:
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertIs(results['candidates'], stale)
+        self.assertIsNot(matching.get_index(matching.CandidateIndex), stale)
+
+
+class ApplicationQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=user, name='Компания')
+
+    def test_company_applications(self):
+        self.assertNoFullScan(Application.objects.filter(vacancy__company=self.company).select_related(
+            'jobseeker__user', 'vacancy'
+        ).order_by('-applied_at')[:15])
+
+    def test_applications_by_status(self):
+        self.assertNoFullScan(Application.objects.filter(
+            vacancy__company=self.company, status='sent'
+        ))
+
+    def test_jobseeker_applications(self):
+        self.assertNoFullScan(Application.objects.filter(jobseeker_id=1).order_by('-applied_at')[:10])
+
+
+@stub_templates
+@local_services
+class EmployerQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=cls.employer, name='Компания')
+        cls.category = Category.objects.create(name='IT')
+        cls.skill = Skill.objects.create(name='Python')
+        cls.vacancies = []
+        for i in range(5):
+            vacancy = Vacancy.objects.create(
+                company=cls.company, title=f'Разработчик {i}', description='Описание',
+                requirements='Требования', location='Бишкек', category=cls.category,
+            )
+            vacancy.skills.add(cls.skill)
+            cls.vacancies.append(vacancy)
+        cls.jobseeker = User.objects.create(username='jobseeker0', role='jobseeker')
+        for i in range(10):
+            user = cls.jobseeker if i == 0 else User.objects.create(username=f'jobseeker{i}', role='jobseeker')
+            profile = JobseekerProfile.objects.create(user=user, desired_position='Разработчик')
+            for vacancy in cls.vacancies:
+                Application.objects.create(jobseeker=profile, vacancy=vacancy)
+
+    def setUp(self):
+        self.client.force_login(self.employer)
+
+    def test_vacancy_list(self):
+        self.client.logout()
+        self.assertQueryBudget('get', '/employer/vacancies/?q=разработчик&location=Бишкек&salary_min=100')
+
+    def test_vacancy_detail(self):
+        self.client.force_login(self.jobseeker)
+        self.assertQueryBudget('get', f'/employer/vacancy/{self.vacancies[0].pk}/')
+
+    def test_cabinet(self):
+        self.assertQueryBudget('get', '/employer/cabinet/')
+
+    def test_applications(self):
+        self.assertQueryBudget('get', '/employer/applications/')
+
+    def test_recommended_candidates(self):
+        self.assertQueryBudget('get', f'/employer/vacancy/{self.vacancies[0].pk}/candidates/')
+
+    def test_bulk_status_update(self):
+        ids = list(Application.objects.filter(vacancy=self.vacancies[0]).values_list('id', flat=True))
+        response = self.assertQueryBudget('post', '/employer/htmx/applications/status/', {
+            'status': 'interview', 'application_ids': ids,
+        })
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NOTIFICATIONS_FANOUT_WORKER=True)
+    def test_vacancy_close_notifies_in_background(self):
+        # 10 ожидающих ответа соискателей больше лимита: рассылка уходит воркеру после коммита
+        vacancy = self.vacancies[0]
+        Application.objects.filter(vacancy=vacancy, jobseeker__user=self.jobseeker).update(status='rejected')
+        with mock.patch('core_models.notifications.FANOUT_INLINE_LIMIT', 5), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.assertQueryBudget('post', f'/employer/vacancy/{vacancy.pk}/edit/', {
+                'title': vacancy.title, 'description': 'Описание', 'requirements': 'Требования',
+                'skills': [self.skill.pk], 'location': 'Бишкек', 'category': self.category.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Notification.objects.filter(title='Вакансия закрыта').exists())
+
+        event = async_to_sync(get_channel_layer().receive)(FANOUT_CHANNEL)
+        self.assertEqual(len(event['user_ids']), 9)
+        self.assertNotIn(self.jobseeker.pk, event['user_ids'])
+        self.assertEqual(event['context'], {'title': vacancy.title})
+
+    def test_vacancy_delete(self):
+        response = self.assertQueryBudget('post', f'/employer/vacancy/{self.vacancies[0].pk}/delete/')
+        self.assertEqual(response.status_code, 302)
+        stats = CompanyStats.objects.get(pk=self.company.pk)
+        self.assertEqual(stats.total, 40)
+        self.assertEqual(stats.sent, 40)
+
+
+class StatsAssertionsMixin:
+    # Инкрементальные счётчики должны совпадать с подсчётом по таблице откликов
+    def assertStatsMatch(self, company):
+        def expected(applications):
+            counts = dict.fromkeys(STATUSES, 0)
+            counts.update(applications.values_list('status').annotate(count=Count('id')).order_by())
+            counts['total'] = sum(counts.values())
+            return counts
+
+        def actual(model, pk):
+            stats = model.objects.filter(pk=pk).values(*STATUSES, 'total').first()
+            return stats or dict.fromkeys(STATUSES + ['total'], 0)
+
+        self.assertEqual(actual(CompanyStats, company.pk),
+                         expected(Application.objects.filter(vacancy__company=company)), company)
+        for vacancy in Vacancy.objects.filter(company=company):
+            self.assertEqual(actual(VacancyStats, vacancy.pk),
+                             expected(Application.objects.filter(vacancy=vacancy)), vacancy)
+
+
+@local_services
+class BulkStatusUpdateTests(StatsAssertionsMixin, TestCase):
+    url = '/employer/htmx/applications/status/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.companies, cls.vacancies = [], []
+        for n in range(2):
+            employer = User.objects.create(username=f'employer{n}', role='employer')
+            company = Company.objects.create(user=employer, name=f'Компания {n}')
+            cls.companies.append(company)
+            cls.vacancies.append([
+                Vacancy.objects.create(company=company, title=f'Вакансия {n}.{i}', description='Описание',
+                                       requirements='Требования', location='Бишкек')
+                for i in range(2)
+            ])
+        for i in range(3):
+            profile = JobseekerProfile.objects.create(
+                user=User.objects.create(username=f'jobseeker{i}', role='jobseeker'), desired_position='Разработчик',
+            )
+            for vacancy in (*cls.vacancies[0], *cls.vacancies[1]):
+                Application.objects.create(jobseeker=profile, vacancy=vacancy)
+
+    def setUp(self):
+        self.client.force_login(self.companies[0].user)
+
+    def test_foreign_applications_are_ignored(self):
+        own = list(Application.objects.filter(vacancy__company=self.companies[0]).values_list('id', flat=True))
+        foreign = list(Application.objects.filter(vacancy__company=self.companies[1]).values_list('id', flat=True))
+        response = self.client.post(self.url, {'status': 'interview', 'application_ids': own + foreign})
+
+        self.assertEqual(response.json()['updated'], len(own))
+        self.assertEqual(set(Application.objects.filter(id__in=own).values_list('status', flat=True)),
+                         {'interview'})
+        self.assertEqual(set(Application.objects.filter(id__in=foreign).values_list('status', flat=True)),
+                         {'sent'})
+        for company in self.companies:
+            self.assertStatsMatch(company)
+        self.assertEqual(Notification.objects.filter(title='Статус отклика изменён').count(), len(own))
+        self.assertFalse(Notification.objects.filter(message__contains='Вакансия 1.').exists())
+
+    def test_statuses_stats_and_notifications(self):
+        vacancy = self.vacancies[0][0]
+        first, *rest = Application.objects.filter(vacancy=vacancy).order_by('id')
+        first.status = 'interview'
+        first.save()
+        Notification.objects.all().delete()
+
+        ids = [application.id for application in (first, *rest)] + [self.vacancies[0][1].applications.first().id]
+        response = self.client.post(self.url, {'status': 'interview', 'application_ids': ids})
+
+        # Уже в этом статусе: не считается и не уведомляется
+        self.assertEqual(response.json(), {'success': True, 'updated': 3, 'status': 'Приглашён'})
+        self.assertStatsMatch(self.companies[0])
+        notifications = Notification.objects.filter(title='Статус отклика изменён')
+        self.assertEqual(sorted(notifications.values_list('user_id', flat=True)),
+                         sorted([rest[0].jobseeker.user_id, rest[1].jobseeker.user_id,
+                                 self.vacancies[0][1].applications.first().jobseeker.user_id]))
+        self.assertEqual(
+            sorted(set(notifications.values_list('message', flat=True))),
+            [f'Ваш отклик на вакансию "{title}" теперь: Приглашён'
+             for title in ('Вакансия 0.0', 'Вакансия 0.1')],
+        )
+
+    def test_invalid_input(self):
+        self.assertEqual(self.client.post(self.url, {'status': 'unknown', 'application_ids': [1]}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'status': 'viewed', 'application_ids': ['x']}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class StatsTests(StatsAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=employer, name='Компания')
+        cls.vacancies = [
+            Vacancy.objects.create(company=cls.company, title=f'Вакансия {i}', description='Описание',
+                                   requirements='Требования', location='Бишкек')
+            for i in range(2)
+        ]
+        cls.profiles = [
+            JobseekerProfile.objects.create(user=User.objects.create(username=f'jobseeker{i}', role='jobseeker'),
+                                            desired_position='Разработчик')
+            for i in range(3)
+        ]
+
+    def apply(self, vacancy, profile, **kwargs):
+        return Application.objects.create(jobseeker=profile, vacancy=vacancy, **kwargs)
+
+    def test_create(self):
+        self.assertStatsMatch(self.company)
+        for profile in self.profiles:
+            self.apply(self.vacancies[0], profile)
+        self.apply(self.vacancies[1], self.profiles[0], status='viewed')
+        self.assertStatsMatch(self.company)
+        self.assertEqual(CompanyStats.objects.get(pk=self.company.pk).new_since_visit, 4)
+
+    def test_status_change(self):
+        created = self.apply(self.vacancies[0], self.profiles[0])
+        # Созданный экземпляр помнит статус после save: повторная смена не считает старый дважды
+        created.status = 'viewed'
+        created.save()
+        created.status = 'interview'
+        created.save()
+        self.assertStatsMatch(self.company)
+
+        # Загруженный из базы экземпляр: исходный статус берётся из from_db
+        loaded = Application.objects.get(pk=created.pk)
+        self.assertEqual(loaded._loaded_status, 'interview')
+        loaded.status = 'hired'
+        loaded.save()
+        self.assertStatsMatch(self.company)
+
+        # Сохранение без смены статуса счётчики не трогает
+        with CaptureQueriesContext(connection) as queries:
+            Application.objects.get(pk=created.pk).save()
+        self.assertFalse([query for query in queries if 'stats' in query['sql']])
+        self.assertStatsMatch(self.company)
+
+    def test_stale_instances(self):
+        # Два экземпляра загружены до смены статуса: каждый вычитает статус из базы
+        application = self.apply(self.vacancies[0], self.profiles[0])
+        first, second = Application.objects.get(pk=application.pk), Application.objects.get(pk=application.pk)
+        first.status = 'viewed'
+        first.save()
+        second.status = 'interview'
+        second.save()
+        self.assertStatsMatch(self.company)
+
+        # Новый экземпляр поверх существующей строки — смена статуса, а не новый отклик
+        Application(pk=application.pk, jobseeker=self.profiles[0], vacancy=self.vacancies[0],
+                    applied_at=application.applied_at, status='hired').save()
+        self.assertStatsMatch(self.company)
+
+        Application.objects.filter(pk=application.pk).update(status='rejected')
+        VacancyStats.objects.filter(pk=self.vacancies[0].pk).update(hired=0, rejected=1)
+        CompanyStats.objects.filter(pk=self.company.pk).update(hired=0, rejected=1)
+        first.refresh_from_db()
+        self.assertEqual(first._loaded_status, 'rejected')
+
+    def test_status_view(self):
+        application = self.apply(self.vacancies[0], self.profiles[0])
+        self.client.force_login(self.company.user)
+        for status in ('viewed', 'interview'):
+            response = self.client.post(f'/employer/htmx/application/{application.pk}/status/', {'status': status})
+            self.assertEqual(response.status_code, 200)
+        self.assertStatsMatch(self.company)
+
+    def test_delete(self):
+        applications = [self.apply(vacancy, profile) for vacancy in self.vacancies for profile in self.profiles]
+        applications[0].status = 'interview'
+        applications[0].save()
+
+        # Несохранённая смена статуса: вычитается статус из базы
+        loaded = Application.objects.get(pk=applications[0].pk)
+        loaded.status = 'hired'
+        loaded.delete()
+        applications[1].delete()
+        self.assertStatsMatch(self.company)
+
+        # Каскадное удаление откликов вместе с вакансией
+        self.vacancies[1].delete()
+        self.assertStatsMatch(self.company)
+        self.assertEqual(CompanyStats.objects.get(pk=self.company.pk).total, 1)
+
+    def test_rebuild(self):
+        for profile in self.profiles:
+            self.apply(self.vacancies[0], profile, status='viewed')
+        CompanyStats.objects.filter(pk=self.company.pk).update(total=100, viewed=0)
+        VacancyStats.objects.filter(pk=self.vacancies[0].pk).delete()
+        rebuild_stats(Company.objects.filter(pk=self.company.pk))
+        self.assertStatsMatch(self.company)
+
+
+@stub_templates
+@local_services
+@override_settings(ASYNC_HTMX_VIEWS={'htmx_update_application_status'})
+class AsyncHtmxTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create(username='employer', role='employer')
+        company = Company.objects.create(user=cls.employer, name='Компания')
+        vacancy = Vacancy.objects.create(company=company, title='Разработчик', description='Описание',
+                                         requirements='Требования', location='Бишкек')
+        cls.jobseeker = User.objects.create(username='jobseeker', role='jobseeker')
+        profile = JobseekerProfile.objects.create(user=cls.jobseeker, desired_position='Разработчик')
+        cls.application = Application.objects.create(jobseeker=profile, vacancy=vacancy)
+        cls.stranger = User.objects.create(username='stranger', role='employer')
+        Company.objects.create(user=cls.stranger, name='Другая компания')
+
+    def test_update_status(self):
+        self.client.force_login(self.employer)
+        url = f'/employer/htmx/application/{self.application.pk}/status/'
+        response = self.assertQueryBudget('post', url, {'status': 'interview'})
+        self.assertEqual(response.json(), {'success': True, 'status': Application(status='interview').get_status_display()})
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.status, 'interview')
+        self.assertTrue(Notification.objects.filter(user=self.jobseeker).exists())
+        self.assertEqual(self.client.post(url, {'status': 'unknown'}).status_code, 400)
+
+    def test_foreign_application(self):
+        self.client.force_login(self.stranger)
+        response = self.client.post(f'/employer/htmx/application/{self.application.pk}/status/', {'status': 'hired'})
+        self.assertEqual(response.status_code, 403)
+
+
+class VacancySerializerQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create(username='employer', role='employer')
+        company = Company.objects.create(user=employer, name='Компания')
+        category = Category.objects.create(name='IT')
+        skills = [Skill.objects.create(name=f'Навык {i}') for i in range(3)]
+        profile = JobseekerProfile.objects.create(
+            user=User.objects.create(username='jobseeker', role='jobseeker'), desired_position='Разработчик'
+        )
+        for i in range(50):
+            vacancy = Vacancy.objects.create(
+                company=company, title=f'Вакансия {i}', description='Описание',
+                requirements='Требования', location='Бишкек', category=category,
+            )
+            vacancy.skills.set(skills)
+            Application.objects.create(jobseeker=profile, vacancy=vacancy)
+
+    def assertConstantQueries(self, serializer_class, queryset, num):
+        for size in (5, 50):
+            with self.assertNumQueries(num):
+                data = serializer_class(
+                    serializer_class.setup_eager_loading(queryset)[:size], many=True
+                ).data
+            self.assertEqual(len(data), size)
+
+    def test_vacancy_list(self):
+        self.assertConstantQueries(VacancyListSerializer, Vacancy.objects.order_by('-created_at'), 2)
+
+    def test_vacancy_detail(self):
+        self.assertConstantQueries(VacancyDetailSerializer, Vacancy.objects.order_by('-created_at'), 2)
+
+    def test_applications(self):
+        self.assertConstantQueries(ApplicationSerializer, Application.objects.order_by('-applied_at'), 1)
+
+
+@local_services
+class VacancyApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create(username='employer', role='employer')
+        company = Company.objects.create(user=employer, name='Компания')
+        cls.category = Category.objects.create(name='IT')
+        cls.skill = Skill.objects.create(name='Python')
+        created_at = timezone.now()
+        for i in range(25):
+            vacancy = Vacancy.objects.create(
+                company=company, title=f'Разработчик {i}', description='Описание',
+                requirements='Требования', location='Бишкек' if i % 2 else 'Ош',
+                category=cls.category, salary_from=1000 * i,
+            )
+            if i % 5 == 0:
+                vacancy.skills.add(cls.skill)
+        # Одинаковое время у части вакансий: курсор должен различать их по id
+        Vacancy.objects.filter(pk__lte=10).update(created_at=created_at)
+        Vacancy.objects.create(company=company, title='Закрыта', description='Описание',
+                               requirements='Требования', location='Ош', is_active=False)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            url = response.json()['next']
+            pages += 1
+        return ids, pages
+
+    def test_keyset_pages(self):
+        ids, pages = self.walk('/api/vacancies/?page_size=4')
+        expected = list(Vacancy.objects.filter(is_active=True).order_by(
+            '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 7)
+
+    def test_search_pages_by_rank(self):
+        # Самая новая вакансия, но слово только в описании: в выдаче последняя
+        in_description = Vacancy.objects.create(
+            company=Company.objects.get(), title='Аналитик', description='Нужен разработчик отчётов',
+            requirements='Требования', location='Бишкек',
+        )
+        ids, pages = self.walk('/api/vacancies/?' + urlencode({'q': 'разработчик', 'page_size': 4}))
+        expected = list(search_vacancies(Vacancy.objects.filter(is_active=True), 'разработчик').order_by(
+            'search_rank', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(ids[-1], in_description.pk)
+        self.assertEqual(pages, 7)
+
+    def test_deep_page_queries(self):
+        response = self.client.get('/api/vacancies/?page_size=4')
+        with self.assertNumQueries(2):
+            self.client.get(response.json()['next'])
+
+    def test_filters(self):
+        ids, _ = self.walk(f'/api/vacancies/?location=Бишкек&salary_min=10000&skills={self.skill.pk}')
+        expected = Vacancy.objects.filter(
+            location='Бишкек', salary_from__gte=10000, skills=self.skill
+        ).values_list('id', flat=True)
+        self.assertEqual(sorted(ids), sorted(expected))
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/vacancies/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/vacancies/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        vacancy = Vacancy.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            vacancy.title = 'Новое название'
+            vacancy.save()
+        response = self.client.get('/api/vacancies/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        vacancy = Vacancy.objects.filter(is_active=True).first()
+        response = self.client.get(f'/api/vacancies/{vacancy.pk}/')
+        self.assertEqual(response.json()['company']['name'], 'Компания')
+        self.assertEqual(self.client.get(f'/api/vacancies/{Vacancy.objects.get(is_active=False).pk}/').status_code, 404)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=cls.employer, name='Компания')
+        other = Company.objects.create(user=User.objects.create(username='other', role='employer'), name='Другая')
+        skills = [Skill.objects.create(name=name) for name in ('Python', 'SQL')]
+        profile = JobseekerProfile.objects.create(
+            user=User.objects.create(username='jobseeker', role='jobseeker', first_name='Айбек'),
+            desired_position='Разработчик', phone_number='+996555123456',
+        )
+        for i in range(12):
+            vacancy = Vacancy.objects.create(
+                company=cls.company if i % 3 else other, title=f'Вакансия {i}', description='Описание, "с кавычками"',
+                requirements='Требования', location='Бишкек', salary_from=1000 * i,
+            )
+            vacancy.skills.set(skills[:i % 3])
+            Application.objects.create(jobseeker=profile, vacancy=vacancy, cover_letter='Строка 1\nСтрока 2')
+        Vacancy.objects.filter(title='Вакансия 11').update(is_active=False)
+
+    def test_vacancies_csv(self):
+        out = io.StringIO()
+        call_command('export_data', 'vacancies', format='csv', chunk_size=5, stdout=out, stderr=io.StringIO())
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[2]['skills'], 'Python; SQL')
+        self.assertEqual(rows[0]['description'], 'Описание, "с кавычками"')
+
+    def test_vacancies_queries_per_chunk(self):
+        # Один запрос на выборку и по одному на навыки каждой пачки
+        with self.assertNumQueries(1 + 3):
+            lines = list(export_vacancies('jsonl', chunk_size=5))
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(json.loads(lines[1])['skills'], ['Python'])
+
+    def test_skills_only_for_chunk_vacancies(self):
+        # Вакансии другой компании лежат между id выборки: их навыки не читаются
+        queryset = Vacancy.objects.filter(company=self.company)
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(vacancy_rows(queryset, chunk_size=100))
+        self.assertEqual(len(rows), 8)
+        skill_ids = set(Vacancy.skills.through.objects.filter(
+            vacancy__company=self.company).values_list('vacancy_id', flat=True))
+        self.assertEqual({row['id'] for row in rows if row['skills']}, skill_ids)
+        self.assertIn(' IN (', queries[1]['sql'])
+        self.assertNotIn('>=', queries[1]['sql'])
+
+    def test_company_applications_stream(self):
+        self.client.force_login(self.employer)
+        response = self.client.get('/employer/applications/export/?format=jsonl')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[0]['first_name'], 'Айбек')
+        self.assertEqual(rows[0]['cover_letter'], 'Строка 1\nСтрока 2')
+        self.assertEqual(rows[0]['phone_number'], '+996555123456')
+
+    def test_export_requires_company(self):
+        self.assertEqual(self.client.get('/employer/applications/export/').status_code, 401)
+        self.client.force_login(self.employer)
+        self.assertEqual(self.client.get('/employer/applications/export/?format=xml').status_code, 400)
+
+
+@local_services
+class ImportTests(TestCase):
+    CSV = (
+        'external_id,title,description,requirements,location,category,skills,salary_from,is_active\n'
+        'A-1,Разработчик,Описание,Требования,Бишкек,IT,Python; SQL,1000,true\n'
+        'A-2,Аналитик,Описание,Требования,Ош,IT,SQL,,true\n'
+        'A-3,,Описание,Требования,Ош,IT,,,true\n'
+        'A-4,Тестировщик,Описание,Требования,Ош,Неизвестная,Go,,true\n'
+        'A-1,Дубль,Описание,Требования,Ош,IT,,,true\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=cls.employer, name='Компания')
+        cls.category = Category.objects.create(name='IT')
+        cls.python = Skill.objects.create(name='Python')
+        cls.sql = Skill.objects.create(name='SQL')
+
+    def test_csv_import_reports_row_errors(self):
+        report = import_vacancies(self.company, io.StringIO(self.CSV), 'csv')
+        self.assertEqual((report['rows'], report['created'], report['updated']), (5, 2, 0))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4, 5])
+        self.assertIn('title', report['errors'][0]['errors'])
+        self.assertEqual(set(report['errors'][1]['errors']), {'category', 'skills'})
+
+        vacancy = Vacancy.objects.get(company=self.company, external_id='A-1')
+        self.assertEqual(vacancy.category, self.category)
+        self.assertEqual(set(vacancy.skills.values_list('name', flat=True)), {'Python', 'SQL'})
+        self.assertTrue(VacancyStats.objects.filter(vacancy=vacancy).exists())
+        self.assertEqual(search_vacancies(Vacancy.objects.all(), 'аналитик').get().external_id, 'A-2')
+
+    def test_reimport_updates_by_external_id(self):
+        import_vacancies(self.company, io.StringIO(self.CSV), 'csv')
+        feed = (
+            '{"external_id": "A-1", "title": "Старший разработчик", "description": "Описание", '
+            '"requirements": "Требования", "location": "Бишкек", "skills": ["Python"]}\n'
+            '{"external_id": "A-2", "title": "Аналитик", "description": "Описание", '
+            '"requirements": "Требования", "location": "Ош", "is_active": false}\n'
+            'не json\n'
+        )
+        report = import_vacancies(self.company, io.StringIO(feed), 'jsonl')
+        self.assertEqual((report['created'], report['updated']), (0, 2))
+        self.assertEqual(report['errors'][0]['row'], 3)
+
+        first = Vacancy.objects.get(external_id='A-1')
+        self.assertEqual(first.title, 'Старший разработчик')
+        self.assertEqual(list(first.skills.values_list('name', flat=True)), ['Python'])
+        # Поля, которых нет в строке, не меняются
+        self.assertEqual(first.category, self.category)
+        second = Vacancy.objects.get(external_id='A-2')
+        self.assertFalse(second.is_active)
+        self.assertEqual(list(second.skills.values_list('name', flat=True)), ['SQL'])
+
+    def test_queries_per_batch(self):
+        rows = ''.join(
+            f'{{"external_id": "B-{i}", "title": "Вакансия {i}", "description": "Описание", '
+            f'"requirements": "Требования", "location": "Ош", "category": "IT", "skills": ["Python", "SQL"]}}\n'
+            for i in range(30)
+        )
+        # На пачку: категории, навыки, существующие вакансии, вставки и точка сохранения
+        with self.assertNumQueries(2 * 8):
+            report = import_vacancies(self.company, io.StringIO(rows), 'jsonl', batch_size=15)
+        self.assertEqual(report['created'], 30)
+        self.assertEqual(Vacancy.skills.through.objects.filter(vacancy__company=self.company).count(), 60)
+
+    def test_upload_endpoint(self):
+        self.client.force_login(self.employer)
+        upload = SimpleUploadedFile('feed.csv', self.CSV.encode('utf-8-sig'))
+        response = self.client.post('/employer/vacancy/import/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(len(response.json()['errors']), 3)
+
+    def test_command(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'feed.csv')
+        with open(path, 'w', encoding='utf-8') as feed:
+            feed.write(self.CSV)
+        out = io.StringIO()
+        call_command('import_vacancies', path, company=self.company.pk, stdout=out, stderr=io.StringIO())
+        self.assertIn('создано: 2', out.getvalue())
+
+
+@stub_templates
+@local_services
+class VacancyPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create(username='employer', role='employer')
+        cls.company = Company.objects.create(user=cls.employer, name='Компания')
+        cls.category = Category.objects.create(name='IT')
+        cls.vacancy = Vacancy.objects.create(
+            company=cls.company, title='Разработчик', description='Описание',
+            requirements='Требования', location='Бишкек', category=cls.category,
+        )
+
+    def setUp(self):
+        caches['pages'].clear()
+
+    def test_anonymous_pages_are_cached_by_normalized_query(self):
+        first = self.client.get('/employer/vacancies/?location=%D0%91%D0%B8%D1%88%D0%BA%D0%B5%D0%BA&category=1')
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                '/employer/vacancies/?category=1&utm_source=mail&location=%D0%91%D0%B8%D1%88%D0%BA%D0%B5%D0%BA&page=1'
+            )
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(self.client.get('/employer/vacancies/?category=2')['X-Page-Cache'], 'miss')
+
+    def test_vacancy_and_category_changes_invalidate(self):
+        self.client.get('/employer/vacancies/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vacancy.title = 'Ведущий разработчик'
+            self.vacancy.save()
+        self.assertEqual(self.client.get('/employer/vacancies/')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get('/employer/vacancies/')['X-Page-Cache'], 'hit')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Дизайн')
+        self.assertEqual(self.client.get('/employer/vacancies/')['X-Page-Cache'], 'miss')
+
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.force_login(self.employer)
+        self.client.get('/employer/vacancies/')
+        self.assertNotIn('X-Page-Cache', self.client.get('/employer/vacancies/'))
+
+
+@local_services
+class VacancyFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = User.objects.create(username='employer', role='employer')
+        company = Company.objects.create(user=employer, name='Компания')
+        cls.it = Category.objects.create(name='IT')
+        cls.design = Category.objects.create(name='Дизайн')
+        rows = [
+            (cls.it, 'Бишкек', 50000, 'Разработчик Python'),
+            (cls.it, 'Бишкек', 120000, 'Ведущий разработчик'),
+            (cls.it, 'Ош', None, 'Разработчик стажёр'),
+            (cls.design, 'Бишкек', 70000, 'Дизайнер интерфейсов'),
+            (cls.design, ' бишкек', 30000, 'Дизайнер'),
+        ]
+        for category, location, salary, title in rows:
+            Vacancy.objects.create(
+                company=company, category=category, location=location, salary_from=salary,
+                title=title, description='Описание', requirements='Требования',
+            )
+        Vacancy.objects.create(company=company, category=cls.it, location='Ош', title='Закрыта',
+                               description='-', requirements='-', is_active=False)
+
+    def setUp(self):
+        caches['pages'].clear()
+
+    def test_counts_exclude_own_filter(self):
+        facets = vacancy_facets(QueryDict('category=%d&salary_min=45000' % self.it.pk))
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(
+            [(item['name'], item['count']) for item in facets['categories']], [('IT', 2), ('Дизайн', 1)]
+        )
+        self.assertEqual(facets['locations'], [{'name': 'Бишкек', 'count': 2}])
+        salary = {item['from']: item['count'] for item in facets['salary']}
+        self.assertEqual((salary[20000], salary[40000], salary[60000], salary[100000]), (2, 2, 1, 1))
+
+    def test_search_and_location(self):
+        facets = vacancy_facets(QueryDict('q=разработчик&location=%D0%9E%D1%88'))
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['locations'], [{'name': 'Бишкек', 'count': 2}, {'name': 'Ош', 'count': 1}])
+
+    def test_location_matches_list_filter(self):
+        # Фасет сравнивает город тем же location__icontains, что и список вакансий
+        active = Vacancy.objects.filter(is_active=True)
+        for location in ('Бишкек', 'бишкек', 'БИШКЕК', 'Ош', 'ош'):
+            caches['pages'].clear()
+            facets = vacancy_facets(QueryDict(urlencode({'location': location})))
+            self.assertEqual(facets['total'], active.filter(location__icontains=location).count(), location)
+        # Написание города в фасете: при переходе по нему список покажет столько же
+        for item in vacancy_facets(QueryDict())['locations']:
+            self.assertEqual(item['count'], active.filter(location__icontains=item['name']).count(), item)
+
+    def test_single_query_cached_per_filter_set(self):
+        with self.assertNumQueries(2):
+            vacancy_facets(QueryDict('location=%D0%91%D0%B8%D1%88%D0%BA%D0%B5%D0%BA&salary_min=x'))
+        with self.assertNumQueries(0):
+            facets = vacancy_facets(QueryDict('salary_min=x&location=%D0%91%D0%B8%D1%88%D0%BA%D0%B5%D0%BA&page=3'))
+        self.assertEqual(facets['total'], Vacancy.objects.filter(is_active=True, location__icontains='Бишкек').count())
@@ -1,4 +1,6 @@
 from django.urls import path
+
+from core_models.views import select_view
 from . import views
 
 app_name = 'employers'
@@ -14,16 +16,23 @@ urlpatterns = [
 
     # Управление вакансиями (только для работодателя)
     path('vacancy/create/', views.VacancyCreateView.as_view(), name='vacancy_create'),
+    path('vacancy/import/', views.import_company_vacancies, name='vacancy_import'),
     path('vacancy/<int:pk>/edit/', views.VacancyUpdateView.as_view(), name='vacancy_edit'),
     path('vacancy/<int:pk>/delete/', views.VacancyDeleteView.as_view(), name='vacancy_delete'),
+    path('vacancy/<int:pk>/candidates/', views.RecommendedCandidatesView.as_view(), name='recommended_candidates'),
 
     # Личный кабинет работодателя
     path('cabinet/', views.EmployerCabinetView.as_view(), name='employer_cabinet'),
     path('applications/', views.VacancyApplicationsView.as_view(), name='applications'),
     path('applications/vacancy/<int:vacancy_id>/', views.VacancyApplicationsView.as_view(),
          name='applications_by_vacancy'),
+    path('applications/export/', views.export_company_applications, name='applications_export'),
 
     # HTMX действия
-    path('htmx/application/<int:application_id>/status/', views.htmx_update_application_status,
+    path('htmx/application/<int:application_id>/status/',
+         select_view('htmx_update_application_status', views.htmx_update_application_status,
+                     views.htmx_update_application_status_async),
          name='htmx_update_status'),
+    path('htmx/applications/status/', views.htmx_bulk_update_application_status,
+         name='htmx_bulk_update_status'),
 ]
\ No newline at end of file
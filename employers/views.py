@@ -1,16 +1,37 @@
+import io
+from collections import Counter
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
-
-from core_models.models import Category
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets
+
+from core_models.notifications import notify
+from core_models.page_cache import VersionedPageCacheMixin
+from core_models.pagination import KeysetPagination
+from core_models.query_stats import query_budget
+from core_models import reference
+from core_models.views import EagerLoadingViewSetMixin, VersionETagMixin
+from jobseekers.models import JobseekerProfile
+from .export import FORMATS, export_applications
+from .facets import vacancy_facets
+from .filters import VacancyFilter
+from .forms import VacancyForm
+from .imports import detect_format, import_vacancies
+from .matching import recommend_candidates
 from .models import Company, Vacancy, Application
+from .search import search_vacancies
+from .serializers import VacancyDetailSerializer, VacancyListSerializer
+from .stats import apply_status_changes, record_vacancy_view, visit_cabinet
 
 
 class CompanyProfileView(LoginRequiredMixin, DetailView):
+    query_budget = 5
     model = Company
     template_name = 'employers/company_profile.html'
     context_object_name = 'company'
@@ -20,6 +41,7 @@ class CompanyProfileView(LoginRequiredMixin, DetailView):
 
 
 class CompanyUpdateView(LoginRequiredMixin, UpdateView):
+    query_budget = 6
     model = Company
     fields = ['name', 'description', 'logo', 'website', 'address',
               'founded_year', 'employees_count']
@@ -30,11 +52,15 @@ class CompanyUpdateView(LoginRequiredMixin, UpdateView):
         return get_object_or_404(Company, user=self.request.user)
 
 
-class VacancyListView(ListView):
+class VacancyListView(VersionedPageCacheMixin, ListView):
+    query_budget = 4
     model = Vacancy
     template_name = 'employers/vacancy_list.html'
     context_object_name = 'vacancies'
     paginate_by = 12
+    # Анонимные страницы ленты кэшируются целиком, см. core_models/page_cache.py
+    page_cache_versions = ('vacancies',)
+    page_cache_params = ('q', 'category', 'location', 'salary_min', 'page')
 
     def get_queryset(self):
         qs = Vacancy.objects.filter(is_active=True).select_related(
@@ -47,12 +73,6 @@ class VacancyListView(ListView):
         location = self.request.GET.get('location')
         salary_min = self.request.GET.get('salary_min')
 
-        if query:
-            qs = qs.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(requirements__icontains=query)
-            )
         if category_id:
             qs = qs.filter(category_id=category_id)
         if location:
@@ -60,15 +80,23 @@ class VacancyListView(ListView):
         if salary_min:
             qs = qs.filter(salary_from__gte=salary_min)
 
-        return qs.order_by('-created_at')
+        qs = qs.order_by('-created_at')
+        if query:
+            # Ранжированный полнотекстовый поиск (см. employers/search.py)
+            qs = search_vacancies(qs, query)
+
+        return qs
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = reference.categories.all()
+        # Счётчики по категориям, городам и зарплате для текущих фильтров
+        context['facets'] = vacancy_facets(self.request.GET)
         return context
 
 
 class VacancyDetailView(DetailView):
+    query_budget = 12
     model = Vacancy
     template_name = 'employers/vacancy_detail.html'
     context_object_name = 'vacancy'
@@ -76,6 +104,8 @@ class VacancyDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         vacancy = self.object
+        if vacancy.company.user_id != self.request.user.id:
+            record_vacancy_view(vacancy)
         context['applications'] = Application.objects.filter(
             vacancy=vacancy
         ).select_related('jobseeker__user').order_by('-applied_at')
@@ -89,9 +119,9 @@ class VacancyDetailView(DetailView):
 
 
 class VacancyCreateView(LoginRequiredMixin, CreateView):
+    query_budget = 16
     model = Vacancy
-    fields = ['title', 'description', 'requirements', 'responsibilities', 'skills',
-              'salary_from', 'salary_to', 'location', 'category', 'is_active']
+    form_class = VacancyForm
     template_name = 'employers/vacancy_form.html'
     success_url = reverse_lazy('employers:employer_cabinet')
 
@@ -103,9 +133,9 @@ class VacancyCreateView(LoginRequiredMixin, CreateView):
 
 
 class VacancyUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+    query_budget = 20
     model = Vacancy
-    fields = ['title', 'description', 'requirements', 'responsibilities', 'skills',
-              'salary_from', 'salary_to', 'location', 'category', 'is_active']
+    form_class = VacancyForm
     template_name = 'employers/vacancy_form.html'
 
     def test_func(self):
@@ -113,11 +143,27 @@ class VacancyUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return (vacancy.company.user == self.request.user or
                 self.request.user.is_staff)
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'is_active' in form.changed_data and not self.object.is_active:
+            # Вакансию закрыли: уведомляем всех, кто ещё ждёт ответа
+            user_ids = Application.objects.filter(
+                vacancy=self.object
+            ).exclude(status__in=['rejected', 'hired']).values_list('jobseeker__user_id', flat=True)
+            notify(
+                list(user_ids),
+                'Вакансия закрыта',
+                'Вакансия "{title}" закрыта работодателем',
+                context={'title': self.object.title},
+            )
+        return response
+
     def get_success_url(self):
         return reverse_lazy('employers:vacancy_detail', kwargs={'pk': self.object.pk})
 
 
 class VacancyDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+    query_budget = 20
     model = Vacancy
     success_url = reverse_lazy('employers:employer_cabinet')
 
@@ -132,26 +178,52 @@ class VacancyDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 
 class EmployerCabinetView(LoginRequiredMixin, TemplateView):
+    query_budget = 8
     template_name = 'employers/cabinet.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         company = get_object_or_404(Company, user=self.request.user)
+        # Счётчики читаются из предрасчитанной статистики (employers/stats.py)
+        company_stats = visit_cabinet(company)
 
         context['company'] = company
-        context['vacancies'] = Vacancy.objects.filter(company=company).order_by('-created_at')
-        context['total_applications'] = Application.objects.filter(
-            vacancy__company=company
-        ).count()
-        context['new_applications'] = Application.objects.filter(
-            vacancy__company=company,
-            status='sent'
-        ).count()
+        context['stats'] = company_stats
+        context['vacancies'] = Vacancy.objects.filter(company=company).select_related(
+            'stats'
+        ).order_by('-created_at')
+        context['total_applications'] = company_stats.total
+        context['new_applications'] = company_stats.sent
+        context['new_since_visit'] = company_stats.new_since_visit
+
+        return context
+
+
+class RecommendedCandidatesView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+    query_budget = 12
+    model = Vacancy
+    template_name = 'employers/recommended_candidates.html'
+    context_object_name = 'vacancy'
+    limit = 20
 
+    def test_func(self):
+        vacancy = self.get_object()
+        return (vacancy.company.user == self.request.user or
+                self.request.user.is_staff)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        scored = recommend_candidates(self.object, self.limit)
+        profiles = JobseekerProfile.objects.select_related('user').in_bulk([pk for pk, _ in scored])
+        context['candidates'] = [
+            {'profile': profiles[pk], 'score': round(score * 100)}
+            for pk, score in scored if pk in profiles
+        ]
         return context
 
 
 class VacancyApplicationsView(LoginRequiredMixin, ListView):
+    query_budget = 6
     model = Application
     template_name = 'employers/applications.html'
     context_object_name = 'applications'
@@ -172,25 +244,68 @@ class VacancyApplicationsView(LoginRequiredMixin, ListView):
 
 
 # HTMX: изменить статус отклика
+@query_budget(18)
 def htmx_update_application_status(request, application_id):
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Авторизация требуется'}, status=401)
 
-    application = get_object_or_404(Application, id=application_id)
     company = get_object_or_404(Company, user=request.user)
+    new_status = request.POST.get('status')
+    if new_status not in ['sent', 'viewed', 'interview', 'rejected', 'hired']:
+        return JsonResponse({'error': 'Неверный статус'}, status=400)
+
+    # Отклик блокируется до конца транзакции, как в массовой смене статуса:
+    # параллельная смена ждёт и видит уже записанный статус
+    with transaction.atomic():
+        application = get_object_or_404(
+            Application.objects.select_for_update(of=('self',)).select_related('vacancy', 'jobseeker'),
+            id=application_id,
+        )
+        if application.vacancy.company_id != company.id and not request.user.is_staff:
+            return JsonResponse({'error': 'Нет доступа'}, status=403)
+
+        application.status = new_status
+        application.save()
 
-    if application.vacancy.company != company and not request.user.is_staff:
+        # Создать уведомление
+        from core_models.models import Notification
+        Notification.objects.create(
+            user_id=application.jobseeker.user_id,
+            title=f'Статус отклика изменён',
+            message=f'Ваш отклик на вакансию "{application.vacancy.title}" теперь: {application.get_status_display()}'
+        )
+
+    return JsonResponse({
+        'success': True,
+        'status': application.get_status_display()
+    })
+
+
+# Асинхронная версия (ASYNC_HTMX_VIEWS): связи отклика загружаются сразу,
+# ленивое обращение к ним в event loop запрещено
+@query_budget(18)
+async def htmx_update_application_status_async(request, application_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+
+    application = await aget_object_or_404(
+        Application.objects.select_related('vacancy', 'jobseeker'), id=application_id
+    )
+    company = await aget_object_or_404(Company, user=user)
+
+    if application.vacancy.company_id != company.id and not user.is_staff:
         return JsonResponse({'error': 'Нет доступа'}, status=403)
 
     new_status = request.POST.get('status')
     if new_status in ['sent', 'viewed', 'interview', 'rejected', 'hired']:
         application.status = new_status
-        application.save()
+        # Статистику не собьёт и параллельная смена: save читает статус под блокировкой
+        await application.asave()
 
-        # Создать уведомление
         from core_models.models import Notification
-        Notification.objects.create(
-            user=application.jobseeker.user,
+        await Notification.objects.acreate(
+            user_id=application.jobseeker.user_id,
             title=f'Статус отклика изменён',
             message=f'Ваш отклик на вакансию "{application.vacancy.title}" теперь: {application.get_status_display()}'
         )
@@ -201,3 +316,122 @@ def htmx_update_application_status(request, application_id):
         })
 
     return JsonResponse({'error': 'Неверный статус'}, status=400)
+
+
+# HTMX: массовое изменение статуса откликов.
+# Бюджет растёт с числом затронутых вакансий: статистика и уведомления — по вакансии
+@query_budget(40)
+def htmx_bulk_update_application_status(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+
+    statuses = dict(Application._meta.get_field('status').choices)
+    new_status = request.POST.get('status')
+    if new_status not in statuses:
+        return JsonResponse({'error': 'Неверный статус'}, status=400)
+
+    try:
+        application_ids = [int(pk) for pk in request.POST.getlist('application_ids')]
+    except ValueError:
+        return JsonResponse({'error': 'Неверный список откликов'}, status=400)
+
+    # Проверка владения одним запросом: чужие отклики просто не попадут в выборку
+    applications = Application.objects.filter(id__in=application_ids)
+    if not request.user.is_staff:
+        applications = applications.filter(vacancy__company__user=request.user)
+
+    with transaction.atomic():
+        # Старые статусы читаются под блокировкой строк откликов (по порядку id,
+        # чтобы встречные запросы не взаимоблокировались): параллельный запрос
+        # не изменит их между чтением и UPDATE, и статистика не разойдётся
+        changed = list(applications.exclude(status=new_status).select_for_update(of=('self',)).order_by('id')
+                       .values_list('id', 'jobseeker__user_id', 'vacancy__title', 'vacancy_id',
+                                    'vacancy__company_id', 'status'))
+
+        by_vacancy = {}
+        status_changes = Counter()
+        for _, user_id, vacancy_title, vacancy_id, company_id, old_status in changed:
+            by_vacancy.setdefault((vacancy_id, vacancy_title), []).append(user_id)
+            status_changes[(vacancy_id, company_id, old_status, new_status)] += 1
+
+        updated = Application.objects.filter(id__in=[row[0] for row in changed]).update(status=new_status)
+        apply_status_changes(status_changes)
+        for (_, vacancy_title), user_ids in by_vacancy.items():
+            notify(
+                user_ids,
+                'Статус отклика изменён',
+                'Ваш отклик на вакансию "{vacancy}" теперь: {status}',
+                context={'vacancy': vacancy_title, 'status': statuses[new_status]},
+            )
+
+    return JsonResponse({
+        'success': True,
+        'updated': updated,
+        'status': statuses[new_status],
+    })
+
+
+# Выгрузка откликов компании в CSV/JSONL потоком, без загрузки в память
+@query_budget(4)
+def export_company_applications(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    company = get_object_or_404(Company, user=request.user)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': 'Неизвестный формат'}, status=400)
+
+    queryset = Application.objects.filter(vacancy__company=company)
+    vacancy_id = request.GET.get('vacancy', '')
+    if vacancy_id.isdigit():
+        queryset = queryset.filter(vacancy_id=vacancy_id)
+
+    response = StreamingHttpResponse(export_applications(fmt, queryset), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="applications.{fmt}"'
+    return response
+
+
+# Массовый импорт вакансий компании из CSV/JSONL.
+# Бюджет растёт с числом пачек: около десятка запросов на BATCH_SIZE строк
+@query_budget(60)
+def import_company_vacancies(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+
+    company = get_object_or_404(Company, user=request.user)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Файл не передан'}, status=400)
+    fmt = request.POST.get('format') or detect_format(upload.name)
+    if fmt not in ('csv', 'jsonl'):
+        return JsonResponse({'error': 'Неизвестный формат'}, status=400)
+
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_vacancies(company, stream, fmt)
+    except UnicodeDecodeError:
+        return JsonResponse({'error': 'Файл должен быть в кодировке UTF-8'}, status=400)
+    return JsonResponse(report)
+
+
+# API: лента активных вакансий для мобильного приложения и партнёров
+class VacancyViewSet(VersionETagMixin, EagerLoadingViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budget = 5
+    queryset = Vacancy.objects.filter(is_active=True)
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = VacancyFilter
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
+    # С параметром q выдача идёт по релевантности (employers.search)
+    keyset_rank_field = 'search_rank'
+    etag_versions = ('vacancies',)
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return VacancyDetailSerializer
+        return VacancyListSerializer
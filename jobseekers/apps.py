@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class JobseekersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'jobseekers'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,16 @@
+import django_filters
+
+from core_models import reference
+from .models import JobseekerProfile
+
+
+class JobseekerProfileFilter(django_filters.FilterSet):
+    position = django_filters.CharFilter(field_name='desired_position', lookup_expr='icontains')
+    experience_min = django_filters.NumberFilter(field_name='experience_years', lookup_expr='gte')
+    salary_max = django_filters.NumberFilter(field_name='desired_salary_from', lookup_expr='lte')
+    skills = reference.ReferenceMultipleChoiceFilter(field_name='skills__skill', reference=reference.skills)
+    location = django_filters.CharFilter(field_name='user__location', lookup_expr='icontains')
+
+    class Meta:
+        model = JobseekerProfile
+        fields = ['position', 'experience_min', 'salary_max', 'skills', 'location']
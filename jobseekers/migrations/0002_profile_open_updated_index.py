@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobseekers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobseekerprofile',
+            index=models.Index(condition=models.Q(('is_open_to_work', True)), fields=['-updated_at', '-id'],
+                               name='profile_open_updated_idx'),
+        ),
+    ]
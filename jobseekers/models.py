@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 from core_models.models import User, Skill, Category
 from phonenumber_field.modelfields import PhoneNumberField
@@ -25,6 +26,11 @@ class JobseekerProfile(models.Model):
     class Meta:
         verbose_name = 'Резюме соискателя'
         verbose_name_plural = 'Резюме соискателей'
+        indexes = [
+            # Лента открытых резюме в API, keyset-пагинация по (updated_at, id)
+            models.Index(fields=['-updated_at', '-id'], condition=Q(is_open_to_work=True),
+                         name='profile_open_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.get_full_name() or self.user.username} — {self.desired_position}'
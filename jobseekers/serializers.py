@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
-from core_models.models import Skill
-from core_models.serializers import SkillSerializer
+from core_models import reference
+from core_models.serializers import EagerLoadingMixin, SkillSerializer
 from .models import JobseekerProfile, Education, Experience, JobseekerSkill
 
 
@@ -17,20 +17,23 @@ class ExperienceSerializer(serializers.ModelSerializer):
         fields = ['id', 'company', 'position', 'description', 'start_date', 'end_date', 'is_current']
 
 
-class JobseekerSkillSerializer(serializers.ModelSerializer):
+class JobseekerSkillSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('skill',)
+
     skill = SkillSerializer(read_only=True)
-    skill_id = serializers.PrimaryKeyRelatedField(
-        queryset=Skill.objects.all(), source='skill', write_only=True
-    )
+    skill_id = reference.ReferencePrimaryKeyRelatedField(reference.skills, source='skill', write_only=True)
 
     class Meta:
         model = JobseekerSkill
         fields = ['skill', 'skill_id', 'level']
 
 
-class JobseekerProfileListSerializer(serializers.ModelSerializer):
+class JobseekerProfileListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
+    prefetch_related_fields = ('skills',)
+
     user = serializers.CharField(source='user.get_full_name', default='Пользователь')
-    skills = JobseekerSkillSerializer(source='skills', many=True, read_only=True)
+    skills = JobseekerSkillSerializer(many=True, read_only=True)
 
     class Meta:
         model = JobseekerProfile
@@ -41,11 +44,14 @@ class JobseekerProfileListSerializer(serializers.ModelSerializer):
         ]
 
 
-class JobseekerProfileDetailSerializer(serializers.ModelSerializer):
+class JobseekerProfileDetailSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
+    prefetch_related_fields = ('education', 'experience', 'skills')
+
     user = serializers.CharField(source='user.get_full_name')
     education = EducationSerializer(many=True, read_only=True)
     experience = ExperienceSerializer(many=True, read_only=True)
-    skills = JobseekerSkillSerializer(source='skills', many=True, read_only=True)
+    skills = JobseekerSkillSerializer(many=True, read_only=True)
 
     class Meta:
         model = JobseekerProfile
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+
+from core_models.models import Skill, User
+from core_models.versions import bump_version
+from .models import Education, Experience, JobseekerProfile, JobseekerSkill
+
+
+# Данные, из которых собирается лента резюме API: их изменение
+# сбрасывает ETag ленты (core_models.versions)
+def resumes_changed(sender, **kwargs):
+    bump_version('resumes')
+
+
+def user_changed(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — на резюме это не влияет
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version('resumes')
+
+
+for model in (JobseekerProfile, JobseekerSkill, Education, Experience, Skill):
+    post_save.connect(resumes_changed, sender=model, dispatch_uid=f'resumes_version_save_{model.__name__}')
+    post_delete.connect(resumes_changed, sender=model, dispatch_uid=f'resumes_version_delete_{model.__name__}')
+post_save.connect(user_changed, sender=User, dispatch_uid='resumes_version_user')
@@ -1,3 +1,159 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction
+from django.test import TestCase, override_settings
+from django.urls import resolve
 
-# Create your tests here.
+from core_models.models import Skill, User
+from core_models.testing import QueryBudgetMixin, local_services, stub_templates
+from employers.models import Application, Company, Vacancy
+from .models import Education, Experience, JobseekerProfile, JobseekerSkill
+from .serializers import JobseekerProfileDetailSerializer, JobseekerProfileListSerializer
+
+
+@stub_templates
+@local_services
+class JobseekerQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jobseeker', role='jobseeker')
+        cls.profile = JobseekerProfile.objects.create(user=cls.user, desired_position='Разработчик')
+        employer = User.objects.create(username='employer', role='employer')
+        company = Company.objects.create(user=employer, name='Компания')
+        cls.vacancies = [
+            Vacancy.objects.create(company=company, title=f'Разработчик {i}', description='Описание',
+                                   requirements='Требования', location='Бишкек')
+            for i in range(5)
+        ]
+        for vacancy in cls.vacancies[1:]:
+            Application.objects.create(jobseeker=cls.profile, vacancy=vacancy)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cabinet(self):
+        self.assertQueryBudget('get', '/jobseeker/cabinet/')
+
+    def test_my_applications(self):
+        self.assertQueryBudget('get', '/jobseeker/applications/')
+
+    def test_recommended_vacancies(self):
+        self.assertQueryBudget('get', '/jobseeker/recommended/')
+
+    def test_apply(self):
+        response = self.assertQueryBudget('post', f'/jobseeker/htmx/apply/{self.vacancies[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Application.objects.filter(jobseeker=self.profile, vacancy=self.vacancies[0]).exists())
+
+
+class ProfileSerializerQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        skills = [Skill.objects.create(name=f'Навык {i}') for i in range(3)]
+        for i in range(50):
+            user = User.objects.create(username=f'jobseeker{i}', role='jobseeker')
+            profile = JobseekerProfile.objects.create(user=user, desired_position='Разработчик')
+            JobseekerSkill.objects.bulk_create([JobseekerSkill(profile=profile, skill=skill) for skill in skills])
+            Education.objects.create(profile=profile, institution='КНУ', start_year=2015)
+            Experience.objects.create(profile=profile, company='Компания', position='Разработчик',
+                                      start_date='2020-01-01')
+
+    def assertConstantQueries(self, serializer_class, num):
+        queryset = serializer_class.setup_eager_loading(JobseekerProfile.objects.order_by('id'))
+        for size in (5, 50):
+            with self.assertNumQueries(num):
+                data = serializer_class(queryset[:size], many=True).data
+            self.assertEqual(len(data), size)
+
+    def test_profile_list(self):
+        self.assertConstantQueries(JobseekerProfileListSerializer, 2)
+        self.assertEqual(len(JobseekerProfileListSerializer(
+            JobseekerProfileListSerializer.setup_eager_loading(JobseekerProfile.objects.all())[:1], many=True
+        ).data[0]['skills']), 3)
+
+    def test_profile_detail(self):
+        self.assertConstantQueries(JobseekerProfileDetailSerializer, 4)
+
+
+@local_services
+class ResumeApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.skill = Skill.objects.create(name='Python')
+        for i in range(12):
+            user = User.objects.create(username=f'jobseeker{i}', role='jobseeker', location='Бишкек')
+            profile = JobseekerProfile.objects.create(
+                user=user, desired_position='Разработчик', experience_years=i, is_open_to_work=i != 0,
+            )
+            if i % 3 == 0:
+                JobseekerSkill.objects.create(profile=profile, skill=cls.skill, level=3)
+        cls.employer = User.objects.create(username='employer', role='employer')
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get('/api/resumes/').status_code, 403)
+
+    def test_feed(self):
+        self.client.force_login(self.employer)
+        response = self.client.get('/api/resumes/?page_size=5')
+        first = response.json()
+        self.assertEqual(len(first['results']), 5)
+        second = self.client.get(first['next']).json()
+        third = self.client.get(second['next']).json()
+        ids = [item['id'] for page in (first, second, third) for item in page['results']]
+        self.assertEqual(ids, list(JobseekerProfile.objects.filter(is_open_to_work=True).order_by(
+            '-updated_at', '-id').values_list('id', flat=True)))
+        self.assertIsNone(third['next'])
+
+    def test_filters(self):
+        self.client.force_login(self.employer)
+        response = self.client.get(f'/api/resumes/?skills={self.skill.pk}&experience_min=4')
+        self.assertEqual([item['experience_years'] for item in response.json()['results']], [9, 6])
+
+    def test_etag_changes_with_profile(self):
+        self.client.force_login(self.employer)
+        etag = self.client.get('/api/resumes/')['ETag']
+        self.assertEqual(self.client.get('/api/resumes/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            JobseekerSkill.objects.create(profile=JobseekerProfile.objects.get(user__username='jobseeker1'),
+                                          skill=self.skill)
+        self.assertEqual(self.client.get('/api/resumes/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@stub_templates
+@local_services
+@override_settings(ASYNC_HTMX_VIEWS={'htmx_add_skill', 'htmx_apply_vacancy'})
+class AsyncHtmxTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jobseeker', role='jobseeker')
+        cls.profile = JobseekerProfile.objects.create(user=cls.user, desired_position='Разработчик')
+        cls.skill = Skill.objects.create(name='Python')
+        company = Company.objects.create(user=User.objects.create(username='employer', role='employer'),
+                                         name='Компания')
+        cls.vacancy, applied = [
+            Vacancy.objects.create(company=company, title=f'Разработчик {i}', description='Описание',
+                                   requirements='Требования', location='Бишкек')
+            for i in range(2)
+        ]
+        Application.objects.create(jobseeker=cls.profile, vacancy=applied)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_views_are_async(self):
+        self.assertTrue(iscoroutinefunction(resolve('/jobseeker/htmx/add-skill/').func))
+
+    def test_add_skill(self):
+        for _ in range(2):
+            response = self.assertQueryBudget('post', '/jobseeker/htmx/add-skill/', {'skill_id': self.skill.pk})
+            self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(JobseekerSkill.objects.filter(profile=self.profile, skill=self.skill).count(), 1)
+        self.assertEqual(self.client.post('/jobseeker/htmx/add-skill/', {'skill_id': 0}).status_code, 404)
+
+    def test_apply(self):
+        response = self.assertQueryBudget('post', f'/jobseeker/htmx/apply/{self.vacancy.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post(f'/jobseeker/htmx/apply/{self.vacancy.pk}/').status_code, 400)
+        self.assertEqual(Application.objects.filter(jobseeker=self.profile, vacancy=self.vacancy).count(), 1)
+
+    def test_anonymous(self):
+        self.client.logout()
+        self.assertEqual(self.client.post(f'/jobseeker/htmx/apply/{self.vacancy.pk}/').status_code, 401)
@@ -1,4 +1,6 @@
 from django.urls import path
+
+from core_models.views import select_view
 from . import views
 
 app_name = 'jobseekers'
@@ -15,8 +17,12 @@ urlpatterns = [
     # Личный кабинет
     path('cabinet/', views.JobseekerCabinetView.as_view(), name='cabinet'),
     path('applications/', views.MyApplicationsView.as_view(), name='my_applications'),
+    path('recommended/', views.RecommendedVacanciesView.as_view(), name='recommended_vacancies'),
 
     # HTMX действия
-    path('htmx/add-skill/', views.htmx_add_skill, name='htmx_add_skill'),
-    path('htmx/apply/<int:vacancy_id>/', views.htmx_apply_vacancy, name='htmx_apply_vacancy'),
+    path('htmx/add-skill/', select_view('htmx_add_skill', views.htmx_add_skill, views.htmx_add_skill_async),
+         name='htmx_add_skill'),
+    path('htmx/apply/<int:vacancy_id>/',
+         select_view('htmx_apply_vacancy', views.htmx_apply_vacancy, views.htmx_apply_vacancy_async),
+         name='htmx_apply_vacancy'),
 ]
\ No newline at end of file
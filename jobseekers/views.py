@@ -1,17 +1,28 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.db.models import Q
-
-from employers.models import Application
-from core_models.models import User, Category, Skill
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from employers.matching import recommend_vacancies
+from employers.models import Application, Vacancy
+from core_models import reference
+from core_models.models import User, Category
+from core_models.pagination import KeysetPagination
+from core_models.query_stats import query_budget
+from core_models.views import EagerLoadingViewSetMixin, VersionETagMixin
+from .filters import JobseekerProfileFilter
 from .models import JobseekerProfile, Education, Experience, JobseekerSkill
+from .serializers import JobseekerProfileDetailSerializer, JobseekerProfileListSerializer
 
 
 class JobseekerProfileView(LoginRequiredMixin, DetailView):
+    query_budget = 5
     model = JobseekerProfile
     template_name = 'jobseekers/profile.html'
     context_object_name = 'profile'
@@ -21,6 +32,7 @@ class JobseekerProfileView(LoginRequiredMixin, DetailView):
 
 
 class JobseekerProfileUpdateView(LoginRequiredMixin, UpdateView):
+    query_budget = 6
     model = JobseekerProfile
     fields = ['about', 'desired_position', 'desired_salary_from', 'desired_salary_to',
               'experience_years', 'is_open_to_work']
@@ -32,6 +44,7 @@ class JobseekerProfileUpdateView(LoginRequiredMixin, UpdateView):
 
 
 class EducationCreateView(LoginRequiredMixin, CreateView):
+    query_budget = 5
     model = Education
     fields = ['institution', 'faculty', 'specialty', 'degree', 'start_year',
               'end_year', 'is_current']
@@ -45,6 +58,7 @@ class EducationCreateView(LoginRequiredMixin, CreateView):
 
 
 class ExperienceCreateView(LoginRequiredMixin, CreateView):
+    query_budget = 5
     model = Experience
     fields = ['company', 'position', 'description', 'start_date', 'end_date', 'is_current']
     template_name = 'jobseekers/experience_form.html'
@@ -57,6 +71,7 @@ class ExperienceCreateView(LoginRequiredMixin, CreateView):
 
 
 class JobseekerCabinetView(LoginRequiredMixin, TemplateView):
+    query_budget = 5
     template_name = 'jobseekers/cabinet.html'
 
     def get_context_data(self, **kwargs):
@@ -75,6 +90,7 @@ class JobseekerCabinetView(LoginRequiredMixin, TemplateView):
 
 
 class MyApplicationsView(LoginRequiredMixin, ListView):
+    query_budget = 6
     model = Application
     template_name = 'jobseekers/applications.html'
     context_object_name = 'applications'
@@ -87,14 +103,35 @@ class MyApplicationsView(LoginRequiredMixin, ListView):
         ).order_by('-applied_at')
 
 
+class RecommendedVacanciesView(LoginRequiredMixin, TemplateView):
+    query_budget = 10
+    template_name = 'jobseekers/recommended_vacancies.html'
+    limit = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        profile = get_object_or_404(JobseekerProfile.objects.select_related('user'), user=self.request.user)
+        scored = recommend_vacancies(profile, self.limit)
+        vacancies = Vacancy.objects.select_related('company', 'category').in_bulk([pk for pk, _ in scored])
+        context['profile'] = profile
+        context['vacancies'] = [
+            {'vacancy': vacancies[pk], 'score': round(score * 100)}
+            for pk, score in scored if pk in vacancies
+        ]
+        return context
+
+
 # HTMX: добавить навык
+@query_budget(8)
 def htmx_add_skill(request):
     if request.method == 'POST':
         profile = get_object_or_404(JobseekerProfile, user=request.user)
         skill_id = request.POST.get('skill_id')
         level = request.POST.get('level', 2)
 
-        skill = get_object_or_404(Skill, id=skill_id)
+        skill = reference.skills.get(skill_id)
+        if skill is None:
+            raise Http404
 
         if not JobseekerSkill.objects.filter(profile=profile, skill=skill).exists():
             JobseekerSkill.objects.create(
@@ -109,12 +146,13 @@ def htmx_add_skill(request):
 
 
 # HTMX: отклик на вакансию
+@query_budget(16)
 def htmx_apply_vacancy(request, vacancy_id):
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Требуется авторизация'}, status=401)
 
     profile = get_object_or_404(JobseekerProfile, user=request.user)
-    vacancy = get_object_or_404('employes.Vacancy', id=vacancy_id, is_active=True)
+    vacancy = get_object_or_404(Vacancy, id=vacancy_id, is_active=True)
 
     if Application.objects.filter(jobseeker=profile, vacancy=vacancy).exists():
         return JsonResponse({'error': 'Вы уже откликнулись на эту вакансию'}, status=400)
@@ -129,4 +167,71 @@ def htmx_apply_vacancy(request, vacancy_id):
         'success': True,
         'message': 'Отклик отправлен!',
         'application_id': application.id
-    })
\ No newline at end of file
+    })
+
+
+# Асинхронные версии HTMX-действий (ASYNC_HTMX_VIEWS)
+@query_budget(8)
+async def htmx_add_skill_async(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Bad request'}, status=400)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    profile = await aget_object_or_404(JobseekerProfile, user=user)
+    skill = await reference.skills.aget(request.POST.get('skill_id'))
+    if skill is None:
+        raise Http404
+
+    if not await JobseekerSkill.objects.filter(profile=profile, skill=skill).aexists():
+        await JobseekerSkill.objects.acreate(
+            profile=profile,
+            skill=skill,
+            level=request.POST.get('level', 2)
+        )
+
+    return JsonResponse({'success': True})
+
+
+@query_budget(16)
+async def htmx_apply_vacancy_async(request, vacancy_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    profile = await aget_object_or_404(JobseekerProfile, user=user)
+    vacancy = await aget_object_or_404(Vacancy, id=vacancy_id, is_active=True)
+
+    if await Application.objects.filter(jobseeker=profile, vacancy=vacancy).aexists():
+        return JsonResponse({'error': 'Вы уже откликнулись на эту вакансию'}, status=400)
+
+    application = await Application.objects.acreate(
+        jobseeker=profile,
+        vacancy=vacancy,
+        cover_letter=request.POST.get('cover_letter', '')
+    )
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Отклик отправлен!',
+        'application_id': application.id
+    })
+
+
+# API: лента открытых резюме. У резюме нет даты создания,
+# поэтому лента упорядочена по дате обновления
+class JobseekerProfileViewSet(VersionETagMixin, EagerLoadingViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budget = 8
+    queryset = JobseekerProfile.objects.filter(is_open_to_work=True)
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = JobseekerProfileFilter
+    pagination_class = KeysetPagination
+    keyset_field = 'updated_at'
+    etag_versions = ('resumes',)
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return JobseekerProfileDetailSerializer
+        return JobseekerProfileListSerializer
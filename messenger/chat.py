@@ -0,0 +1,288 @@
+import asyncio
+import functools
+import json
+import logging
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q
+
+from .events import user_group
+from .models import ChatRoom, Message
+from .serializers import MessageSerializer
+
+logger = logging.getLogger(__name__)
+
+# Запись сообщений чата из ChatConsumer через общий для процесса буфер.
+# Сообщения копятся в ограниченной очереди и пишутся пачкой: bulk_create
+# сообщений и по одному UPDATE счётчиков на чат, не реже раза в FLUSH_INTERVAL
+# и не больше BATCH_SIZE за раз. Переполненная очередь задерживает чтение
+# из сокета отправителя (await put) — так буфер не растёт без предела.
+# После записи сообщение сериализуется один раз. Сообщения пачки собираются
+# по участникам: каждый получает одно событие chat_messages со всеми своими
+# сообщениями в персональную группу (messenger.events) — один group_send на
+# участника пачки, а не два на каждое сообщение.
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.005
+MAX_PENDING = 5000
+MAX_LENGTH = 5000
+
+# Отметки о доставке и прочтении копятся RECEIPT_INTERVAL секунд: от каждой пары
+# (чат, читатель) остаётся только наибольший id. Прочтение записывается одним
+# UPDATE по диапазону id на чат (ChatRoom.mark_read), все чаты — в одной транзакции;
+# доставка в БД не хранится. Собеседник получает одно событие
+# {type: 'receipt', status, room_id, user_id, up_to} на чат за интервал,
+# его же получают остальные вкладки читателя.
+RECEIPT_INTERVAL = 0.5
+
+# Досылка после переподключения: клиент сообщает последний известный номер
+# (Message.seq) по каждому чату, и по каждому отставшему чату выполняется один
+# запрос по диапазону номеров (индекс message_room_seq_uniq). За раз по чату
+# досылается не больше REPLAY_LIMIT сообщений; если пропущено больше, чат
+# попадает в more, и клиент повторяет запрос с новым номером.
+REPLAY_LIMIT = 200
+MAX_REPLAY_ROOMS = 100
+
+
+@functools.cache
+def _message_serializer():
+    # Один экземпляр на процесс: поля сериализатора строятся один раз,
+    # новый экземпляр на каждое сообщение обходится дороже самой сериализации
+    return MessageSerializer()
+
+
+def _message_data(message):
+    data = _message_serializer().to_representation(message)
+    data['type'] = 'message'
+    return data
+
+
+def message_text(message, client_id=None):
+    # Готовый JSON для события chat_message: consumer отправляет его
+    # клиенту как есть, без повторной сериализации
+    data = _message_data(message)
+    if client_id is not None:
+        data['client_id'] = client_id
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _write(messages):
+    with transaction.atomic():
+        # Номера сообщений (Message.seq) выдаются под блокировкой строк чатов
+        per_room = defaultdict(list)
+        for message in messages:
+            per_room[message.room_id].append(message)
+        last_seq = dict(
+            ChatRoom.objects.select_for_update().filter(pk__in=per_room).order_by('pk')
+            .values_list('pk', 'last_seq')
+        )
+        for message in messages:
+            last_seq[message.room_id] += 1
+            message.seq = last_seq[message.room_id]
+        Message.objects.bulk_create(messages)
+        for room_id, room_messages in per_room.items():
+            last = room_messages[-1]
+            unread = defaultdict(int)
+            for message in room_messages:
+                unread[message.room.unread_field(message.recipient_id)] += 1
+            ChatRoom.objects.filter(pk=room_id).update(
+                last_message=last,
+                last_message_at=last.sent_at,
+                last_seq=last.seq,
+                **{field: F(field) + count for field, count in unread.items()},
+            )
+    return messages
+
+
+class MessageWriter:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(max_pending)
+        self.task = None
+
+    async def submit(self, message, client_id=None):
+        # Возвращает future, который завершится после записи пачки с сообщением
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, client_id, future))
+        return future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Всё, что уже лежит в очереди, забираем без ожидания
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self.flush(batch)
+            except Exception as error:
+                logger.exception('Не удалось записать %d сообщений', len(batch))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def flush(self, batch):
+        messages = [message for message, _, _ in batch]
+        try:
+            await database_sync_to_async(_write)(messages)
+        except DatabaseError as error:
+            for _, _, future in batch:
+                future.set_exception(error)
+            return
+
+        texts = defaultdict(list)
+        for message, client_id, future in batch:
+            future.set_result(message)
+            # client_id — метка вкладки отправителя: получатель его не видит
+            data = _message_data(message)
+            text = json.dumps(data, ensure_ascii=False)
+            texts[message.recipient_id].append(text)
+            if client_id is not None:
+                text = json.dumps({**data, 'client_id': client_id}, ensure_ascii=False)
+            texts[message.sender_id].append(text)
+
+        channel_layer = get_channel_layer()
+        results = await asyncio.gather(*(
+            channel_layer.group_send(user_group(user_id), {'type': 'chat_messages', 'texts': user_texts})
+            for user_id, user_texts in texts.items()
+        ), return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            logger.warning('Не доставлено %d событий чата', len(failed), exc_info=failed[0])
+
+
+def _mark_read(reads):
+    with transaction.atomic():
+        return {
+            key: room.mark_read(reader, up_to=up_to)
+            for key, (room, reader, up_to) in reads.items()
+        }
+
+
+def replay(user, seqs):
+    # seqs — {room_id: последний известный клиенту номер}. Возвращает JSON
+    # пропущенных сообщений по порядку, номера, до которых досланы чаты,
+    # и чаты, где остались недосланные сообщения
+    rooms = dict(
+        ChatRoom.objects.filter(Q(participant1=user) | Q(participant2=user), pk__in=seqs)
+        .values_list('pk', 'last_seq')
+    )
+    texts, positions, more = [], {}, []
+    for room_id, last_seq in rooms.items():
+        positions[room_id] = seqs[room_id]
+        if last_seq <= seqs[room_id]:
+            continue
+        missed = list(
+            Message.objects.filter(room_id=room_id, seq__gt=seqs[room_id])
+            .select_related('sender').order_by('seq')[:REPLAY_LIMIT + 1]
+        )
+        if len(missed) > REPLAY_LIMIT:
+            more.append(room_id)
+            missed = missed[:REPLAY_LIMIT]
+        if missed:
+            positions[room_id] = missed[-1].seq
+        texts.extend(message_text(message) for message in missed)
+    return texts, positions, more
+
+
+class ReceiptBuffer:
+    def __init__(self, interval=RECEIPT_INTERVAL):
+        self.interval = interval
+        self.delivered = {}
+        self.read = {}
+        self.task = None
+
+    def _schedule(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    def delivered_up_to(self, room, reader, message_id):
+        key = (room.pk, reader.pk)
+        current = self.delivered.get(key)
+        if current is None or current[2] < message_id:
+            self.delivered[key] = (room, reader, message_id)
+        self._schedule()
+
+    def read_up_to(self, room, reader, message_id):
+        key = (room.pk, reader.pk)
+        current = self.read.get(key)
+        if current is None or current[2] < message_id:
+            self.read[key] = (room, reader, message_id)
+        self._schedule()
+
+    async def _flush_later(self):
+        # Отметки, пришедшие во время записи, уходят следующим интервалом
+        while self.delivered or self.read:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        delivered, self.delivered = self.delivered, {}
+        read, self.read = self.read, {}
+
+        events = []
+        if read:
+            try:
+                await database_sync_to_async(_mark_read)(read)
+            except DatabaseError:
+                logger.exception('Не удалось отметить прочтение в %d чатах', len(read))
+            else:
+                events.extend(('read', *value) for value in read.values())
+        for key, value in delivered.items():
+            # Прочтение того же диапазона подразумевает доставку
+            if key not in read or read[key][2] < value[2]:
+                events.append(('delivered', *value))
+
+        channel_layer = get_channel_layer()
+        sends = []
+        for status, room, reader, up_to in events:
+            event = {
+                'type': 'receipt_event', 'status': status,
+                'room_id': room.pk, 'user_id': reader.pk, 'up_to': up_to,
+            }
+            for user_id in (room.companion_id(reader.pk), reader.pk):
+                sends.append(channel_layer.group_send(user_group(user_id), event))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            logger.warning('Не доставлено %d отметок о прочтении', len(failed), exc_info=failed[0])
+
+
+_writers = {}
+_receipts = {}
+
+
+def _for_loop(registry, factory):
+    # Один буфер на event loop процесса
+    loop = asyncio.get_running_loop()
+    buffer = registry.get(loop)
+    if buffer is None:
+        for old_loop in [old for old in registry if old.is_closed()]:
+            del registry[old_loop]
+        buffer = registry[loop] = factory()
+    return buffer
+
+
+def get_writer():
+    return _for_loop(_writers, MessageWriter)
+
+
+def get_receipts():
+    return _for_loop(_receipts, ReceiptBuffer)
@@ -1,46 +1,274 @@
+import asyncio
 import json
+import logging
+import time
+from functools import partial
 
 from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.consumer import get_handler_name
 
-from .models import Message
-from .serializers import MessageSerializer
+from core_models.models import User
+from . import presence
+from .chat import MAX_LENGTH, MAX_REPLAY_ROOMS, get_receipts, get_writer, replay
+from .events import user_group
+from .models import ChatRoom, Message
+
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    # Клиент шлёт JSON-объекты с полем type (по умолчанию 'message').
+    # message: {recipient_id, text, client_id?}. Подтверждением служит само
+    # сообщение, пришедшее во все вкладки отправителя с тем же client_id;
+    # при ошибке приходит {type: 'error', client_id, error}.
+    # Пока сокет открыт, присутствие продлевает сам consumer (keep_presence);
+    # heartbeat: {} от клиента тоже принимается (messenger.presence).
+    # presence: {user_ids} — полный список собеседников, за чьим статусом следит
+    # вкладка; в ответ {type: 'presence', online: [...]}, дальше — события
+    # {type: 'presence', user_id, online} при входе и выходе из сети.
+    # typing: {recipient_id} — собеседник получит {type: 'typing', user_id}
+    # не чаще раза в TYPING_INTERVAL секунд.
+    # delivered/read: {companion_id, message_id} — наибольший доставленный или
+    # прочитанный id в чате с собеседником; тот получит
+    # {type: 'receipt', status, room_id, user_id, up_to} (messenger.chat.ReceiptBuffer).
+    # resume: {seqs: {room_id: seq}} после переподключения — пропущенные сообщения
+    # приходят обычными событиями message, затем {type: 'resumed', seqs, more}.
+    # Сокет уже в группе пользователя, поэтому сообщение может прийти и досылкой,
+    # и вживую: клиент отбрасывает повторы по seq.
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_anonymous:
             await self.close()
-        else:
-            await self.accept()
+            return
 
-        self.personal_group = f"user_{self.user.id}"
+        self.rooms = {}
+        self.watched = set()
+        self.typing_sent = {}
+        self.personal_group = user_group(self.user.id)
         await self.channel_layer.group_add(self.personal_group, self.channel_name)
+        await self.accept()
+
+        self.touched_at = time.monotonic()
+        if await sync_to_async(presence.connected, thread_sensitive=False)(self.user.id):
+            await self.publish_presence(True)
+        self.presence_task = asyncio.create_task(self.keep_presence())
 
     async def disconnect(self, close_code):
+        if not hasattr(self, 'personal_group'):
+            return
+        if hasattr(self, 'presence_task'):
+            self.presence_task.cancel()
         await self.channel_layer.group_discard(self.personal_group, self.channel_name)
+        for user_id in self.watched:
+            await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+        if await sync_to_async(presence.disconnected, thread_sensitive=False)(self.user.id):
+            await self.publish_presence(False)
+
+    async def dispatch(self, message):
+        # Базовый dispatch перед каждым событием (кадр сокета, сообщение группы)
+        # вызывает close_old_connections через переход в синхронный поток.
+        # Здесь к БД обращаются только через database_sync_to_async, который
+        # делает это сам, так что доставка событий обходится без переходов.
+        handler = getattr(self, get_handler_name(message), None)
+        if handler is None:
+            raise ValueError(f'No handler for message type {message["type"]}')
+        await handler(message)
+
+    @property
+    def handlers(self):
+        return {
+            'message': self.receive_message,
+            'heartbeat': self.receive_heartbeat,
+            'presence': self.receive_presence,
+            'typing': self.receive_typing,
+            'delivered': partial(self.receive_receipt, 'delivered'),
+            'read': partial(self.receive_receipt, 'read'),
+            'resume': self.receive_resume,
+        }
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or '')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await self.send_error(None, 'Ожидается JSON-объект')
+            return
+        handler = self.handlers.get(data.get('type', 'message'))
+        if handler is None:
+            await self.send_error(data.get('client_id'), f'Неизвестный тип события: {data.get("type")}')
+            return
+        await handler(data)
+
+    async def receive_message(self, data):
+        client_id = data.get('client_id')
+        text = data.get('text')
+        try:
+            recipient_id = int(data.get('recipient_id'))
+        except (TypeError, ValueError):
+            await self.send_error(client_id, 'Не указан получатель')
+            return
+        if not isinstance(text, str) or not text.strip():
+            await self.send_error(client_id, 'Сообщение пустое')
+            return
+        if len(text) > MAX_LENGTH:
+            await self.send_error(client_id, f'Сообщение длиннее {MAX_LENGTH} символов')
+            return
+
+        room = await self.get_room(recipient_id)
+        if room is None:
+            await self.send_error(client_id, 'Получатель не найден')
+            return
+
+        message = Message(room=room, sender=self.user, recipient_id=recipient_id, content=text.strip())
+        future = await get_writer().submit(message, client_id)
+        future.add_done_callback(partial(self.message_written, client_id))
+
+    def message_written(self, client_id, future):
+        if future.cancelled() or future.exception() is not None:
+            future.get_loop().create_task(self.send_error(client_id, 'Не удалось сохранить сообщение'))
+
+    async def keep_presence(self):
+        # Ключи присутствия живут TTL секунд: открытый сокет продлевает их сам,
+        # не дожидаясь кадров от клиента. Упавший процесс перестаёт продлевать,
+        # и пользователь выходит из сети по истечении TTL. Задачу никто не ждёт,
+        # поэтому ошибка кэша или слоя каналов логируется здесь, а продление
+        # продолжается со следующего интервала; отмену при отключении не ловим
+        while True:
+            await asyncio.sleep(presence.TOUCH_INTERVAL)
+            try:
+                await self.receive_heartbeat({})
+            except Exception:
+                logger.warning('Не удалось продлить присутствие пользователя %s', self.user.id, exc_info=True)
+
+    async def receive_heartbeat(self, data):
+        # Клиент может слать heartbeat чаще: в кэш уходит не больше одного за TOUCH_INTERVAL
+        now = time.monotonic()
+        if now - self.touched_at < presence.TOUCH_INTERVAL:
+            return
+        self.touched_at = now
+        if await sync_to_async(presence.heartbeat, thread_sensitive=False)(self.user.id):
+            await self.publish_presence(True)
+
+    async def receive_presence(self, data):
+        user_ids = data.get('user_ids')
+        try:
+            watched = {int(user_id) for user_id in user_ids}
+        except (TypeError, ValueError):
+            await self.send_error(data.get('client_id'), 'Ожидается список user_ids')
+            return
+        if len(watched) > presence.MAX_SUBSCRIPTIONS:
+            await self.send_error(data.get('client_id'), f'Не больше {presence.MAX_SUBSCRIPTIONS} пользователей')
+            return
+
+        for user_id in self.watched - watched:
+            await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+        for user_id in watched - self.watched:
+            await self.channel_layer.group_add(presence.presence_group(user_id), self.channel_name)
+        self.watched = watched
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        recipient_id = data['recipient_id']
-        text = data['text']
-
-        message = await sync_to_async(Message.objects.create)(
-            sender=self.user,
-            recipient_id=recipient_id,
-            text=text
-        )
-
-        await self.channel_layer.group_send(
-            f"user_{self.user.id}",
-            {"type": "chat_message", "message": MessageSerializer(message).data}
-        )
-        await self.channel_layer.group_send(
-            f"user_{recipient_id}",
-            {"type": "chat_message", "message": MessageSerializer(message).data}
-        )
+        online = await sync_to_async(presence.online_users, thread_sensitive=False)(watched)
+        await self.send(text_data=json.dumps({'type': 'presence', 'online': sorted(online)}))
+
+    async def receive_typing(self, data):
+        try:
+            recipient_id = int(data.get('recipient_id'))
+        except (TypeError, ValueError):
+            await self.send_error(data.get('client_id'), 'Не указан получатель')
+            return
+        now = time.monotonic()
+        if now - self.typing_sent.get(recipient_id, float('-inf')) < presence.TYPING_INTERVAL:
+            return
+        if await self.get_room(recipient_id) is None:
+            await self.send_error(data.get('client_id'), 'Получатель не найден')
+            return
+        self.typing_sent[recipient_id] = now
+        await self.channel_layer.group_send(user_group(recipient_id), {
+            'type': 'typing_event', 'user_id': self.user.id,
+        })
+
+    async def receive_receipt(self, status, data):
+        try:
+            companion_id = int(data.get('companion_id'))
+            message_id = int(data.get('message_id'))
+        except (TypeError, ValueError):
+            await self.send_error(data.get('client_id'), 'Ожидаются companion_id и message_id')
+            return
+        room = await self.get_room(companion_id)
+        if room is None:
+            await self.send_error(data.get('client_id'), 'Собеседник не найден')
+            return
+        receipts = get_receipts()
+        if status == 'read':
+            receipts.read_up_to(room, self.user, message_id)
+        else:
+            receipts.delivered_up_to(room, self.user, message_id)
+
+    async def receive_resume(self, data):
+        try:
+            seqs = {int(room_id): int(seq) for room_id, seq in data.get('seqs').items()}
+        except (AttributeError, TypeError, ValueError):
+            await self.send_error(data.get('client_id'), 'Ожидается seqs: {room_id: seq}')
+            return
+        if len(seqs) > MAX_REPLAY_ROOMS:
+            await self.send_error(data.get('client_id'), f'Не больше {MAX_REPLAY_ROOMS} чатов')
+            return
+
+        texts, positions, more = await database_sync_to_async(replay)(self.user, seqs)
+        for text in texts:
+            await self.send(text_data=text)
+        await self.send(text_data=json.dumps({'type': 'resumed', 'seqs': positions, 'more': more}))
+
+    async def publish_presence(self, online):
+        await self.channel_layer.group_send(presence.presence_group(self.user.id), {
+            'type': 'presence_event', 'user_id': self.user.id, 'online': online,
+        })
+
+    async def get_room(self, recipient_id):
+        # Чат с собеседником ищется один раз за соединение
+        if recipient_id not in self.rooms:
+            self.rooms[recipient_id] = await self.find_room(recipient_id)
+        return self.rooms[recipient_id]
+
+    @database_sync_to_async
+    def find_room(self, recipient_id):
+        recipient = User.objects.filter(id=recipient_id).only('id').first()
+        if recipient is None or recipient.id == self.user.id:
+            return None
+        return ChatRoom.get_or_create_room(self.user, recipient)
+
+    async def send_error(self, client_id, error):
+        await self.send(text_data=json.dumps({'type': 'error', 'client_id': client_id, 'error': error},
+                                             ensure_ascii=False))
 
     async def chat_message(self, event):
-        message = event['message']
-        await self.send(text_data=json.dumps(message))
+        await self.send(text_data=event['text'])
+
+    async def chat_messages(self, event):
+        # Пачка из MessageWriter: сообщения по порядку записи
+        for text in event['texts']:
+            await self.send(text_data=text)
+
+    async def presence_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'presence', 'user_id': event['user_id'], 'online': event['online'],
+        }))
+
+    async def typing_event(self, event):
+        await self.send(text_data=json.dumps({'type': 'typing', 'user_id': event['user_id']}))
+
+    async def receipt_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'receipt', 'status': event['status'], 'room_id': event['room_id'],
+            'user_id': event['user_id'], 'up_to': event['up_to'],
+        }))
+
+    async def notification_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'id': event['id'],
+            'title': event['title'],
+            'unread_count': event['unread_count'],
+        }))
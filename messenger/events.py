@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# События для клиента уходят в персональную группу user_<id>,
+# к которой ChatConsumer подключает каждую вкладку пользователя
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def send_to_user(user_id, event_type, payload):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(user_group(user_id), {'type': event_type, **payload})
+    except Exception:
+        # Недоступный слой каналов не должен ронять запрос: клиент
+        # перейдёт на опрос htmx_unread_count
+        logger.warning('Не удалось отправить событие %s пользователю %s', event_type, user_id, exc_info=True)
+
+
+async def asend_to_user(user_id, event_type, payload):
+    # Для асинхронных представлений: async_to_sync в event loop не работает
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        await channel_layer.group_send(user_group(user_id), {'type': event_type, **payload})
+    except Exception:
+        logger.warning('Не удалось отправить событие %s пользователю %s', event_type, user_id, exc_info=True)
+
+
+def send_to_users(events):
+    # Пачка событий [(user_id, event_type, payload)] за один переход в event loop
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not events:
+        return
+
+    async def send_all():
+        await asyncio.gather(*[
+            channel_layer.group_send(user_group(user_id), {'type': event_type, **payload})
+            for user_id, event_type, payload in events
+        ])
+
+    try:
+        async_to_sync(send_all)()
+    except Exception:
+        logger.warning('Не удалось отправить %d событий', len(events), exc_info=True)
+
+
+def publish_to_user(user_id, event_type, payload):
+    transaction.on_commit(lambda: send_to_user(user_id, event_type, payload))
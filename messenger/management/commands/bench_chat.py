@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core_models.benchmarks import scratch_database
+from core_models.models import User
+from messenger import chat
+from messenger.consumers import ChatConsumer
+from messenger.models import ChatRoom
+
+PREFIX = 'bench_chat_'
+CLEAN_INTERVAL = 1.0
+
+
+class BenchChannelLayer(InMemoryChannelLayer):
+    # Замена Redis для замера: InMemoryChannelLayer на каждой операции обходит
+    # все каналы и группы в поисках просроченных, на тысячах сокетов это
+    # квадратичная работа. Здесь обход — не чаще раза в CLEAN_INTERVAL секунд,
+    # как фоновое истечение ключей в Redis.
+    _cleaned_at = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self._cleaned_at >= CLEAN_INTERVAL:
+            self._cleaned_at = now
+            super()._clean_expired()
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест чата: пары сокетов ChatConsumer в одном процессе обмениваются '
+            'сообщениями через слой каналов в памяти (замена Redis). Печатает сообщений/с и p99 задержки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=2000, help='Число сокетов (по два на чат)')
+        parser.add_argument('--messages', type=int, default=5, help='Сообщений от каждого отправителя')
+        parser.add_argument('--batch-size', type=int, default=chat.BATCH_SIZE,
+                            help='1 — запись по одному сообщению, как до буфера')
+        parser.add_argument('--flush-interval', type=float, default=chat.FLUSH_INTERVAL)
+
+    def handle(self, *args, **options):
+        pairs = max(1, options['sockets'] // 2)
+        layers = {'default': {'BACKEND': f'{__name__}.BenchChannelLayer', 'CONFIG': {'capacity': 10000}}}
+        try:
+            # Отдельная временная база: рабочие данные не трогаются
+            with scratch_database(), override_settings(CHANNEL_LAYERS=layers):
+                users = self.create_users(pairs * 2)
+                channel_layers.backends.clear()
+                result = asyncio.run(self.run(users, options))
+        finally:
+            channel_layers.backends.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Сокетов: {pairs * 2}, сообщений: {result["messages"]} за {result["seconds"]:.2f} с — '
+            f'{result["messages"] / result["seconds"]:.0f} сообщений/с, задержка p50 {result["p50"]:.1f} мс, '
+            f'p99 {result["p99"]:.1f} мс'
+        ))
+
+    def create_users(self, count):
+        # Пары пользователей с уже созданными чатами: замеряется переписка, а не знакомство
+        User.objects.bulk_create([User(username=f'{PREFIX}{i}') for i in range(count)])
+        users = list(User.objects.filter(username__startswith=PREFIX).order_by('id'))
+        ChatRoom.objects.bulk_create([
+            ChatRoom(participant1=users[n], participant2=users[n + 1]) for n in range(0, len(users) - 1, 2)
+        ])
+        return users
+
+    async def run(self, users, options):
+        chat._writers.clear()
+        writer = chat.get_writer()
+        writer.batch_size, writer.flush_interval = options['batch_size'], options['flush_interval']
+
+        communicators = []
+        for user in users:
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+            communicator.scope['user'] = user
+            communicators.append(communicator)
+        await asyncio.gather(*(communicator.connect(timeout=60) for communicator in communicators))
+
+        senders, recipients = communicators[::2], communicators[1::2]
+        count = options['messages']
+        sent_at = {}
+        latencies = []
+
+        async def talk(number, sender, recipient_id):
+            for i in range(count):
+                client_id = f'{number}:{i}'
+                sent_at[client_id] = time.perf_counter()
+                await sender.send_json_to({'recipient_id': recipient_id, 'text': f'Сообщение {i}',
+                                           'client_id': client_id})
+
+        async def listen(recipient):
+            for _ in range(count):
+                event = await recipient.receive_json_from(timeout=60)
+                latencies.append(time.perf_counter() - sent_at[event['client_id']])
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(talk(n, sender, users[2 * n + 1].id) for n, sender in enumerate(senders)),
+            *(listen(recipient) for recipient in recipients),
+        )
+        seconds = time.perf_counter() - started
+        await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+
+        latencies.sort()
+        return {
+            'messages': len(latencies),
+            'seconds': seconds,
+            'p50': latencies[len(latencies) // 2] * 1000,
+            'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+        }
+
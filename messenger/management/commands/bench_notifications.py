@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import channel_layers
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core_models.models import User
+from core_models.notifications import fan_out
+from core_models.benchmarks import local_services, scratch_database
+from messenger.consumers import ChatConsumer
+
+PREFIX = 'bench_notifications_'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест push-уведомлений: тысячи сокетов ChatConsumer в одном процессе, '
+            'рассылка fan_out всем их пользователям и доставка событий notification через слой '
+            'каналов в памяти (замена Redis). Печатает доставок/с и p99 задержки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=2000, help='Число сокетов (пользователей)')
+        parser.add_argument('--rounds', type=int, default=3, help='Рассылок каждому пользователю')
+
+    def handle(self, *args, **options):
+        # Тот же слой каналов, что в bench_chat
+        layers = {'default': {'BACKEND': 'messenger.management.commands.bench_chat.BenchChannelLayer',
+                              'CONFIG': {'capacity': 10000}}}
+        try:
+            # Отдельная временная база, счётчики в памяти процесса (local_services),
+            # слой каналов — замена Redis
+            with scratch_database(), local_services, override_settings(CHANNEL_LAYERS=layers):
+                users = self.create_users(options['sockets'])
+                channel_layers.backends.clear()
+                result = asyncio.run(self.run(users, options['rounds']))
+        finally:
+            channel_layers.backends.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Сокетов: {len(users)}, доставлено событий: {result["events"]} за {result["seconds"]:.2f} с — '
+            f'{result["events"] / result["seconds"]:.0f} доставок/с, задержка p50 {result["p50"]:.1f} мс, '
+            f'p99 {result["p99"]:.1f} мс'
+        ))
+
+    def create_users(self, count):
+        User.objects.bulk_create([User(username=f'{PREFIX}{i}') for i in range(count)])
+        return list(User.objects.filter(username__startswith=PREFIX).order_by('id'))
+
+    async def run(self, users, rounds):
+        communicators = []
+        for user in users:
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+            communicator.scope['user'] = user
+            communicators.append(communicator)
+        await asyncio.gather(*(communicator.connect(timeout=60) for communicator in communicators))
+
+        user_ids = [user.id for user in users]
+        latencies = []
+        started = time.perf_counter()
+        for number in range(rounds):
+            # Задержка — от начала рассылки до события во вкладке: запись пачками,
+            # пересчёт счётчиков и доставка через группы user_<id>
+            sent_at = time.perf_counter()
+            receiving = asyncio.gather(*(
+                self.receive(communicator, f'Рассылка {number}') for communicator in communicators
+            ))
+            await sync_to_async(fan_out)(user_ids, 'Рассылка {number}', 'Текст', context={'number': number})
+            latencies.extend(received - sent_at for received in await receiving)
+        seconds = time.perf_counter() - started
+        await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+
+        latencies.sort()
+        return {
+            'events': len(latencies),
+            'seconds': seconds,
+            'p50': latencies[len(latencies) // 2] * 1000,
+            'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+        }
+
+    async def receive(self, communicator, title):
+        while True:
+            event = await communicator.receive_json_from(timeout=60)
+            if event.get('type') == 'notification' and event['title'] == title:
+                return time.perf_counter()
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messenger', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messenger.message', verbose_name='Последнее сообщение'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последнего сообщения'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='participant1_unread',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитано участником 1'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='participant2_unread',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитано участником 2'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='messenger.chatroom', verbose_name='Чат'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['participant1', '-last_message_at', '-id'], name='chatroom_p1_last_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['participant2', '-last_message_at', '-id'], name='chatroom_p2_last_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations, transaction
+from django.db.models import Count, F, Max, Q
+
+# Каждая пачка коммитится отдельно, чтобы не держать блокировку
+# на всей таблице сообщений во время миграции
+BATCH_SIZE = 2000
+
+
+def backfill_rooms(apps, schema_editor):
+    ChatRoom = apps.get_model('messenger', 'ChatRoom')
+    Message = apps.get_model('messenger', 'Message')
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                Message.objects.using(db).filter(room__isnull=True, id__gt=last_id)
+                .order_by('id').values_list('id', 'sender_id', 'recipient_id')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            pairs = {(min(s, r), max(s, r)) for _, s, r in batch}
+            ChatRoom.objects.using(db).bulk_create(
+                [ChatRoom(participant1_id=p1, participant2_id=p2) for p1, p2 in pairs],
+                ignore_conflicts=True,
+            )
+            rooms = {
+                (p1, p2): room_id
+                for room_id, p1, p2 in ChatRoom.objects.using(db).filter(
+                    participant1_id__in={p1 for p1, _ in pairs},
+                    participant2_id__in={p2 for _, p2 in pairs},
+                ).values_list('id', 'participant1_id', 'participant2_id')
+            }
+
+            by_room = {}
+            for message_id, s, r in batch:
+                by_room.setdefault(rooms[(min(s, r), max(s, r))], []).append(message_id)
+            for room_id, message_ids in by_room.items():
+                Message.objects.using(db).filter(id__in=message_ids).update(room_id=room_id)
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            rooms = list(
+                ChatRoom.objects.using(db).filter(id__gt=last_id).order_by('id')[:BATCH_SIZE]
+            )
+            if not rooms:
+                break
+            last_id = rooms[-1].id
+
+            stats = {
+                row['room_id']: row
+                for row in Message.objects.using(db).filter(room__in=rooms).values('room_id').annotate(
+                    last_message_id=Max('id'),
+                    last_message_at=Max('sent_at'),
+                    participant1_unread=Count('id', filter=Q(
+                        is_read=False, recipient_id=F('room__participant1_id'))),
+                    participant2_unread=Count('id', filter=Q(
+                        is_read=False, recipient_id=F('room__participant2_id'))),
+                ).order_by()
+            }
+            for room in rooms:
+                row = stats.get(room.id)
+                if row is None:
+                    continue
+                room.last_message_id = row['last_message_id']
+                room.last_message_at = row['last_message_at']
+                room.participant1_unread = row['participant1_unread']
+                room.participant2_unread = row['participant2_unread']
+            ChatRoom.objects.using(db).bulk_update(rooms, [
+                'last_message', 'last_message_at', 'participant1_unread', 'participant2_unread'
+            ])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('messenger', '0002_chatroom_denormalized'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rooms, migrations.RunPython.noop),
+    ]
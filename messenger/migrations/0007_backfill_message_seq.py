@@ -0,0 +1,48 @@
+from django.db import migrations, transaction
+
+# Нумерация существующих сообщений по порядку отправки внутри чата.
+# Каждая пачка чатов коммитится отдельно, как в 0003_backfill_chatrooms
+BATCH_SIZE = 500
+
+
+def backfill_seq(apps, schema_editor):
+    ChatRoom = apps.get_model('messenger', 'ChatRoom')
+    Message = apps.get_model('messenger', 'Message')
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            rooms = list(
+                ChatRoom.objects.using(db).select_for_update().filter(id__gt=last_id)
+                .order_by('id')[:BATCH_SIZE]
+            )
+            if not rooms:
+                break
+            last_id = rooms[-1].id
+
+            last_seq = {room.id: 0 for room in rooms}
+            messages = list(
+                Message.objects.using(db).filter(room__in=rooms)
+                .order_by('room_id', 'sent_at', 'id').only('id', 'room_id')
+            )
+            for message in messages:
+                last_seq[message.room_id] += 1
+                message.seq = last_seq[message.room_id]
+            Message.objects.using(db).bulk_update(messages, ['seq'], batch_size=BATCH_SIZE)
+
+            for room in rooms:
+                room.last_seq = last_seq[room.id]
+            ChatRoom.objects.using(db).bulk_update(rooms, ['last_seq'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('messenger', '0006_message_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+    ]
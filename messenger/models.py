@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 
 from core_models.models import User
 
@@ -8,13 +10,33 @@ class ChatRoom(models.Model):
     participant2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_rooms_p2')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Денормализованные поля: обновляются в add_message / mark_read
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+', verbose_name='Последнее сообщение')
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name='Время последнего сообщения')
+    participant1_unread = models.PositiveIntegerField(default=0, verbose_name='Непрочитано участником 1')
+    participant2_unread = models.PositiveIntegerField(default=0, verbose_name='Непрочитано участником 2')
+    # Номер последнего сообщения чата: сообщения нумеруются подряд (Message.seq),
+    # и переподключившийся клиент получает всё, что новее известного ему номера
+    last_seq = models.PositiveBigIntegerField(default=0, verbose_name='Номер последнего сообщения')
 
     class Meta:
         unique_together = ('participant1', 'participant2')
+        indexes = [
+            models.Index(fields=['participant1', '-last_message_at', '-id'], name='chatroom_p1_last_idx'),
+            models.Index(fields=['participant2', '-last_message_at', '-id'], name='chatroom_p2_last_idx'),
+        ]
 
     def __str__(self):
         return f'Чат {self.participant1} и {self.participant2}'
 
+    @classmethod
+    def get_room(cls, user1, user2):
+        # Только поиск: чат создаётся первым сообщением, а не просмотром диалога
+        if user1.id > user2.id:
+            user1, user2 = user2, user1
+        return cls.objects.filter(participant1=user1, participant2=user2).first()
+
     @classmethod
     def get_or_create_room(cls, user1, user2):
         if user1.id > user2.id:
@@ -22,8 +44,60 @@ class ChatRoom(models.Model):
         room, _ = cls.objects.get_or_create(participant1=user1, participant2=user2)
         return room
 
+    @classmethod
+    async def aget_or_create_room(cls, user1, user2):
+        if user1.id > user2.id:
+            user1, user2 = user2, user1
+        room, _ = await cls.objects.aget_or_create(participant1=user1, participant2=user2)
+        return room
+
+    def companion_id(self, user_id):
+        return self.participant2_id if user_id == self.participant1_id else self.participant1_id
+
+    def unread_field(self, user_id):
+        return 'participant1_unread' if user_id == self.participant1_id else 'participant2_unread'
+
+    def unread_for(self, user_id):
+        return getattr(self, self.unread_field(user_id))
+
+    def add_message(self, sender, content, **extra):
+        recipient_id = self.companion_id(sender.id)
+        unread_field = self.unread_field(recipient_id)
+        with transaction.atomic():
+            # Строка чата блокируется до конца транзакции: номера не повторяются
+            seq = ChatRoom.objects.select_for_update().filter(pk=self.pk).values_list('last_seq', flat=True).get() + 1
+            message = Message.objects.create(
+                room=self, sender=sender, recipient_id=recipient_id, content=content, seq=seq, **extra
+            )
+            ChatRoom.objects.filter(pk=self.pk).update(
+                last_message=message,
+                last_message_at=message.sent_at,
+                last_seq=seq,
+                **{unread_field: F(unread_field) + 1}
+            )
+        self.last_seq = seq
+        return message
+
+    def mark_read(self, user, message_ids=None, up_to=None):
+        # up_to — все сообщения до этого id включительно, одним UPDATE по диапазону
+        unread_field = self.unread_field(user.id)
+        messages = self.messages.filter(recipient=user, is_read=False)
+        if message_ids is not None:
+            messages = messages.filter(id__in=message_ids)
+        if up_to is not None:
+            messages = messages.filter(id__lte=up_to)
+        with transaction.atomic():
+            updated = messages.update(is_read=True)
+            if updated:
+                ChatRoom.objects.filter(pk=self.pk).update(
+                    **{unread_field: Greatest(F(unread_field) - updated, 0)}
+                )
+        return updated
+
 
 class Message(models.Model):
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='messages', verbose_name='Чат')
     content = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages', verbose_name='Отправитель')
@@ -32,12 +106,22 @@ class Message(models.Model):
     subject = models.CharField(max_length=255, verbose_name='Тема')
     body = models.TextField(verbose_name='Сообщение')
     is_read = models.BooleanField(default=False, verbose_name='Прочитано')
+    seq = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='Номер в чате')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Отправлено')
 
     class Meta:
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['room', 'sent_at', 'id'], name='message_room_sent_idx'),
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False),
+                         name='message_recipient_unread_idx'),
+        ]
+        constraints = [
+            # Заодно индекс для досылки пропущенного: room = X AND seq > N ORDER BY seq
+            models.UniqueConstraint(fields=['room', 'seq'], name='message_room_seq_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.sender} отправлен {self.recipient}: {self.subject}'
@@ -0,0 +1,95 @@
+import logging
+import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Присутствие пользователей в кэше 'counters' (Redis, в разработке locmem), без записей в БД.
+# На пользователя два ключа с TTL: время последней активности (online:<id>) и число
+# открытых сокетов-вкладок (online_tabs:<id>). Consumer открытого сокета продлевает
+# оба ключа раз в TOUCH_INTERVAL (и по heartbeat клиента, не чаще). Пользователь в сети, пока жив ключ
+# online: закрытие последней вкладки удаляет его сразу, а упавший процесс,
+# не успевший уменьшить счётчик, держит пользователя «в сети» не дольше TTL.
+# О переходах в сеть и из сети узнают подписчики группы presence_<id>.
+TTL = 60
+TOUCH_INTERVAL = TTL / 3
+TYPING_INTERVAL = 3
+MAX_SUBSCRIPTIONS = 200
+KEY = 'online:{}'
+TABS_KEY = 'online_tabs:{}'
+
+
+def _cache():
+    return caches['counters']
+
+
+def presence_group(user_id):
+    return f'presence_{user_id}'
+
+
+def online_users(user_ids):
+    # Пакетная проверка для списка диалогов: один запрос в кэш
+    keys = {KEY.format(user_id): user_id for user_id in user_ids}
+    try:
+        found = _cache().get_many(list(keys))
+    except Exception:
+        logger.warning('Кэш присутствия недоступен', exc_info=True)
+        return {}
+    return {keys[key]: last_seen for key, last_seen in found.items()}
+
+
+# Consumer вызывает функции ниже через sync_to_async: асинхронные методы кэшей
+# Django (aincr, adecr) реализованы как get + set и теряют атомарность и TTL,
+# а так на каждое событие приходится один переход в поток на все операции.
+
+def connected(user_id):
+    # Возвращает True, если это первая вкладка пользователя
+    cache = _cache()
+    tabs_key = TABS_KEY.format(user_id)
+    try:
+        cache.add(tabs_key, 0, TTL)
+        try:
+            tabs = cache.incr(tabs_key)
+        except ValueError:
+            # Ключ истёк между add и incr
+            cache.set(tabs_key, 1, TTL)
+            tabs = 1
+        cache.set(KEY.format(user_id), time.time(), TTL)
+    except Exception:
+        logger.warning('Кэш присутствия недоступен', exc_info=True)
+        return False
+    return tabs == 1
+
+
+def heartbeat(user_id):
+    # Продлевает ключи вкладок; если они уже истекли (долгая пауза между
+    # heartbeat'ами), создаёт заново и сообщает, что пользователь снова в сети
+    cache = _cache()
+    try:
+        cache.set(KEY.format(user_id), time.time(), TTL)
+        if not cache.touch(TABS_KEY.format(user_id), TTL):
+            return cache.add(TABS_KEY.format(user_id), 1, TTL)
+    except Exception:
+        logger.warning('Кэш присутствия недоступен', exc_info=True)
+    return False
+
+
+def disconnected(user_id):
+    # Возвращает True, если закрыта последняя вкладка пользователя
+    cache = _cache()
+    tabs_key = TABS_KEY.format(user_id)
+    try:
+        try:
+            tabs = cache.decr(tabs_key)
+        except ValueError:
+            tabs = 0
+        if tabs > 0:
+            return False
+        # Вкладка, открытая между decr и удалением, пропадёт из сети
+        # до своего следующего heartbeat
+        cache.delete_many([tabs_key, KEY.format(user_id)])
+    except Exception:
+        logger.warning('Кэш присутствия недоступен', exc_info=True)
+        return False
+    return True
@@ -28,12 +28,13 @@ class ResumeInChatSerializer(serializers.ModelSerializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     sender = serializers.StringRelatedField(read_only=True)
-    receiver = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    sender_id = serializers.IntegerField(read_only=True)
+    receiver = serializers.PrimaryKeyRelatedField(source='recipient', queryset=User.objects.all())
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'receiver', 'is_read', 'created_at']
-        read_only_fields = ['sender', 'is_read', 'created_at']
+        fields = ['id', 'room', 'seq', 'sender', 'sender_id', 'receiver', 'content', 'is_read', 'sent_at']
+        read_only_fields = ['room', 'seq', 'is_read', 'sent_at']
 
 
 class NotificationSerializer(serializers.ModelSerializer):
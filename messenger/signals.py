@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.dispatch import receiver
+
+from core_models.counters import get_many_unread_notifications
+from core_models.signals import notifications_created
+from .events import send_to_users
+
+
+@receiver(notifications_created)
+def push_notifications(sender, notifications, **kwargs):
+    # Одно событие на пользователя: о последнем уведомлении из пачки
+    latest = {n.user_id: n for n in notifications}
+
+    def publish():
+        # Счётчики к этому моменту уже увеличены (on_commit из core_models.signals)
+        counts = get_many_unread_notifications(list(latest))
+        send_to_users([
+            (user_id, 'notification_event', {
+                'id': notification.id,
+                'title': notification.title,
+                'unread_count': counts[user_id],
+            })
+            for user_id, notification in latest.items()
+        ])
+
+    transaction.on_commit(publish)
@@ -1,3 +1,511 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from core_models.models import Notification, User
+from core_models.notifications import fan_out
+from core_models.testing import QueryBudgetMixin, QueryPlanMixin, local_services, stub_templates
+from . import presence
+from .chat import MessageWriter
+from .consumers import ChatConsumer
+from .events import user_group
+from .models import ChatRoom, Message
+
+
+class MessengerQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user1')
+        cls.companion = User.objects.create(username='user2')
+        cls.room = ChatRoom.get_or_create_room(cls.user, cls.companion)
+
+    def test_unread_messages(self):
+        self.assertNoFullScan(Message.objects.filter(recipient=self.user, is_read=False))
+
+    def test_inbox(self):
+        self.assertNoFullScan(ChatRoom.objects.filter(
+            Q(participant1=self.user) | Q(participant2=self.user),
+            last_message_at__isnull=False,
+        ).order_by('-last_message_at', '-id')[:30])
+
+    def test_dialog_history(self):
+        self.assertNoFullScan(self.room.messages.order_by('-sent_at', '-id')[:50])
+
+    def test_replay(self):
+        self.assertNoFullScan(Message.objects.filter(room=self.room, seq__gt=10).order_by('seq')[:201])
+
+
+def check_unread_count_session(test):
+    # Сессия после смены пароля и сессия отключённого пользователя не дают счётчик
+    url = '/messages/htmx/notifications/unread-count/'
+    test.user.set_password('new-password')
+    test.user.save(update_fields=['password'])
+    test.assertEqual(test.client.get(url).status_code, 401)
+
+    test.client.force_login(test.user)
+    test.assertEqual(test.client.get(url).status_code, 200)
+    User.objects.filter(pk=test.user.pk).update(is_active=False)
+    test.assertEqual(test.client.get(url).status_code, 401)
+
+
+@stub_templates
+@local_services
+class MessengerQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.companion = User.objects.create(username='companion0')
+        for i in range(10):
+            companion = cls.companion if i == 0 else User.objects.create(username=f'companion{i}')
+            room = ChatRoom.get_or_create_room(cls.user, companion)
+            for j in range(5):
+                room.add_message(companion, f'Сообщение {j}')
+                room.add_message(cls.user, f'Ответ {j}')
+        Notification.objects.create(user=cls.user, title='Уведомление', message='Текст')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_inbox(self):
+        self.assertQueryBudget('get', '/messages/inbox/')
+
+    def test_dialog(self):
+        self.assertQueryBudget('get', f'/messages/dialog/{self.companion.pk}/')
+
+    def test_dialog_history(self):
+        self.assertQueryBudget('get', f'/messages/htmx/dialog/{self.companion.pk}/history/')
+
+    def test_send_message(self):
+        response = self.assertQueryBudget('post', '/messages/htmx/send/', {
+            'recipient_id': self.companion.pk, 'content': 'Привет',
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_unread_count(self):
+        self.assertQueryBudget('get', '/messages/htmx/notifications/unread-count/')
+        check_unread_count_session(self)
+
+
+@stub_templates
+@local_services
+class ChatRoomTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.companion = User.objects.create(username='companion')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertRoomMatchesMessages(self, room):
+        # Денормализованные поля совпадают с тем, что посчитано по самим сообщениям
+        room.refresh_from_db()
+        last = room.messages.order_by('-seq').first()
+        self.assertEqual(room.last_message, last)
+        self.assertEqual(room.last_message_at, last.sent_at if last else None)
+        self.assertEqual(room.last_seq, last.seq if last else 0)
+        for user in (self.user, self.companion):
+            self.assertEqual(room.unread_for(user.id),
+                             room.messages.filter(recipient=user, is_read=False).count())
+
+    def test_viewing_dialog_does_not_create_room(self):
+        response = self.client.get(f'/messages/dialog/{self.companion.pk}/')
+        self.assertEqual(response.context['messages'], [])
+        response = self.client.get(f'/messages/htmx/dialog/{self.companion.pk}/history/')
+        self.assertEqual(response.json(), {'messages': [], 'next_cursor': None})
+        self.assertFalse(ChatRoom.objects.exists())
+
+        self.client.post('/messages/htmx/send/', {'recipient_id': self.companion.pk, 'content': 'Привет'})
+        room = ChatRoom.get_room(self.companion, self.user)
+        self.assertEqual(room.participant1, self.user)
+        self.assertRoomMatchesMessages(room)
+
+    def test_denormalized_fields(self):
+        room = ChatRoom.get_or_create_room(self.user, self.companion)
+        self.assertRoomMatchesMessages(room)
+        for i in range(3):
+            room.add_message(self.companion, f'Вопрос {i}')
+        room.add_message(self.user, 'Ответ')
+        self.assertRoomMatchesMessages(room)
+        self.assertEqual(room.unread_for(self.user.id), 3)
+
+        # История помечает прочитанными видимые сообщения и уменьшает счётчик
+        self.client.get(f'/messages/htmx/dialog/{self.companion.pk}/history/')
+        self.assertRoomMatchesMessages(room)
+        self.assertEqual(room.unread_for(self.user.id), 0)
+        self.assertEqual(room.unread_for(self.companion.id), 1)
+
+        # Повторная отметка не уводит счётчик в минус
+        self.assertEqual(room.mark_read(self.user), 0)
+        self.assertRoomMatchesMessages(room)
+
+    def test_inbox(self):
+        companions = [User.objects.create(username=f'companion{i}') for i in range(3)]
+        ChatRoom.get_or_create_room(self.user, self.companion)
+        for companion in companions:
+            ChatRoom.get_or_create_room(self.user, companion).add_message(companion, 'Привет')
+        # Свежее сообщение поднимает чат наверх
+        ChatRoom.get_or_create_room(self.user, companions[0]).add_message(self.user, 'Ответ')
+
+        with mock.patch('messenger.views.InboxView.page_size', 2):
+            response = self.client.get('/messages/inbox/')
+            conversations = response.context['conversations']
+            self.assertEqual([item['companion'] for item in conversations], [companions[0], companions[2]])
+            self.assertEqual(conversations[0]['last_message'].content, 'Ответ')
+            self.assertEqual([item['unread_count'] for item in conversations], [1, 1])
+
+            # Чат без сообщений в списке не показывается
+            response = self.client.get('/messages/inbox/', {'cursor': response.context['next_cursor']})
+            self.assertEqual([item['companion'] for item in response.context['conversations']], [companions[1]])
+            self.assertIsNone(response.context['next_cursor'])
+
+
+@stub_templates
+@local_services
+@override_settings(ASYNC_HTMX_VIEWS={'htmx_send_message', 'htmx_unread_count'})
+class AsyncHtmxTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.companion = User.objects.create(username='companion')
+        ChatRoom.get_or_create_room(cls.user, cls.companion)
+        Notification.objects.create(user=cls.user, title='Уведомление', message='Текст')
+
+    def setUp(self):
+        caches['counters'].clear()
+        self.client.force_login(self.user)
+
+    def test_send_message(self):
+        for text in ('Привет', 'Как дела?'):
+            response = self.assertQueryBudget('post', '/messages/htmx/send/', {
+                'recipient_id': self.companion.pk, 'content': text,
+            })
+            self.assertEqual(response.status_code, 200)
+        room = ChatRoom.objects.get()
+        self.assertEqual(room.last_seq, 2)
+        self.assertEqual(room.unread_for(self.companion.id), 2)
+        self.assertEqual(Notification.objects.filter(user=self.companion).count(), 2)
+        self.assertEqual(self.client.post('/messages/htmx/send/', {'recipient_id': 'x', 'content': 'a'}).status_code,
+                         404)
+
+    def test_unread_count(self):
+        for _ in range(2):
+            response = self.assertQueryBudget('get', '/messages/htmx/notifications/unread-count/')
+            self.assertEqual(response.json(), {'count': 1})
+        check_unread_count_session(self)
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=1.0, QUERY_STATS_HEADERS=True)
+    async def test_async_middleware_chain(self):
+        # AsyncClient собирает асинхронную цепочку middleware, как daphne
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get('/messages/htmx/notifications/unread-count/')
+        self.assertEqual(response.json(), {'count': 1})
+        self.assertEqual(response['X-Query-Budget'], '3')
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+
+@local_services
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.companion = User.objects.create(username='companion')
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_messages_are_batched_and_delivered_once(self):
+        sender = await self.connect(self.user)
+        recipient = await self.connect(self.companion)
+        for i in range(20):
+            await sender.send_json_to({'recipient_id': self.companion.id, 'text': f'Сообщение {i}', 'client_id': i})
+
+        received = [await recipient.receive_json_from() for _ in range(20)]
+        acks = [await sender.receive_json_from() for _ in range(20)]
+        self.assertEqual([event['content'] for event in received], [f'Сообщение {i}' for i in range(20)])
+        self.assertEqual([event['client_id'] for event in acks], list(range(20)))
+        self.assertEqual([event['seq'] for event in received], list(range(1, 21)))
+        self.assertTrue(await recipient.receive_nothing())
+
+        room = await database_sync_to_async(ChatRoom.objects.get)()
+        self.assertEqual(room.unread_for(self.companion.id), 20)
+        self.assertEqual(room.last_message_id, received[-1]['id'])
+        self.assertEqual(room.last_seq, 20)
+        self.assertEqual(await Message.objects.filter(room=room).acount(), 20)
+        await sender.disconnect()
+        await recipient.disconnect()
+
+    async def test_batch_is_sent_once_per_participant(self):
+        third = await User.objects.acreate(username='third')
+        sender = await self.connect(self.user)
+        recipient = await self.connect(self.companion)
+        rooms = [await database_sync_to_async(ChatRoom.get_or_create_room)(self.user, companion)
+                 for companion in (self.companion, third)]
+        messages = [Message(room=room, sender=self.user, recipient_id=room.companion_id(self.user.id),
+                            content=f'Сообщение {i}') for i, room in enumerate((rooms[0], rooms[1], rooms[0]))]
+        batch = [(message, i, asyncio.get_running_loop().create_future()) for i, message in enumerate(messages)]
+
+        layer = get_channel_layer()
+        with mock.patch.object(layer, 'group_send', wraps=layer.group_send) as group_send:
+            await MessageWriter().flush(batch)
+        # Три сообщения, три участника: по одному событию в группу каждого
+        self.assertEqual(sorted(call.args[0] for call in group_send.call_args_list),
+                         sorted(user_group(user.id) for user in (self.user, self.companion, third)))
+
+        received = [await recipient.receive_json_from() for _ in range(2)]
+        self.assertEqual([event['content'] for event in received], ['Сообщение 0', 'Сообщение 2'])
+        # Метка вкладки отправителя получателю не уходит
+        self.assertFalse([event for event in received if 'client_id' in event])
+        self.assertEqual([(await sender.receive_json_from())['client_id'] for _ in range(3)], [0, 1, 2])
+        self.assertTrue(await recipient.receive_nothing())
+        await sender.disconnect()
+        await recipient.disconnect()
+
+    async def test_invalid_messages_are_rejected(self):
+        sender = await self.connect(self.user)
+        await sender.send_to(text_data='не JSON')
+        self.assertEqual((await sender.receive_json_from())['type'], 'error')
+        await sender.send_json_to({'recipient_id': self.companion.id, 'text': '  ', 'client_id': 'a'})
+        self.assertEqual(await sender.receive_json_from(), {'type': 'error', 'client_id': 'a', 'error': 'Сообщение пустое'})
+        await sender.send_json_to({'recipient_id': 0, 'text': 'Привет', 'client_id': 'b'})
+        self.assertEqual((await sender.receive_json_from())['error'], 'Получатель не найден')
+        self.assertFalse(await Message.objects.aexists())
+        await sender.disconnect()
+
+    async def test_anonymous_is_rejected(self):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+@local_services
+class NotificationPushTests(TransactionTestCase):
+    def setUp(self):
+        caches['counters'].clear()
+        self.user = User.objects.create(username='user')
+        self.companion = User.objects.create(username='companion')
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_notification_reaches_user_group(self):
+        tabs = [await self.connect(self.user), await self.connect(self.user)]
+        other = await self.connect(self.companion)
+        notification = await database_sync_to_async(Notification.objects.create)(
+            user=self.user, title='Новый отклик', message='Текст',
+        )
+        for tab in tabs:
+            self.assertEqual(await tab.receive_json_from(), {
+                'type': 'notification', 'id': notification.id, 'title': 'Новый отклик', 'unread_count': 1,
+            })
+        self.assertTrue(await other.receive_nothing())
+
+        # Рассылка пачкой: одно событие на пользователя, о последнем уведомлении
+        await database_sync_to_async(fan_out)([self.user.id, self.companion.id], 'Вакансия {n}', 'Текст',
+                                              context={'n': 2})
+        for tab in tabs:
+            event = await tab.receive_json_from()
+            self.assertEqual((event['title'], event['unread_count']), ('Вакансия 2', 2))
+        self.assertEqual((await other.receive_json_from())['unread_count'], 1)
+        for communicator in (*tabs, other):
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+    def test_polling_stops_while_socket_open(self):
+        # Опрос счётчиков в base.html выключается на время жизни сокета
+        request = RequestFactory().get('/')
+        request.user = self.user
+        script = render_to_string('base.html', request=request)
+        self.assertIn("socket.addEventListener('open', stopPolling);", script)
+        self.assertRegex(script, r"addEventListener\('close', \(\) => \{\s*startPolling\(\);")
+
+        request.user = AnonymousUser()
+        script = render_to_string('base.html', request=request)
+        self.assertNotIn('/ws/chat/', script)
+        self.assertNotIn('startPolling();', script)
+
+
+@local_services
+class PresenceTests(TransactionTestCase):
+    def setUp(self):
+        caches['counters'].clear()
+        self.user = User.objects.create(username='user')
+        self.companion = User.objects.create(username='companion')
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_tabs_are_reference_counted(self):
+        watcher = await self.connect(self.user)
+        await watcher.send_json_to({'type': 'presence', 'user_ids': [self.companion.id]})
+        self.assertEqual(await watcher.receive_json_from(), {'type': 'presence', 'online': []})
+
+        first_tab = await self.connect(self.companion)
+        self.assertEqual(await watcher.receive_json_from(),
+                         {'type': 'presence', 'user_id': self.companion.id, 'online': True})
+        second_tab = await self.connect(self.companion)
+        await first_tab.disconnect()
+        self.assertTrue(await watcher.receive_nothing())
+        self.assertEqual(set(presence.online_users([self.companion.id, self.user.id])),
+                         {self.companion.id, self.user.id})
+
+        await second_tab.disconnect()
+        self.assertEqual(await watcher.receive_json_from(),
+                         {'type': 'presence', 'user_id': self.companion.id, 'online': False})
+        self.assertEqual(set(presence.online_users([self.companion.id])), set())
+        await watcher.disconnect()
+
+    async def test_open_socket_keeps_presence(self):
+        # Клиент не шлёт heartbeat: ключи продлевает consumer
+        with mock.patch.object(presence, 'TTL', 0.3), mock.patch.object(presence, 'TOUCH_INTERVAL', 0.1):
+            tab = await self.connect(self.user)
+            await asyncio.sleep(1)
+            self.assertEqual(set(presence.online_users([self.user.id])), {self.user.id})
+
+            await tab.disconnect()
+            await asyncio.sleep(0.3)
+            self.assertEqual(presence.online_users([self.user.id]), {})
+
+    async def test_presence_survives_cache_error(self):
+        # Сбой кэша на одном продлении не останавливает продление
+        heartbeat = presence.heartbeat
+        calls = []
+
+        def flaky_heartbeat(user_id):
+            calls.append(user_id)
+            if len(calls) == 1:
+                raise ConnectionError('Кэш недоступен')
+            return heartbeat(user_id)
+
+        with mock.patch.object(presence, 'TTL', 0.3), mock.patch.object(presence, 'TOUCH_INTERVAL', 0.1), \
+                mock.patch.object(presence, 'heartbeat', flaky_heartbeat), \
+                self.assertLogs('messenger.consumers', 'WARNING'):
+            tab = await self.connect(self.user)
+            await asyncio.sleep(1)
+            self.assertGreater(len(calls), 2)
+            self.assertEqual(set(presence.online_users([self.user.id])), {self.user.id})
+            await tab.disconnect()
+
+    async def test_typing_is_throttled(self):
+        sender = await self.connect(self.user)
+        recipient = await self.connect(self.companion)
+        for _ in range(5):
+            await sender.send_json_to({'type': 'typing', 'recipient_id': self.companion.id})
+        self.assertEqual(await recipient.receive_json_from(), {'type': 'typing', 'user_id': self.user.id})
+        self.assertTrue(await recipient.receive_nothing())
+        await sender.disconnect()
+        await recipient.disconnect()
+
+    def test_inbox_shows_online_companions(self):
+        offline = User.objects.create(username='offline')
+        for companion in (self.companion, offline):
+            ChatRoom.get_or_create_room(self.user, companion).add_message(companion, 'Привет')
+        caches['counters'].set(presence.KEY.format(self.companion.id), 0, presence.TTL)
+
+        self.client.force_login(self.user)
+        with stub_templates:
+            response = self.client.get('/messages/inbox/')
+        online = {item['companion'].id: item['is_online'] for item in response.context['conversations']}
+        self.assertEqual(online, {self.companion.id: True, offline.id: False})
+
+
+@local_services
+class ReceiptTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.companion = User.objects.create(username='companion')
+        self.room = ChatRoom.get_or_create_room(self.user, self.companion)
+        self.messages = [self.room.add_message(self.companion, f'Сообщение {i}') for i in range(5)]
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_receipts_are_coalesced(self):
+        reader = await self.connect(self.user)
+        sender = await self.connect(self.companion)
+        for message in self.messages[:3]:
+            await reader.send_json_to({'type': 'read', 'companion_id': self.companion.id, 'message_id': message.id})
+        for message in self.messages:
+            await reader.send_json_to({'type': 'delivered', 'companion_id': self.companion.id,
+                                       'message_id': message.id})
+
+        receipts = [await sender.receive_json_from(timeout=2) for _ in range(2)]
+        self.assertEqual(sorted((receipt['status'], receipt['up_to']) for receipt in receipts),
+                         [('delivered', self.messages[4].id), ('read', self.messages[2].id)])
+        self.assertEqual({receipt['user_id'] for receipt in receipts}, {self.user.id})
+        self.assertTrue(await sender.receive_nothing())
+        self.assertEqual(len([await reader.receive_json_from(timeout=2) for _ in range(2)]), 2)
+
+        room = await ChatRoom.objects.aget(pk=self.room.pk)
+        self.assertEqual(room.unread_for(self.user.id), 2)
+        self.assertEqual(await Message.objects.filter(room=room, is_read=True).acount(), 3)
+        await reader.disconnect()
+        await sender.disconnect()
+
+
+@local_services
+class ReplayTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.companion = User.objects.create(username='companion')
+        self.room = ChatRoom.get_or_create_room(self.user, self.companion)
+        for i in range(5):
+            self.room.add_message(self.companion, f'Сообщение {i}')
+        stranger = User.objects.create(username='stranger')
+        self.foreign_room = ChatRoom.get_or_create_room(stranger, self.companion)
+        self.foreign_room.add_message(stranger, 'Чужое')
+
+    async def resume(self, seqs):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to({'type': 'resume', 'seqs': seqs})
+        events = []
+        while not events or events[-1]['type'] != 'resumed':
+            events.append(await communicator.receive_json_from())
+        await communicator.disconnect()
+        return events[:-1], events[-1]
+
+    def test_messages_are_numbered(self):
+        self.assertEqual(list(self.room.messages.order_by('seq').values_list('seq', flat=True)), [1, 2, 3, 4, 5])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_seq, 5)
+
+    async def test_only_missed_messages_are_replayed(self):
+        messages, resumed = await self.resume({self.room.pk: 2, self.foreign_room.pk: 0})
+        self.assertEqual([message['seq'] for message in messages], [3, 4, 5])
+        self.assertEqual(resumed, {'type': 'resumed', 'seqs': {str(self.room.pk): 5}, 'more': []})
+
+    async def test_long_gap_is_replayed_in_pages(self):
+        with mock.patch('messenger.chat.REPLAY_LIMIT', 2):
+            messages, resumed = await self.resume({self.room.pk: 0})
+            self.assertEqual([message['seq'] for message in messages], [1, 2])
+            self.assertEqual(resumed['more'], [self.room.pk])
+            messages, resumed = await self.resume(resumed['seqs'])
+            self.assertEqual([message['seq'] for message in messages], [3, 4])
@@ -1,4 +1,6 @@
 from django.urls import path
+
+from core_models.views import select_view
 from . import views
 
 app_name = 'messenger'
@@ -9,6 +11,11 @@ urlpatterns = [
     path('notifications/', views.NotificationsView.as_view(), name='notifications'),
 
     # HTMX
-    path('htmx/send/', views.htmx_send_message, name='htmx_send_message'),
-    path('htmx/notification/<int:notification_id>/read/', views.htmx_mark_notification_read, name='htmx_mark_read'),
+    path('htmx/send/', select_view('htmx_send_message', views.htmx_send_message, views.htmx_send_message_async),
+         name='htmx_send_message'),
+    path('htmx/dialog/<int:companion_id>/history/', views.htmx_dialog_history, name='htmx_dialog_history'),
+    path('htmx/notification/<int:pk>/read/', views.htmx_mark_notification_read, name='htmx_mark_read'),
+    path('htmx/notifications/unread-count/',
+         select_view('htmx_unread_count', views.htmx_unread_count, views.htmx_unread_count_async),
+         name='htmx_unread_count'),
 ]
\ No newline at end of file
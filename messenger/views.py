@@ -1,61 +1,136 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, TemplateView
-from django.shortcuts import get_object_or_404, render
-from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
+from django.http import Http404, JsonResponse
 from django.db.models import Q
 
+from core_models.counters import aget_unread_notifications, decr_unread_notifications, get_unread_notifications
+from core_models.cursors import decode_cursor, encode_cursor
 from core_models.models import User, Notification
-from .models import Message
+from core_models.query_stats import query_budget
+from .chat import message_text
+from .events import asend_to_user, publish_to_user
+from .models import ChatRoom
+from .presence import online_users
 
 
 class InboxView(LoginRequiredMixin, ListView):
+    query_budget = 5
     template_name = 'messenger/inbox.html'
     context_object_name = 'conversations'
+    page_size = 30
 
     def get_queryset(self):
         user = self.request.user
-        # Получаем уникальных собеседников с последним сообщением
-        sent = Message.objects.filter(sender=user).values('recipient').annotate(last=Max('sent_at'))
-        received = Message.objects.filter(recipient=user).values('sender').annotate(last=Max('sent_at'))
-
-        companion_ids = set(sent.values_list('recipient', flat=True)) | set(received.values_list('sender', flat=True))
-        companions = User.objects.filter(id__in=companion_ids).exclude(id=user.id)
-
-        result = []
-        for companion in companions:
-            last_msg = Message.objects.filter(
-                (Q(sender=user) & Q(recipient=companion)) |
-                (Q(sender=companion) & Q(recipient=user))
-            ).order_by('-sent_at').first()
-            unread = Message.objects.filter(sender=companion, recipient=user, is_read=False).count()
-            result.append({
-                'companion': companion,
-                'last_message': last_msg,
-                'unread_count': unread
-            })
-        return result
+        # Последнее сообщение и счётчики непрочитанных хранятся в ChatRoom
+        rooms = ChatRoom.objects.filter(
+            Q(participant1=user) | Q(participant2=user),
+            last_message_at__isnull=False,
+        ).select_related(
+            'participant1', 'participant2', 'last_message'
+        ).order_by('-last_message_at', '-id')
+
+        cursor = decode_cursor(self.request.GET.get('cursor'))
+        if cursor:
+            last_at, room_id = cursor
+            rooms = rooms.filter(
+                Q(last_message_at__lt=last_at) | Q(last_message_at=last_at, id__lt=room_id)
+            )
+
+        rooms = list(rooms[:self.page_size + 1])
+        self.next_cursor = None
+        if len(rooms) > self.page_size:
+            rooms = rooms[:self.page_size]
+            self.next_cursor = encode_cursor(rooms[-1].last_message_at, rooms[-1].id)
+
+        # Статус «в сети» всех собеседников страницы — одним запросом в кэш присутствия
+        online = online_users([room.companion_id(user.id) for room in rooms])
+        return [{
+            'companion': room.participant2 if room.participant1_id == user.id else room.participant1,
+            'last_message': room.last_message,
+            'unread_count': room.unread_for(user.id),
+            'is_online': room.companion_id(user.id) in online,
+        } for room in rooms]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+def get_history_page(room, user, cursor=None, size=50):
+    # Окно истории: последние size сообщений старше курсора (sent_at, id)
+    messages = room.messages.select_related('sender').order_by('-sent_at', '-id')
+    if cursor:
+        sent_at, message_id = cursor
+        messages = messages.filter(Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, id__lt=message_id))
+
+    page = list(messages[:size + 1])
+    next_cursor = None
+    if len(page) > size:
+        page = page[:size]
+        next_cursor = encode_cursor(page[-1].sent_at, page[-1].id)
+
+    # Помечаем прочитанными только видимые сообщения
+    unread_ids = [m.id for m in page if m.recipient_id == user.id and not m.is_read]
+    if unread_ids:
+        room.mark_read(user, message_ids=unread_ids)
+
+    page.reverse()
+    return page, next_cursor
 
 
 class DialogView(LoginRequiredMixin, TemplateView):
+    query_budget = 10
     template_name = 'messenger/dialog.html'
+    page_size = 50
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         companion = get_object_or_404(User, id=self.kwargs['companion_id'])
         context['companion'] = companion
+        context['companion_online'] = companion.id in online_users([companion.id])
 
-        messages = Message.objects.filter(
-            (Q(sender=self.request.user) & Q(recipient=companion)) |
-            (Q(sender=companion) & Q(recipient=self.request.user))
-        ).order_by('sent_at')
-
-        # Помечаем как прочитанные
-        Message.objects.filter(sender=companion, recipient=self.request.user, is_read=False).update(is_read=True)
+        room = ChatRoom.get_room(self.request.user, companion)
+        messages, next_cursor = [], None
+        if room is not None:
+            messages, next_cursor = get_history_page(room, self.request.user, size=self.page_size)
 
+        context['room'] = room
         context['messages'] = messages
+        context['next_cursor'] = next_cursor
         return context
 
 
+@query_budget(10)
+def htmx_dialog_history(request, companion_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+
+    companion = get_object_or_404(User, id=companion_id)
+    room = ChatRoom.get_room(request.user, companion)
+    messages, next_cursor = [], None
+    if room is not None:
+        messages, next_cursor = get_history_page(
+            room, request.user, cursor=decode_cursor(request.GET.get('cursor')), size=DialogView.page_size
+        )
+
+    return JsonResponse({
+        'messages': [{
+            'id': m.id,
+            'sender_id': m.sender_id,
+            'sender': m.sender.get_full_name() or m.sender.username,
+            'content': m.content,
+            'sent_at': m.sent_at.isoformat(),
+            'is_read': m.is_read,
+            'is_own': m.sender_id == request.user.id,
+        } for m in messages],
+        'next_cursor': next_cursor,
+    })
+
+
+@query_budget(12)
 def htmx_send_message(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'POST only'}, status=405)
@@ -67,11 +142,11 @@ def htmx_send_message(request):
         return JsonResponse({'error': 'Сообщение пустое'}, status=400)
 
     recipient = get_object_or_404(User, id=recipient_id)
-    message = Message.objects.create(
-        sender=request.user,
-        recipient=recipient,
-        content=content
-    )
+    room = ChatRoom.get_or_create_room(request.user, recipient)
+    message = room.add_message(request.user, content)
+
+    # Доставка собеседнику через WebSocket
+    publish_to_user(recipient.id, 'chat_message', {'text': message_text(message)})
 
     # Уведомление
     Notification.objects.create(
@@ -86,7 +161,48 @@ def htmx_send_message(request):
     })
 
 
+@query_budget(12)
+async def htmx_send_message_async(request):
+    # Асинхронная версия (ASYNC_HTMX_VIEWS). Запись сообщения с обновлением
+    # чата остаётся одной синхронной транзакцией ChatRoom.add_message
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+    # Шаблон и контекстные процессоры читают request.user синхронно
+    request.user = user
+
+    recipient_id = request.POST.get('recipient_id')
+    content = request.POST.get('content', '').strip()
+
+    if not content:
+        return JsonResponse({'error': 'Сообщение пустое'}, status=400)
+
+    try:
+        recipient = await aget_object_or_404(User, id=recipient_id)
+    except (TypeError, ValueError):
+        raise Http404
+    room = await ChatRoom.aget_or_create_room(user, recipient)
+    message = await sync_to_async(room.add_message)(user, content)
+
+    # add_message уже закоммитил транзакцию: отправляем сразу
+    await asend_to_user(recipient.id, 'chat_message', {'text': message_text(message)})
+
+    await Notification.objects.acreate(
+        user=recipient,
+        title="Новое сообщение",
+        message=f"{user.get_full_name() or user.username}: {content[:50]}..."
+    )
+
+    return render(request, 'messenger/partials/message_bubble.html', {
+        'message': message,
+        'is_own': True
+    })
+
+
 class NotificationsView(LoginRequiredMixin, ListView):
+    query_budget = 5
     template_name = 'messenger/notifications.html'
     context_object_name = 'notifications'
     paginate_by = 20
@@ -95,13 +211,32 @@ class NotificationsView(LoginRequiredMixin, ListView):
         return self.request.user.notifications.order_by('-created_at')
 
 
+@query_budget(5)
 def htmx_mark_notification_read(request, pk):
-    notification = get_object_or_404(Notification, pk=pk, user=request.user)
-    notification.is_read = True
-    notification.save()
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+
+    # Условный UPDATE: счётчик уменьшается только если уведомление было непрочитанным
+    updated = Notification.objects.filter(pk=pk, user=request.user, is_read=False).update(is_read=True)
+    if updated:
+        decr_unread_notifications(request.user.id)
+    elif not Notification.objects.filter(pk=pk, user=request.user).exists():
+        raise Http404
     return JsonResponse({'success': True})
 
 
+@query_budget(3)
 def htmx_unread_count(request):
-    count = request.user.notifications.filter(is_read=False).count()
-    return JsonResponse({'count': count})
\ No newline at end of file
+    # Бейдж опрашивается с каждой открытой страницы: кроме сессии и
+    # пользователя (проверка хэша пароля и is_active) — только счётчик в кэше
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+    return JsonResponse({'count': get_unread_notifications(request.user.id)})
+
+
+@query_budget(3)
+async def htmx_unread_count_async(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Авторизация требуется'}, status=401)
+    return JsonResponse({'count': await aget_unread_notifications(user.id)})